@@ -0,0 +1,33 @@
+from django.contrib import admin
+from .models import DailySales, HourlySales, MenuItemDailySales
+
+
+# rollups are maintained by signals and the backfill command, never edited by hand
+class ReadOnlyRollupAdmin(admin.ModelAdmin):
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(ReadOnlyRollupAdmin):
+    list_display = ("date", "orders_completed", "revenue", "items_sold", "orders_cancelled", "cancelled_value")
+    date_hierarchy = "date"
+    ordering = ("-date",)
+
+
+@admin.register(HourlySales)
+class HourlySalesAdmin(ReadOnlyRollupAdmin):
+    list_display = ("hour", "orders_completed", "revenue", "items_sold", "orders_cancelled")
+    date_hierarchy = "hour"
+    ordering = ("-hour",)
+
+
+@admin.register(MenuItemDailySales)
+class MenuItemDailySalesAdmin(ReadOnlyRollupAdmin):
+    list_display = ("date", "menu_item", "quantity", "revenue")
+    list_filter = ("menu_item",)
+    date_hierarchy = "date"
+    ordering = ("-date", "-revenue")
@@ -0,0 +1,72 @@
+from datetime import datetime, time, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from analytics.models import (
+    DailySales, HourlySales, MenuItemDailySales,
+    ROLLUP_STATUSES, apply_rollup_deltas, rollup_deltas,
+)
+from orders.models import Order
+
+# Management command to rebuild the sales rollups from the order history
+# Usage: python manage.py backfill_sales_rollups [--start 2025-01-01] [--end 2025-12-31] [--chunk-size 2000]
+# Rollup rows of the range are cleared first, then orders are read in id order,
+# one bounded chunk per transaction, so the prod DB is never scanned in one go.
+# Run it outside service hours: orders completed while it runs may be missed.
+class Command(BaseCommand):
+    help = "Rebuild daily, hourly and per-menu-item sales rollups from orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", type=str, help="first day (YYYY-MM-DD), default: first order")
+        parser.add_argument("--end", type=str, help="last day (YYYY-MM-DD), default: today")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        start = self._parse_day(options["start"]) if options["start"] else None
+        end = self._parse_day(options["end"]) if options["end"] else timezone.localdate()
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        orders = Order.objects.filter(status__in=ROLLUP_STATUSES)
+        if start is None:
+            first = orders.order_by('created_at').values_list('created_at', flat=True).first()
+            if first is None:
+                self.stdout.write(self.style.WARNING("No completed or cancelled orders to roll up."))
+                return
+            start = timezone.localtime(first).date()
+        if start > end:
+            raise CommandError("--start is after --end")
+
+        tz = timezone.get_current_timezone()
+        range_start = datetime.combine(start, time.min, tzinfo=tz)
+        range_end = datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz)
+
+        with transaction.atomic():
+            DailySales.objects.filter(date__range=(start, end)).delete()
+            HourlySales.objects.filter(hour__gte=range_start, hour__lt=range_end).delete()
+            MenuItemDailySales.objects.filter(date__range=(start, end)).delete()
+
+        orders = orders.filter(created_at__gte=range_start, created_at__lt=range_end).order_by('id')
+        last_id = 0
+        processed = 0
+        while True:
+            chunk = list(
+                orders.filter(id__gt=last_id).values('id', 'status', 'created_at', 'total_price')[:chunk_size]
+            )
+            if not chunk:
+                break
+            apply_rollup_deltas(*rollup_deltas(chunk))
+            last_id = chunk[-1]['id']
+            processed += len(chunk)
+            self.stdout.write(f"  {processed} orders rolled up (last id {last_id})")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt sales rollups from {start} to {end} ({processed} orders)."
+        ))
+
+    def _parse_day(self, value):
+        try:
+            return datetime.strptime(value, "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:19
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('restaurants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders_completed', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('items_sold', models.PositiveIntegerField(default=0)),
+                ('orders_cancelled', models.PositiveIntegerField(default=0)),
+                ('cancelled_value', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('date', models.DateField(unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Sales',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders_completed', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('items_sold', models.PositiveIntegerField(default=0)),
+                ('orders_cancelled', models.PositiveIntegerField(default=0)),
+                ('cancelled_value', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('hour', models.DateTimeField(unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Hourly Sales',
+                'ordering': ['hour'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MenuItemDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='restaurants.menuitem')),
+            ],
+            options={
+                'verbose_name_plural': 'Menu Item Daily Sales',
+                'ordering': ['date', 'menu_item'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'menu_item'), name='unique_menu_item_daily_sales')],
+            },
+        ),
+    ]
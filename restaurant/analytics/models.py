@@ -0,0 +1,145 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+from restaurant.batching import defer_until_commit
+from restaurants.models import MenuItem
+from orders.models import Order, OrderItem, order_status_changed
+
+
+"""
+Sales rollups
+- One row per day, per hour and per (day, menu item)
+- Filled incrementally when an order reaches completed or cancelled
+- Bucketed by the time the order was placed (created_at)
+- Rebuilt from scratch with the backfill_sales_rollups command
+"""
+
+ROLLUP_STATUSES = ('completed', 'cancelled')
+
+
+class SalesFigures(models.Model):
+    orders_completed = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    items_sold = models.PositiveIntegerField(default=0)
+    orders_cancelled = models.PositiveIntegerField(default=0)
+    cancelled_value = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        abstract = True
+
+
+class DailySales(SalesFigures):
+    date = models.DateField(unique=True)
+
+    class Meta:
+        ordering = ['date']
+        verbose_name_plural = 'Daily Sales'
+
+    def __str__(self) -> str:
+        return f'{self.date}: {self.revenue}'
+
+
+class HourlySales(SalesFigures):
+    hour = models.DateTimeField(unique=True)  # start of the hour
+
+    class Meta:
+        ordering = ['hour']
+        verbose_name_plural = 'Hourly Sales'
+
+    def __str__(self) -> str:
+        return f'{self.hour:%Y-%m-%d %H:00}: {self.revenue}'
+
+
+class MenuItemDailySales(models.Model):
+    date = models.DateField()
+    menu_item = models.ForeignKey(MenuItem, related_name='daily_sales', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        ordering = ['date', 'menu_item']
+        verbose_name_plural = 'Menu Item Daily Sales'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'menu_item'], name='unique_menu_item_daily_sales'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.date}: {self.quantity} x {self.menu_item_id}'
+
+
+def _bucket(created_at):
+    local = timezone.localtime(created_at)
+    return local.date(), local.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_deltas(orders) -> tuple[dict, dict, dict]:
+    """
+    Sum the contribution of terminal orders (dicts with id, status, created_at
+    and total_price) per day, per hour and per (day, menu item).
+    Order lines are read with one query for the whole batch.
+    """
+    daily: dict = defaultdict(lambda: defaultdict(int))
+    hourly: dict = defaultdict(lambda: defaultdict(int))
+    items: dict = defaultdict(lambda: defaultdict(int))
+    completed_days = {}
+
+    for order in orders:
+        day, hour = _bucket(order['created_at'])
+        for figures in (daily[day], hourly[hour]):
+            if order['status'] == 'completed':
+                figures['orders_completed'] += 1
+                figures['revenue'] += order['total_price']
+            else:
+                figures['orders_cancelled'] += 1
+                figures['cancelled_value'] += order['total_price']
+        if order['status'] == 'completed':
+            completed_days[order['id']] = (day, hour)
+
+    lines = OrderItem.objects.filter(order_id__in=list(completed_days)).values_list(
+        'order_id', 'menu_item_id', 'quantity', 'price'
+    )
+    for order_id, menu_item_id, quantity, price in lines.iterator(chunk_size=2000):
+        day, hour = completed_days[order_id]
+        daily[day]['items_sold'] += quantity
+        hourly[hour]['items_sold'] += quantity
+        items[(day, menu_item_id)]['quantity'] += quantity
+        items[(day, menu_item_id)]['revenue'] += price * quantity
+    return daily, hourly, items
+
+
+def _increment(model, lookup: dict, figures: dict) -> None:
+    changes = {field: F(field) + value for field, value in figures.items() if value}
+    if changes:
+        model.objects.get_or_create(**lookup)
+        model.objects.filter(**lookup).update(**changes)
+
+
+def apply_rollup_deltas(daily: dict, hourly: dict, items: dict) -> None:
+    """Add the deltas to the rollup rows with atomic F() increments."""
+    with transaction.atomic():
+        for day, figures in daily.items():
+            _increment(DailySales, {'date': day}, figures)
+        for hour, figures in hourly.items():
+            _increment(HourlySales, {'hour': hour}, figures)
+        for (day, menu_item_id), figures in items.items():
+            _increment(MenuItemDailySales, {'date': day, 'menu_item_id': menu_item_id}, figures)
+
+
+def record_terminal_orders(order_ids) -> None:
+    """Add orders that reached a terminal status to the rollups."""
+    orders = Order.objects.filter(pk__in=order_ids, status__in=ROLLUP_STATUSES).values(
+        'id', 'status', 'created_at', 'total_price'
+    )
+    apply_rollup_deltas(*rollup_deltas(orders))
+
+
+# === SIGNALS ===
+# completed and cancelled are terminal, so an order is counted exactly once;
+# the orders of one transaction (e.g. a bulk transition) are rolled up together
+@receiver(order_status_changed, sender=Order)
+def rollup_terminal_order(sender, order: Order, previous_status: str, **kwargs) -> None:
+    if order.status in ROLLUP_STATUSES and previous_status not in ROLLUP_STATUSES:
+        defer_until_commit('sales_rollups', record_terminal_orders, [order.id])
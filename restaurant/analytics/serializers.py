@@ -0,0 +1,38 @@
+from rest_framework import serializers
+from .models import DailySales, HourlySales
+
+SALES_FIELDS = ['orders_completed', 'revenue', 'items_sold', 'orders_cancelled', 'cancelled_value']
+
+class DailySalesSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailySales
+        fields = ['date'] + SALES_FIELDS
+
+class HourlySalesSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = HourlySales
+        fields = ['hour'] + SALES_FIELDS
+
+# query parameters of the analytics endpoints, defaults to the last 30 days
+class DateRangeSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    granularity = serializers.ChoiceField(choices=['day', 'hour'], default='day')
+
+    MAX_DAYS = {'day': 366, 'hour': 31}
+
+    def validate(self, attrs):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        end = attrs.get('end') or timezone.localdate()
+        start = attrs.get('start') or end - timedelta(days=29)
+        if start > end:
+            raise serializers.ValidationError("start must be before end.")
+        max_days = self.MAX_DAYS[attrs['granularity']]
+        if (end - start).days >= max_days:
+            raise serializers.ValidationError(
+                f"At most {max_days} days can be requested per {attrs['granularity']}."
+            )
+        attrs['start'], attrs['end'] = start, end
+        return attrs
@@ -0,0 +1,65 @@
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from orders.models import Order, OrderItem
+from restaurants.models import MenuCategory, MenuItem
+from users.models import User
+from .models import DailySales, HourlySales, MenuItemDailySales
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username='guest', email='guest@example.com')
+        category = MenuCategory.objects.create(name='Mains')
+        self.soup = MenuItem.objects.create(category=category, name='Soup', price=Decimal('2.50'))
+        self.stew = MenuItem.objects.create(category=category, name='Stew', price=Decimal('4.00'))
+        self.orders = []
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(5):
+                order = Order.objects.create(user=user, status='ready')
+                OrderItem.objects.create(order=order, menu_item=self.soup, quantity=2)
+                OrderItem.objects.create(order=order, menu_item=self.stew, quantity=1)
+                self.orders.append(order)
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.bulk_update_status([order.pk for order in self.orders[:4]], 'completed')
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.get(pk=self.orders[4].pk).update_status('cancelled')
+
+    def figures(self):
+        return (
+            list(DailySales.objects.values('date', 'orders_completed', 'revenue', 'items_sold', 'orders_cancelled', 'cancelled_value')),
+            list(HourlySales.objects.values('hour', 'orders_completed', 'revenue', 'items_sold')),
+            list(MenuItemDailySales.objects.values_list('menu_item', 'quantity', 'revenue')),
+        )
+
+    def test_terminal_orders_are_rolled_up_once(self):
+        daily, hourly, items = self.figures()
+        self.assertEqual(daily, [{
+            'date': timezone.localdate(), 'orders_completed': 4, 'revenue': Decimal('36.00'), 'items_sold': 12,
+            'orders_cancelled': 1, 'cancelled_value': Decimal('9.00'),
+        }])
+        self.assertEqual(len(hourly), 1)
+        self.assertEqual(sorted(items), [(self.soup.pk, 8, Decimal('20.00')), (self.stew.pk, 4, Decimal('16.00'))])
+
+    def test_backfill_rebuilds_the_same_figures(self):
+        before = self.figures()
+        call_command('backfill_sales_rollups', chunk_size=2, stdout=StringIO())
+        self.assertEqual(self.figures(), before)
+
+    def test_reports_are_admin_only(self):
+        client = APIClient()
+        self.assertIn(client.get('/api/analytics/sales/').status_code, (401, 403))
+        client.force_authenticate(get_user_model().objects.create(username='admin', is_staff=True))
+        report = client.get('/api/analytics/sales/').json()
+        self.assertEqual(report['totals']['revenue'], '36.00')
+        self.assertEqual(report['totals']['orders_cancelled'], 1)
+        self.assertEqual(client.get('/api/analytics/sales/', {'granularity': 'hour'}).json()['totals']['items_sold'], 12)
+        best = client.get('/api/analytics/menu-items/').json()['results']
+        self.assertEqual([(row['menu_item_name'], row['revenue']) for row in best], [('Soup', '20.00'), ('Stew', '16.00')])
+        self.assertEqual(client.get('/api/analytics/sales/', {'start': '2020-01-01'}).status_code, 400)
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import SalesReportView, MenuItemSalesView
+
+urlpatterns = [
+    path('sales/', SalesReportView.as_view(), name='sales-report'),
+    path('menu-items/', MenuItemSalesView.as_view(), name='menu-item-sales'),
+]
@@ -0,0 +1,85 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .models import DailySales, HourlySales, MenuItemDailySales
+from .serializers import (
+    DailySalesSerializer, HourlySalesSerializer, DateRangeSerializer, SALES_FIELDS
+)
+
+# Read-only analytics, answered from the rollup tables only
+# (a year of daily rows is 365 rows, whatever the number of orders)
+
+MONEY_FIELDS = ('revenue', 'cancelled_value')
+
+
+def money(value) -> str:
+    """Amounts are rendered as strings, like DRF's DecimalField does."""
+    return str(Decimal(value or 0).quantize(Decimal('0.01')))
+
+
+class SalesReportView(APIView):
+    """Revenue per day or per hour: ?start=YYYY-MM-DD&end=YYYY-MM-DD&granularity=day|hour"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        params = DateRangeSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end = params.validated_data['start'], params.validated_data['end']
+        granularity = params.validated_data['granularity']
+
+        if granularity == 'hour':
+            tz = timezone.get_current_timezone()
+            rows = HourlySales.objects.filter(
+                hour__gte=datetime.combine(start, time.min, tzinfo=tz),
+                hour__lt=datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz),
+            )
+            serializer_class = HourlySalesSerializer
+        else:
+            rows = DailySales.objects.filter(date__range=(start, end))
+            serializer_class = DailySalesSerializer
+
+        totals = rows.aggregate(**{field: Sum(field) for field in SALES_FIELDS})
+        return Response({
+            'start': start,
+            'end': end,
+            'granularity': granularity,
+            'totals': {
+                field: money(value) if field in MONEY_FIELDS else value or 0
+                for field, value in totals.items()
+            },
+            'results': serializer_class(rows, many=True).data,
+        })
+
+
+class MenuItemSalesView(APIView):
+    """Quantity and revenue per menu item over ?start=&end=, best sellers first."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        params = DateRangeSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end = params.validated_data['start'], params.validated_data['end']
+
+        rows = (
+            MenuItemDailySales.objects.filter(date__range=(start, end))
+            .values('menu_item', 'menu_item__name')
+            .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+            .order_by('-revenue', 'menu_item')
+        )
+        return Response({
+            'start': start,
+            'end': end,
+            'results': [
+                {
+                    'menu_item': row['menu_item'],
+                    'menu_item_name': row['menu_item__name'],
+                    'quantity': row['quantity'],
+                    'revenue': money(row['revenue']),
+                }
+                for row in rows
+            ],
+        })
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem, ArchiveCheckpoint
 
 
 class OrderItemInline(admin.TabularInline):
@@ -36,3 +36,33 @@ class OrderItemAdmin(admin.ModelAdmin):
     list_filter = ('menu_item',)
     search_fields = ('order__id', 'menu_item__name')
     ordering = ('order',)
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    fields = ('menu_item', 'quantity', 'price')
+    readonly_fields = fields
+    can_delete = False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    """Archived orders are read-only, they are written by the archive_orders command."""
+    list_display = ('id', 'user', 'total_price', 'status', 'created_at', 'archived_at')
+    list_filter = ('status',)
+    search_fields = ('id', 'user__username')
+    ordering = ('-created_at',)
+    inlines = [ArchivedOrderItemInline]
+    readonly_fields = ('id', 'user', 'total_price', 'status', 'created_at', 'updated_at', 'archived_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchiveCheckpoint)
+class ArchiveCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'cutoff', 'last_order_id', 'archived', 'finished', 'updated_at')
@@ -0,0 +1,103 @@
+"""
+In-process pub/sub for live order events.
+
+Kitchen screens subscribe through the server-sent events view in orders/views.py
+instead of polling the order list. Events are published from any thread (sync
+views run in a thread pool under ASGI) and delivered to every subscriber's event
+loop with call_soon_threadsafe, so no database query is involved.
+
+The broker lives in the worker process: run a single ASGI worker per node, or
+replace it with a shared broker before scaling out.
+"""
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+HISTORY_SIZE = 1000        # events kept for Last-Event-ID replay
+SUBSCRIBER_BUFFER = 500    # events queued for a slow client before dropping old ones
+
+
+class OrderEventBroker:
+    """Fan-out of order events to async subscribers, with a bounded replay history."""
+
+    def __init__(self, history_size: int = HISTORY_SIZE) -> None:
+        # event ids are "<boot>-<seq>" so a client resuming against a restarted
+        # process is detected and gets the whole history instead of a gap
+        self.boot = format(int(time.time() * 1000), 'x')
+        self._sequence = itertools.count(1)
+        self._history: deque = deque(maxlen=history_size)
+        self._subscribers: set = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event_type: str, data: dict) -> dict:
+        with self._lock:
+            event = {'id': f'{self.boot}-{next(self._sequence)}', 'event': event_type, 'data': data}
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(event)
+        return event
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> "Subscription":
+        """Register the running event loop; events after last_event_id are replayed first."""
+        subscription = Subscription(self, asyncio.get_running_loop())
+        with self._lock:
+            subscription.backlog = self._replay(last_event_id)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: "Subscription") -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _replay(self, last_event_id: Optional[str]) -> list:
+        if not last_event_id:
+            return []
+        boot, _, sequence = last_event_id.partition('-')
+        if boot != self.boot or not sequence.isdigit():
+            return list(self._history)
+        return [e for e in self._history if int(e['id'].rsplit('-', 1)[1]) > int(sequence)]
+
+
+class Subscription:
+    """Queue of events for one connected client, owned by its event loop."""
+
+    def __init__(self, broker: OrderEventBroker, loop: asyncio.AbstractEventLoop) -> None:
+        self.broker = broker
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.backlog: list = []
+
+    def push(self, event: dict) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self._enqueue, event)
+        except RuntimeError:
+            # the client's loop is closed, the stream is gone
+            self.broker.unsubscribe(self)
+
+    def _enqueue(self, event: dict) -> None:
+        if self.queue.qsize() >= SUBSCRIBER_BUFFER:
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """Next event, or None when nothing arrived within timeout."""
+        if self.backlog:
+            return self.backlog.pop(0)
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+
+broker = OrderEventBroker()
+
+
+def publish_order_event(event_type: str, data: dict[str, Any]) -> dict:
+    return broker.publish(event_type, data)
@@ -0,0 +1,41 @@
+"""Flattened order lines for accounting exports (see restaurant/exports.py)."""
+from typing import Iterator
+from restaurant.exports import EXPORT_CHUNK_SIZE, filter_export, iterate_in_chunks
+from .models import Order
+
+# one row per order line; orders without lines get one row with empty line columns
+ORDER_EXPORT_FIELDS = [
+    'order_id', 'created_at', 'updated_at', 'status', 'user_id', 'username', 'order_total',
+    'line_id', 'menu_item_id', 'menu_item_name', 'quantity', 'unit_price', 'line_total',
+]
+
+_COLUMNS = {
+    'order_id': 'id',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'status': 'status',
+    'user_id': 'user_id',
+    'username': 'user__username',
+    'order_total': 'total_price',
+    'line_id': 'order_items__id',
+    'menu_item_id': 'order_items__menu_item_id',
+    'menu_item_name': 'order_items__menu_item__name',
+    'quantity': 'order_items__quantity',
+    'unit_price': 'order_items__price',
+}
+
+
+def order_export_rows(params: dict, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[dict]:
+    orders = filter_export(Order.objects.all(), params, 'created_at')
+    for order_ids in iterate_in_chunks(orders, chunk_size):
+        lines = (
+            Order.objects.filter(id__in=order_ids)
+            .order_by('id', 'order_items__id')
+            .values_list(*_COLUMNS.values())
+        )
+        for values in lines:
+            row = dict(zip(_COLUMNS, values))
+            row['line_total'] = (
+                row['unit_price'] * row['quantity'] if row['line_id'] is not None else None
+            )
+            yield row
@@ -0,0 +1,57 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from orders.models import ARCHIVE_STATUSES, ArchiveCheckpoint, archive_order_batch
+
+CHECKPOINT_NAME = "orders"
+
+# Management command to move old completed/cancelled orders to the archive tables
+# Usage: python manage.py archive_orders [--older-than-days 365] [--batch-size 500] [--max-batches N] [--restart]
+# Each batch is its own short transaction. An interrupted run is resumed from its
+# checkpoint (with its original cutoff) the next time the command is started.
+class Command(BaseCommand):
+    help = "Archive orders in a terminal status older than a given age, in bounded batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=int, default=365)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--max-batches", type=int, default=None,
+                            help="stop after this many batches (resume later)")
+        parser.add_argument("--restart", action="store_true",
+                            help="discard an unfinished run and start a new one")
+
+    def handle(self, *args, **options):
+        if options["older_than_days"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--older-than-days and --batch-size must be positive")
+
+        cutoff = timezone.now() - timedelta(days=options["older_than_days"])
+        checkpoint = ArchiveCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+        if checkpoint is None:
+            checkpoint = ArchiveCheckpoint.objects.create(name=CHECKPOINT_NAME, cutoff=cutoff)
+        elif checkpoint.finished or options["restart"]:
+            checkpoint.cutoff = cutoff
+            checkpoint.last_order_id = 0
+            checkpoint.archived = 0
+            checkpoint.finished = False
+            checkpoint.save()
+        else:
+            self.stdout.write(self.style.WARNING(f"Resuming unfinished run: {checkpoint}"))
+
+        self.stdout.write(
+            f"Archiving {'/'.join(ARCHIVE_STATUSES)} orders created before {checkpoint.cutoff:%Y-%m-%d %H:%M}"
+        )
+        batches = 0
+        while options["max_batches"] is None or batches < options["max_batches"]:
+            archived = archive_order_batch(checkpoint, options["batch_size"])
+            if not archived:
+                break
+            batches += 1
+            self.stdout.write(f"  batch {batches}: {archived} orders (last id {checkpoint.last_order_id})")
+
+        if checkpoint.finished:
+            self.stdout.write(self.style.SUCCESS(f"Done, {checkpoint.archived} orders archived."))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"Stopped after {batches} batches, {checkpoint.archived} orders archived so far. "
+                f"Run the command again to resume."
+            ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from restaurant.exports import ExportParamsSerializer, render_rows
+from orders.exports import ORDER_EXPORT_FIELDS, order_export_rows
+from orders.models import Order
+
+# Management command to export orders as CSV or NDJSON, streamed in constant memory
+# Usage: python manage.py export_orders [--start YYYY-MM-DD] [--end YYYY-MM-DD] [--status a,b] [--output csv|ndjson] [--file path]
+class Command(BaseCommand):
+    help = "Export orders (one row per order line) as CSV or NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", type=str)
+        parser.add_argument("--end", type=str)
+        parser.add_argument("--status", type=str, help="comma separated statuses")
+        parser.add_argument("--output", type=str, default="csv", help="csv or ndjson")
+        parser.add_argument("--file", type=str, help="write to this file instead of stdout")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        data = {key: options[key] for key in ("start", "end", "status", "output") if options[key]}
+        params = ExportParamsSerializer(
+            data=data, context={"status_choices": dict(Order.STATUS_CHOICES)}
+        )
+        if not params.is_valid():
+            raise CommandError(params.errors)
+
+        lines = render_rows(
+            order_export_rows(params.validated_data, chunk_size=options["chunk_size"]),
+            ORDER_EXPORT_FIELDS,
+            params.validated_data["output"],
+        )
+        if options["file"]:
+            count = 0
+            with open(options["file"], "w", encoding="utf-8", newline="") as f:
+                for line in lines:
+                    f.write(line)
+                    count += 1
+            self.stderr.write(self.style.SUCCESS(f"Wrote {count} lines to {options['file']}"))
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
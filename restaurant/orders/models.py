@@ -1,15 +1,34 @@
-from django.db import models
+from functools import partial
+from django.db import models, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from restaurant.batching import defer_until_commit
 from users.models import User
 from restaurants.models import MenuItem
+from restaurants.pricing import effective_price
 from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
+from django.dispatch import Signal, receiver
 from decimal import Decimal
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
+from .events import publish_order_event
 
 if TYPE_CHECKING:
     from .models import OrderItem  # forward reference for type hints
 
 
+# sent with (order, previous_status) whenever an order moves to a new status
+order_status_changed = Signal()
+
+
+class InvalidStatusTransition(ValueError):
+    """The order cannot move from its current status to the requested one."""
+
+
+class StaleOrderError(Exception):
+    """The order changed since it was read (optimistic concurrency on updated_at)."""
+
+
 """
 Model for Order
 - Linked to user who placed it
@@ -30,7 +49,20 @@ class Order(models.Model):
         ('cancelled', 'Cancelled'),
     ]
 
+    # allowed moves of the order lifecycle; completed and cancelled are terminal
+    STATUS_TRANSITIONS = {
+        'pending': ('confirmed', 'cancelled'),
+        'confirmed': ('preparing', 'cancelled'),
+        'preparing': ('ready', 'cancelled'),
+        'ready': ('out_for_delivery', 'completed', 'cancelled'),
+        'out_for_delivery': ('delivered', 'cancelled'),
+        'delivered': ('completed',),
+        'completed': (),
+        'cancelled': (),
+    }
+
     id: int  # Explicit annotation for Pylance/Django stubs
+    user_id: int
     user = models.ForeignKey(User, related_name='orders', on_delete=models.CASCADE)
     total_price = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal('0.00'))
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -40,24 +72,138 @@ class Order(models.Model):
     if TYPE_CHECKING:
         order_items: models.Manager["OrderItem"]  # reverse relation type hint
 
+    class Meta:
+        # supports the keyset pagination of the order list
+        indexes = [
+            models.Index(fields=['-created_at', 'id'], name='order_created_id_idx'),
+        ]
+
     def __str__(self) -> str:
         return f'Order {self.id} by {self.user.username} - {self.status}'
 
     def update_total(self) -> None:
         """Recalculate and update the total price of the order."""
-        total = Decimal('0.00')
-        for order_item in self.order_items.all():
-            total += order_item.price * order_item.quantity
-        self.total_price = total
+        total = self.order_items.aggregate(total=Sum(LINE_TOTAL))['total']
+        self.total_price = total or Decimal('0.00')
         self.save(update_fields=['total_price'])
 
-    def update_status(self, new_status: str) -> None:
-        """Update the order status if valid, else raise error."""
-        if new_status in dict(self.STATUS_CHOICES).keys():
-            self.status = new_status
-            self.save(update_fields=['status'])
-        else:
+    @classmethod
+    def refresh_totals(cls, order_ids, using: str = 'default') -> int:
+        """Recompute the totals of many orders with a single UPDATE ... SET = (SELECT SUM)."""
+        line_totals = (
+            OrderItem.objects.filter(order=OuterRef('pk'))
+            .values('order')
+            .annotate(total=Sum(LINE_TOTAL))
+            .values('total')
+        )
+        return cls.objects.using(using).filter(pk__in=order_ids).update(
+            total_price=Coalesce(
+                Subquery(line_totals, output_field=PRICE_FIELD),
+                Value(Decimal('0.00')),
+                output_field=PRICE_FIELD,
+            )
+        )
+
+    @staticmethod
+    def total_for_lines(lines) -> Decimal:
+        """Total of validated order lines ({'menu_item': MenuItem, 'quantity': int, 'price': Decimal})."""
+        return sum(
+            (line['price'] * line['quantity'] for line in lines),
+            Decimal('0.00'),
+        )
+
+    def add_items(self, lines) -> list["OrderItem"]:
+        """Insert all lines with one query; bulk_create skips the per-item total signals."""
+        return OrderItem.objects.bulk_create([
+            OrderItem(
+                order=self,
+                menu_item=line['menu_item'],
+                quantity=line['quantity'],
+                price=line['price'],
+            )
+            for line in lines
+        ])
+
+    @classmethod
+    def predecessors(cls, new_status: str) -> list[str]:
+        """Statuses an order may move to new_status from."""
+        return [status for status, targets in cls.STATUS_TRANSITIONS.items() if new_status in targets]
+
+    def update_status(self, new_status: str, expected_updated_at=None) -> None:
+        """
+        Move the order to new_status if the transition is allowed, else raise error.
+        The row is only written if it still has the status and updated_at that
+        were read (or expected_updated_at, the version the client last saw).
+        """
+        if new_status not in dict(self.STATUS_CHOICES).keys():
+            raise ValueError('Invalid status')
+        if new_status not in self.STATUS_TRANSITIONS[self.status]:
+            raise InvalidStatusTransition(f'Cannot move order from {self.status} to {new_status}')
+
+        previous_status = self.status
+        now = timezone.now()
+        updated = Order.objects.filter(
+            pk=self.pk,
+            status=previous_status,
+            updated_at=expected_updated_at or self.updated_at,
+        ).update(status=new_status, updated_at=now)
+        if not updated:
+            raise StaleOrderError(f'Order {self.pk} was modified by another request')
+
+        self.status = new_status
+        self.updated_at = now
+        order_status_changed.send(sender=Order, order=self, previous_status=previous_status)
+
+    @classmethod
+    def bulk_update_status(cls, order_ids, new_status: str, expected_updated_at=None) -> dict[int, dict]:
+        """
+        Apply one transition to many orders with a single conditional
+        UPDATE ... WHERE status IN (predecessors) AND updated_at = <version>.
+
+        Every row is guarded by the updated_at the client sent for it, or by the
+        one read just before the update, so two terminals racing on the same
+        order cannot clobber each other. Returns a result per order id:
+        updated, not_found, invalid_transition or stale.
+        """
+        if new_status not in dict(cls.STATUS_CHOICES).keys():
             raise ValueError('Invalid status')
+        expected_updated_at = expected_updated_at or {}
+        predecessors = cls.predecessors(new_status)
+
+        with transaction.atomic():
+            orders = cls.objects.in_bulk(order_ids)
+            results: dict[int, dict] = {}
+            guards = models.Q(pk__in=[])
+            for order_id in order_ids:
+                order = orders.get(order_id)
+                if order is None:
+                    results[order_id] = {'result': 'not_found'}
+                elif order.status not in predecessors:
+                    results[order_id] = {'result': 'invalid_transition', 'status': order.status}
+                else:
+                    version = expected_updated_at.get(order_id, order.updated_at)
+                    guards |= models.Q(pk=order_id, updated_at=version)
+
+            now = timezone.now()
+            cls.objects.filter(guards, status__in=predecessors).update(status=new_status, updated_at=now)
+            won = set(
+                cls.objects.filter(pk__in=order_ids, status=new_status, updated_at=now)
+                .values_list('pk', flat=True)
+            )
+
+            for order_id in order_ids:
+                if order_id in results:
+                    continue
+                order = orders[order_id]
+                if order_id not in won:
+                    results[order_id] = {'result': 'stale', 'status': order.status}
+                    continue
+                previous_status = order.status
+                order.status = new_status
+                order.updated_at = now
+                results[order_id] = {'result': 'updated', 'status': new_status}
+                order_status_changed.send(sender=cls, order=order, previous_status=previous_status)
+        return {order_id: results[order_id] for order_id in order_ids}
 
 
 """
@@ -68,6 +214,8 @@ Model for OrderItem
 
 class OrderItem(models.Model):
     id: int
+    order_id: int
+    menu_item_id: int
     order = models.ForeignKey(Order, related_name='order_items', on_delete=models.CASCADE)
     menu_item = models.ForeignKey(MenuItem, related_name='order_items', on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
@@ -77,18 +225,153 @@ class OrderItem(models.Model):
         return f'{self.quantity} x {self.menu_item.name} in Order {self.order.id}'
 
     def save(self, *args, **kwargs) -> None:
-        """Ensure price is set from menu_item if not provided."""
+        """Ensure price is set from the effective price of menu_item if not provided."""
         if self.price == Decimal('0.00'):
-            self.price = self.menu_item.price
+            self.price = effective_price(self.menu_item_id).price
         super().save(*args, **kwargs)
 
 
+"""
+Archive of old orders
+- Orders in a terminal status older than a cutoff are moved here in batches
+  by the archive_orders command, keeping the hot tables small
+- Rows keep their original ids, so an archived order is still found by id
+"""
+
+ARCHIVE_STATUSES = ('completed', 'cancelled')
+
+
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, related_name='archived_orders', on_delete=models.CASCADE)
+    total_price = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal('0.00'))
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    if TYPE_CHECKING:
+        order_items: models.Manager["ArchivedOrderItem"]
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self) -> str:
+        return f'Archived order {self.id} - {self.status}'
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, related_name='order_items', on_delete=models.CASCADE)
+    menu_item = models.ForeignKey(MenuItem, related_name='archived_order_items', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    price = models.DecimalField(max_digits=6, decimal_places=2, default=Decimal('0.00'))
+
+    def __str__(self) -> str:
+        return f'{self.quantity} x {self.menu_item_id} in archived order {self.order_id}'
+
+
+class ArchiveCheckpoint(models.Model):
+    """Progress of an archive run; an unfinished run is resumed with the same cutoff."""
+    name = models.CharField(max_length=50, unique=True)
+    cutoff = models.DateTimeField()
+    last_order_id = models.BigIntegerField(default=0)
+    archived = models.PositiveIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f'{self.name} up to {self.cutoff:%Y-%m-%d} (last id {self.last_order_id})'
+
+
+def archive_order_batch(checkpoint: ArchiveCheckpoint, batch_size: int) -> int:
+    """
+    Move the next batch of archivable orders (and their lines) to the archive
+    tables and advance the checkpoint, all in one transaction.
+    Returns the number of archived orders, 0 when the run is complete.
+    """
+    with transaction.atomic():
+        order_ids = list(
+            Order.objects.filter(
+                id__gt=checkpoint.last_order_id,
+                status__in=ARCHIVE_STATUSES,
+                created_at__lt=checkpoint.cutoff,
+            ).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            checkpoint.finished = True
+            checkpoint.save(update_fields=['finished', 'updated_at'])
+            return 0
+
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(**row) for row in Order.objects.filter(id__in=order_ids).values(
+                'id', 'user_id', 'total_price', 'status', 'created_at', 'updated_at'
+            )
+        ])
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(**row) for row in OrderItem.objects.filter(order_id__in=order_ids).values(
+                'id', 'order_id', 'menu_item_id', 'quantity', 'price'
+            )
+        ])
+        Order.objects.filter(id__in=order_ids).delete()
+
+        checkpoint.last_order_id = order_ids[-1]
+        checkpoint.archived += len(order_ids)
+        checkpoint.save(update_fields=['last_order_id', 'archived', 'updated_at'])
+    return len(order_ids)
+
+
+PRICE_FIELD = DecimalField(max_digits=8, decimal_places=2)
+LINE_TOTAL = ExpressionWrapper(F('price') * F('quantity'), output_field=PRICE_FIELD)
+
+
+# === TOTAL MAINTENANCE ===
+# Line changes only mark their order as dirty. The dirty orders of a transaction
+# are refreshed together when it commits (see restaurant/batching.py), so editing
+# 30 inline rows in the admin costs one UPDATE instead of 30 full re-reads.
+
+def schedule_total_refresh(order_id: int, using: str = 'default') -> None:
+    """Recompute the order total once, when the current transaction commits."""
+    defer_until_commit(
+        ('order_totals', using),
+        partial(Order.refresh_totals, using=using),
+        [order_id],
+        using=using,
+    )
+
+
+def order_event_data(order: Order, previous_status: Optional[str] = None) -> dict:
+    """Payload pushed to the live order stream."""
+    return {
+        'id': order.id,
+        'user': order.user_id,
+        'status': order.status,
+        'previous_status': previous_status,
+        'total_price': str(order.total_price),
+        'created_at': order.created_at.isoformat() if order.created_at else None,
+        'updated_at': order.updated_at.isoformat() if order.updated_at else None,
+    }
+
+
 # === SIGNALS ===
+@receiver(post_save, sender=Order)
+def publish_order_created(sender, instance: Order, created: bool, using: str = 'default', **kwargs) -> None:
+    if created:
+        event = partial(publish_order_event, 'order.created', order_event_data(instance))
+        transaction.on_commit(event, using=using)
+
+
+@receiver(order_status_changed, sender=Order)
+def publish_order_status_changed(sender, order: Order, previous_status: str, **kwargs) -> None:
+    event = partial(publish_order_event, 'order.status', order_event_data(order, previous_status))
+    transaction.on_commit(event)
+
+
 @receiver(post_save, sender=OrderItem)
-def update_order_total_on_save(sender, instance: OrderItem, **kwargs) -> None:
-    instance.order.update_total()
+def update_order_total_on_save(sender, instance: OrderItem, using: str = 'default', **kwargs) -> None:
+    schedule_total_refresh(instance.order_id, using=using)
 
 
 @receiver(post_delete, sender=OrderItem)
-def update_order_total_on_delete(sender, instance: OrderItem, **kwargs) -> None:
-    instance.order.update_total()
+def update_order_total_on_delete(sender, instance: OrderItem, using: str = 'default', **kwargs) -> None:
+    schedule_total_refresh(instance.order_id, using=using)
@@ -1,5 +1,12 @@
-from rest_framework import serializers
-from .models import Order, OrderItem
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from restaurants.hours import closed_message
+from restaurants.models import MenuItem
+from restaurants.pricing import effective_prices
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem, StaleOrderError
 
 class OrderItemSerializer(serializers.ModelSerializer):
     menu_item_name = serializers.CharField(source='menu_item.name', read_only=True)
@@ -8,13 +15,134 @@ class OrderItemSerializer(serializers.ModelSerializer):
         model = OrderItem
         fields = ['id', 'menu_item', 'menu_item_name', 'quantity', 'price']
 
+# write-only line used when posting an order together with its items
+# menu_item is a plain id so all items and prices can be resolved in bulk
+class OrderLineSerializer(serializers.Serializer):
+    menu_item = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+# the order moved on between reading it and writing the new status
+class OrderConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The order was changed by someone else.'
+    default_code = 'stale_order'
+
 class OrderSerializer(serializers.ModelSerializer):
     order_items = OrderItemSerializer(many=True, read_only=True)
+    items = OrderLineSerializer(many=True, write_only=True, required=False)
     user_name = serializers.CharField(source='user.username', read_only=True)
     
     class Meta:
         model = Order
         fields = [
             'id', 'user', 'user_name', 'total_price', 'status', 
-            'created_at', 'updated_at', 'order_items'
-        ]
\ No newline at end of file
+            'created_at', 'updated_at', 'order_items', 'items'
+        ]
+
+    def validate_status(self, value):
+        """New orders start pending; PUT edits must follow Order.STATUS_TRANSITIONS."""
+        if self.instance is None:
+            if value != 'pending':
+                raise serializers.ValidationError("New orders start as pending.")
+        elif value != self.instance.status:
+            if value not in Order.STATUS_TRANSITIONS[self.instance.status]:
+                raise serializers.ValidationError(
+                    f"Cannot move order from {self.instance.status} to {value}."
+                )
+        return value
+
+    def validate_items(self, value):
+        """Resolve every menu item of the order and its effective price in bulk."""
+        ids = {line['menu_item'] for line in value}
+        menu_items = MenuItem.objects.only('id', 'price', 'is_available').in_bulk(ids)
+
+        missing = sorted(ids - menu_items.keys())
+        if missing:
+            raise serializers.ValidationError(f"Unknown menu items: {missing}")
+        unavailable = sorted(pk for pk, item in menu_items.items() if not item.is_available)
+        if unavailable:
+            raise serializers.ValidationError(f"Menu items not available: {unavailable}")
+
+        prices = effective_prices(ids)
+        for line in value:
+            line['price'] = prices[line['menu_item']].price
+            line['menu_item'] = menu_items[line['menu_item']]
+        return value
+
+    def validate(self, attrs):
+        # new orders only while the restaurant is open (cached schedule, no query)
+        if self.instance is None:
+            message = closed_message(timezone.now())
+            if message:
+                raise serializers.ValidationError(message)
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        items = validated_data.pop('items', None)
+        if items is None:
+            return super().create(validated_data)
+
+        validated_data['total_price'] = Order.total_for_lines(items)
+        order = Order.objects.create(**validated_data)
+        order.add_items(items)
+        prefetch_related_objects([order], 'order_items__menu_item')
+        return order
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        items = validated_data.pop('items', None)
+        new_status = validated_data.pop('status', instance.status)
+        order = super().update(instance, validated_data)
+        if new_status != order.status:
+            # goes through the state machine so order_status_changed is sent
+            try:
+                order.update_status(new_status)
+            except StaleOrderError as exc:
+                raise OrderConflict(str(exc))
+        if items is not None:
+            # replace every line of the order in bulk
+            order.order_items.all().delete()
+            order.add_items(items)
+            order.total_price = Order.total_for_lines(items)
+            order.save(update_fields=['total_price'])
+        return order
+
+
+# read-only view of archived orders, same shape as OrderSerializer
+class ArchivedOrderItemSerializer(serializers.ModelSerializer):
+    menu_item_name = serializers.CharField(source='menu_item.name', read_only=True)
+
+    class Meta:
+        model = ArchivedOrderItem
+        fields = ['id', 'menu_item', 'menu_item_name', 'quantity', 'price']
+
+class ArchivedOrderSerializer(serializers.ModelSerializer):
+    order_items = ArchivedOrderItemSerializer(many=True, read_only=True)
+    user_name = serializers.CharField(source='user.username', read_only=True)
+    archived = serializers.BooleanField(default=True, read_only=True)
+
+    class Meta:
+        model = ArchivedOrder
+        fields = [
+            'id', 'user', 'user_name', 'total_price', 'status',
+            'created_at', 'updated_at', 'order_items', 'archived', 'archived_at'
+        ]
+
+# input of the bulk status transition endpoint
+# updated_at optionally maps order ids to the version the client last saw
+class OrderBulkStatusSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000
+    )
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+    updated_at = serializers.DictField(child=serializers.DateTimeField(), required=False)
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+    def validate_updated_at(self, value):
+        try:
+            return {int(order_id): version for order_id, version in value.items()}
+        except ValueError:
+            raise serializers.ValidationError("Keys must be order ids.")
@@ -1,3 +1,384 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from restaurant.exports import iterate_async
+from restaurants.models import MenuCategory, MenuItem
+from users.models import User
+from .events import OrderEventBroker
+from .models import ArchiveCheckpoint, ArchivedOrder, ArchivedOrderItem, Order, OrderItem, StaleOrderError
 
-# Create your tests here.
+
+class NestedOrderItemsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(username='guest', email='guest@example.com')
+        category = MenuCategory.objects.create(name='Mains')
+        self.items = [
+            MenuItem.objects.create(category=category, name=f'Dish {index}', price=Decimal('2.50') + index)
+            for index in range(10)
+        ]
+
+    def test_lines_are_created_in_one_insert_with_one_total(self):
+        lines = [{'menu_item': item.id, 'quantity': 2} for item in self.items]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/orders/orders/', {'user': self.user.id, 'items': lines}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['order_items']), 10)
+        inserts = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('INSERT INTO "orders_orderitem"')]
+        self.assertEqual(len(inserts), 1)
+        order = Order.objects.get()
+        self.assertEqual(order.total_price, sum((item.price * 2 for item in self.items), Decimal(0)))
+        self.assertEqual(Decimal(response.json()['total_price']), order.total_price)
+
+    def test_put_replaces_the_lines(self):
+        lines = [{'menu_item': item.id, 'quantity': 1} for item in self.items]
+        order_id = self.client.post('/api/orders/orders/', {'user': self.user.id, 'items': lines}, format='json').json()['id']
+        response = self.client.put(
+            f'/api/orders/orders/{order_id}/', {'user': self.user.id, 'items': lines[:2]}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(OrderItem.objects.filter(order_id=order_id).count(), 2)
+        self.assertEqual(Order.objects.get(pk=order_id).total_price, Decimal('6.00'))
+
+    def test_unknown_menu_items_create_nothing(self):
+        lines = [{'menu_item': self.items[0].id}, {'menu_item': 999}]
+        response = self.client.post('/api/orders/orders/', {'user': self.user.id, 'items': lines}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderTotalTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username='guest', email='guest@example.com')
+        category = MenuCategory.objects.create(name='Mains')
+        self.dish = MenuItem.objects.create(category=category, name='Dish', price=Decimal('2.50'))
+        self.order = Order.objects.create(user=user)
+
+    def add_line(self, quantity=1):
+        return OrderItem.objects.create(order=self.order, menu_item=self.dish, quantity=quantity)
+
+    def test_one_update_per_transaction(self):
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                for _ in range(30):
+                    self.add_line()
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "orders_order"')]
+        self.assertEqual(len(updates), 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, Decimal('75.00'))
+
+    def test_rolled_back_lines_do_not_count(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_line(quantity=2)
+            try:
+                with transaction.atomic():
+                    self.add_line(quantity=10)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, Decimal('5.00'))
+
+    def test_deleted_lines_are_taken_off(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            line = self.add_line(quantity=2)
+            self.add_line()
+        with self.captureOnCommitCallbacks(execute=True):
+            line.delete()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, Decimal('2.50'))
+
+
+class OrderEventBrokerTests(TestCase):
+    async def test_subscribers_get_published_events_and_replays(self):
+        events = OrderEventBroker(history_size=3)
+        subscription = events.subscribe()
+        first = events.publish('order.created', {'id': 1})
+        self.assertEqual(await subscription.get(timeout=1), first)
+        self.assertIsNone(await subscription.get(timeout=0.01))
+        subscription.close()
+
+        for order_id in range(2, 6):
+            events.publish('order.created', {'id': order_id})
+        # after the last seen id, bounded by the history
+        resumed = events.subscribe(f'{events.boot}-3')
+        self.assertEqual([(await resumed.get(timeout=1))['data']['id'] for _ in range(2)], [4, 5])
+        # ids of another process: the whole history
+        restarted = events.subscribe('0-3')
+        self.assertEqual([(await restarted.get(timeout=1))['data']['id'] for _ in range(3)], [3, 4, 5])
+
+
+class OrderStreamTests(TransactionTestCase):
+    async def next_event(self, stream):
+        chunk = await asyncio.wait_for(anext(stream), 2)
+        fields = dict(line.split(': ', 1) for line in chunk.decode().strip().splitlines())
+        return fields['event'], json.loads(fields['data'])
+
+    async def test_committed_changes_reach_the_stream(self):
+        response = await AsyncClient().get('/api/orders/stream/', {'status': 'pending,cancelled'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        try:
+            user = await User.objects.acreate(username='guest', email='guest@example.com')
+            order = await Order.objects.acreate(user=user)
+            event, data = await self.next_event(stream)
+            self.assertEqual((event, data['id'], data['status']), ('order.created', order.pk, 'pending'))
+            await sync_to_async(order.update_status)('confirmed')     # filtered out
+            await sync_to_async(order.update_status)('cancelled')
+            event, data = await self.next_event(stream)
+            self.assertEqual((event, data['status'], data['previous_status']), ('order.status', 'cancelled', 'confirmed'))
+        finally:
+            await stream.aclose()
+
+    async def test_unknown_statuses_are_a_400(self):
+        response = await AsyncClient().get('/api/orders/stream/', {'status': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+
+
+class IdempotentOrderCreateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(username='guest', email='guest@example.com')
+
+    def post(self, key, **data):
+        return self.client.post('/api/orders/orders/', {'user': self.user.id, **data}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_a_retry_replays_the_first_response(self):
+        first, retry = self.post('abc'), self.post('abc')
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        # another key is another order
+        self.assertEqual(self.post('def').status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_a_key_is_bound_to_its_body(self):
+        self.post('abc')
+        self.assertEqual(self.post('abc', status='pending', items=[]).status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_requests_are_not_remembered(self):
+        response = self.client.post('/api/orders/orders/', {'user': 999}, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post('abc').status_code, 201)
+
+
+class OrderStatusWriteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(username='guest', email='guest@example.com')
+
+    def test_new_orders_cannot_skip_the_state_machine(self):
+        for status in ('completed', 'cancelled', 'ready'):
+            response = self.client.post('/api/orders/orders/', {'user': self.user.id, 'status': status}, format='json')
+            self.assertEqual(response.status_code, 400, status)
+            self.assertIn('status', response.json())
+        self.assertFalse(Order.objects.exists())
+
+    def test_new_orders_start_pending(self):
+        response = self.client.post('/api/orders/orders/', {'user': self.user.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], 'pending')
+
+    def test_put_follows_the_transitions(self):
+        order = Order.objects.create(user=self.user)
+        url = f'/api/orders/orders/{order.id}/'
+        response = self.client.put(url, {'user': self.user.id, 'status': 'confirmed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.put(url, {'user': self.user.id, 'status': 'pending'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'confirmed')
+
+    def test_stale_put_is_a_conflict(self):
+        order = Order.objects.create(user=self.user)
+        with mock.patch.object(Order, 'update_status', side_effect=StaleOrderError('modified')):
+            response = self.client.put(
+                f'/api/orders/orders/{order.id}/', {'user': self.user.id, 'status': 'confirmed'}, format='json',
+            )
+        self.assertEqual(response.status_code, 409)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'pending')
+
+
+class BulkStatusTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        user = User.objects.create(username='guest', email='guest@example.com')
+        self.orders = [Order.objects.create(user=user, status=status) for status in ('ready', 'ready', 'pending', 'ready')]
+
+    def test_one_transition_reported_per_order(self):
+        ready, stale, pending, _ = self.orders
+        response = self.client.post('/api/orders/orders/bulk_status/', {
+            'ids': [order.id for order in self.orders] + [999],
+            'status': 'completed',
+            'updated_at': {str(stale.id): '2020-01-01T00:00:00Z'},
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['updated'], 2)
+        results = {result['id']: result['result'] for result in data['results']}
+        self.assertEqual(results, {
+            ready.id: 'updated', stale.id: 'stale', pending.id: 'invalid_transition',
+            self.orders[3].id: 'updated', 999: 'not_found',
+        })
+        statuses = dict(Order.objects.values_list('id', 'status'))
+        self.assertEqual([statuses[order.id] for order in self.orders], ['completed', 'ready', 'pending', 'completed'])
+
+    def test_single_transitions_follow_the_state_machine(self):
+        order = self.orders[0]
+        url = f'/api/orders/orders/{order.id}/update_status/'
+        self.assertEqual(self.client.post(url, {'status': 'pending'}, format='json').status_code, 400)
+        response = self.client.post(url, {'status': 'completed', 'updated_at': '2020-01-01T00:00:00Z'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.post(url, {'status': 'completed'}, format='json').status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'completed')
+
+    def test_a_get_never_changes_the_status(self):
+        order = self.orders[0]
+        response = self.client.get(f'/api/orders/orders/{order.id}/update_status/', {'status': 'completed'})
+        self.assertEqual(response.status_code, 405)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'ready')
+
+
+class OrderArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username='guest', email='guest@example.com')
+        category = MenuCategory.objects.create(name='Mains')
+        dish = MenuItem.objects.create(category=category, name='Dish', price=Decimal('2.50'))
+        self.orders = []
+        for status, age in (('completed', 400), ('cancelled', 400), ('ready', 400), ('completed', 400), ('completed', 1)):
+            order = Order.objects.create(user=user, status=status)
+            OrderItem.objects.create(order=order, menu_item=dish, quantity=2)
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=age))
+            self.orders.append(order)
+
+    def archive(self, **options):
+        call_command('archive_orders', batch_size=1, stdout=StringIO(), **options)
+
+    def test_interrupted_runs_resume_from_the_checkpoint(self):
+        self.archive(max_batches=2)
+        self.assertFalse(ArchiveCheckpoint.objects.get().finished)
+        self.assertEqual(ArchivedOrder.objects.count(), 2)
+        self.archive()
+        self.assertTrue(ArchiveCheckpoint.objects.get().finished)
+        # old terminal orders only, with their lines
+        archived = [self.orders[index].pk for index in (0, 1, 3)]
+        self.assertEqual(sorted(ArchivedOrder.objects.values_list('pk', flat=True)), archived)
+        self.assertEqual(ArchivedOrderItem.objects.count(), 3)
+        self.assertEqual(sorted(Order.objects.values_list('pk', flat=True)), [self.orders[2].pk, self.orders[4].pk])
+
+    def test_archived_orders_are_still_served(self):
+        self.archive()
+        client = APIClient()
+        response = client.get(f'/api/orders/orders/{self.orders[0].pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['status'], len(response.json()['order_items'])), ('completed', 1))
+        self.assertEqual(client.get(f'/api/orders/orders/{self.orders[4].pk}/').json()['id'], self.orders[4].pk)
+        self.assertEqual(client.get('/api/orders/orders/999/').status_code, 404)
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create(username='admin', is_staff=True))
+        user = User.objects.create(username='guest', email='guest@example.com')
+        category = MenuCategory.objects.create(name='Mains')
+        dish = MenuItem.objects.create(category=category, name='Fish, "fresh"', price=Decimal('2.50'))
+        self.orders = {}
+        for status in ('completed', 'cancelled', 'ready'):
+            order = self.orders[status] = Order.objects.create(user=user, status=status)
+            if status != 'ready':
+                OrderItem.objects.create(order=order, menu_item=dish, quantity=2)
+                OrderItem.objects.create(order=order, menu_item=dish, quantity=1)
+
+    def export(self, **params):
+        response = self.client.get('/api/orders/orders/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_has_one_row_per_line(self):
+        rows = list(csv.DictReader(self.export(status='completed,ready').splitlines()))
+        self.assertEqual(
+            [(int(row['order_id']), row['quantity'], row['line_total']) for row in rows],
+            [(self.orders['completed'].pk, '2', '5.00'), (self.orders['completed'].pk, '1', '2.50'), (self.orders['ready'].pk, '', '')],
+        )
+        self.assertEqual(rows[0]['menu_item_name'], 'Fish, "fresh"')
+
+    def test_ndjson_and_the_command_agree(self):
+        lines = [json.loads(line) for line in self.export(output='ndjson').splitlines()]
+        self.assertEqual(len(lines), 5)
+        output = StringIO()
+        call_command('export_orders', output='ndjson', chunk_size=1, stdout=output)
+        self.assertEqual([json.loads(line) for line in output.getvalue().splitlines()], lines)
+
+    def test_invalid_parameters_and_non_admins_are_refused(self):
+        self.assertEqual(self.client.get('/api/orders/orders/export/', {'status': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/orders/orders/export/', {'start': '2026-02-01', 'end': '2026-01-01'}).status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get('/api/orders/orders/export/').status_code, (401, 403))
+
+
+class OrderExportStreamingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # the API authenticates against the auth user model
+        admin = get_user_model().objects.create(username='admin', is_staff=True)
+        self.token = str(RefreshToken.for_user(admin).access_token)
+        user = User.objects.create(username='guest', email='guest@example.com')
+        for _ in range(3):
+            Order.objects.create(user=user, status='completed')
+
+    def test_wsgi_export_streams_a_sync_iterator(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        response = client.get('/api/orders/orders/export/', {'output': 'ndjson'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 3)
+
+    async def test_asgi_export_streams_an_async_iterator(self):
+        response = await AsyncClient().get(
+            '/api/orders/orders/export/', {'output': 'ndjson'}, headers={'Authorization': f'Bearer {self.token}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        lines = [line async for line in response.streaming_content]
+        self.assertEqual(len(b''.join(lines).splitlines()), 3)
+
+    async def test_async_iteration_reads_one_chunk_at_a_time(self):
+        produced = []
+
+        def lines():
+            for index in range(10):
+                produced.append(index)
+                yield f'{index}\n'
+
+        stream = iterate_async(lines(), chunk_size=4)
+        self.assertEqual(await anext(stream), '0\n')
+        self.assertEqual(produced, [0, 1, 2, 3])
+        self.assertEqual([line async for line in stream], [f'{index}\n' for index in range(1, 10)])
@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import OrderViewSet, OrderItemViewSet
+from .views import OrderViewSet, OrderItemViewSet, order_stream
 
 router = DefaultRouter()
 router.register(r'orders', OrderViewSet)
 router.register(r'order-items', OrderItemViewSet)
 
 urlpatterns = [
+    path('stream/', order_stream, name='order-stream'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,26 +1,127 @@
-from rest_framework import viewsets, status
+import json
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import serializers, viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from .models import Order, OrderItem
-from .serializers import OrderSerializer, OrderItemSerializer
+from rest_framework.generics import get_object_or_404
+from rest_framework.permissions import IsAdminUser
+from restaurant.exports import ExportParamsSerializer, streaming_export
+from restaurant.idempotency import IdempotentCreateMixin
+from .events import broker
+from .exports import ORDER_EXPORT_FIELDS, order_export_rows
+from .models import Order, OrderItem, ArchivedOrder, StaleOrderError
+from .serializers import (
+    OrderSerializer, OrderItemSerializer, OrderBulkStatusSerializer, ArchivedOrderSerializer
+)
 
-class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.all()
+STREAM_HEARTBEAT_SECONDS = 15
+
+class OrderViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
+    # orders can be posted with all their lines in one request (see OrderSerializer.items)
+    queryset = Order.objects.select_related('user').prefetch_related('order_items__menu_item')
     serializer_class = OrderSerializer
+    cursor_ordering = ('-created_at', 'id')
     http_method_names = ['get', 'post', 'put', 'delete']
 
+    # orders moved away by the archive_orders command are still readable by id
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            archived = get_object_or_404(
+                ArchivedOrder.objects.select_related('user').prefetch_related('order_items__menu_item'),
+                pk=kwargs['pk'],
+            )
+            return Response(ArchivedOrderSerializer(archived).data)
 
-    @action(detail=True, methods=['get'])
+    # POST only: a GET with ?status= could be fired by prefetchers, crawlers or a
+    # cross-site <img>, and now answers 405
+    # an optional updated_at rejects the change with 409 if the order moved on meanwhile
+    @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
         order = self.get_object()
-        new_status = request.query_params.get('status')
+        new_status = request.data.get('status')
+        expected = request.data.get('updated_at')
         try: 
-            order.update_status(new_status)
-            return Response({'status': 'status updated'})
-        except ValueError: 
-            return Response({'error': 'invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+            if expected:
+                expected = serializers.DateTimeField().to_internal_value(expected)
+            order.update_status(new_status, expected_updated_at=expected)
+            return Response({'status': 'status updated', 'updated_at': order.updated_at})
+        except StaleOrderError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        except (ValueError, serializers.ValidationError) as exc:
+            message = str(exc) if isinstance(exc, ValueError) else 'invalid updated_at'
+            return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
+
+    # applies one transition to many orders with a single conditional UPDATE
+    # and reports the outcome per order id
+    @action(detail=False, methods=['post'])
+    def bulk_status(self, request):
+        serializer = OrderBulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        results = Order.bulk_update_status(
+            data['ids'], data['status'], expected_updated_at=data.get('updated_at')
+        )
+        updated = sum(1 for result in results.values() if result['result'] == 'updated')
+        return Response({
+            'status': data['status'],
+            'updated': updated,
+            'results': [{'id': order_id, **result} for order_id, result in results.items()],
+        })
+
+    # accounting export, one row per order line, streamed in constant memory
+    # ?start=YYYY-MM-DD&end=YYYY-MM-DD&status=completed,cancelled&output=csv|ndjson
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        params = ExportParamsSerializer(
+            data=request.query_params, context={'status_choices': dict(Order.STATUS_CHOICES)}
+        )
+        params.is_valid(raise_exception=True)
+        return streaming_export(
+            request,
+            order_export_rows(params.validated_data),
+            ORDER_EXPORT_FIELDS,
+            params.validated_data['output'],
+            'orders',
+        )
         
 class OrderItemViewSet(viewsets.ModelViewSet):
-    queryset = OrderItem.objects.all()
+    queryset = OrderItem.objects.select_related('menu_item')
     serializer_class = OrderItemSerializer
+    cursor_ordering = ('id',)
+
+
+# Live order stream (server-sent events)
+# pushes order.created / order.status events to kitchen screens as they happen
+# ?status=preparing,ready filters on the new status of the order
+# reconnecting clients send Last-Event-ID (or ?last_event_id=) to replay what they missed
+# needs the ASGI server from the Procfile: under WSGI the stream would hold a worker
+
+@require_GET
+async def order_stream(request):
+    statuses = {value for value in request.GET.get('status', '').split(',') if value}
+    unknown = statuses - dict(Order.STATUS_CHOICES).keys()
+    if unknown:
+        return HttpResponseBadRequest(f"invalid status: {', '.join(sorted(unknown))}")
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    subscription = broker.subscribe(last_event_id)
+
+    async def events():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                event = await subscription.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ': keep-alive\n\n'
+                elif not statuses or event['data']['status'] in statuses:
+                    yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        finally:
+            subscription.close()
 
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Reservation
+from .models import Reservation, WaitlistEntry
 
 
 @admin.register(Reservation)
@@ -16,3 +16,21 @@ class ReservationAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'special_requests')
     ordering = ('-reservation_time',)
     date_hierarchy = 'reservation_time'
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = (
+        'user',
+        'desired_time',
+        'party_size',
+        'priority',
+        'status',
+        'reservation',
+        'created_at',
+    )
+    list_filter = ('status', 'desired_time')
+    search_fields = ('user__username', 'special_requests')
+    ordering = ('created_at',)
+    date_hierarchy = 'desired_time'
+    raw_id_fields = ('reservation',)
@@ -0,0 +1,271 @@
+"""
+Table assignment optimizer for one service day.
+
+Guests pick a table when they book, so a party of 2 may hold a 10-seat table
+that a later party of 8 needed. plan_assignment() re-packs the day's upcoming
+pending/confirmed bookings onto the available tables:
+
+- every booking goes to the smallest table that seats it and is free for its
+  whole stay, preferring its current table among equally small ones so that
+  few bookings move;
+- each table keeps its bookings as sorted start/end lists, so the "is it free"
+  check is one bisect.
+
+The current assignment already seats everyone, so the plan must too; what it
+improves is the seats left empty at occupied tables (wasted seat-minutes),
+i.e. how many more covers the night can still take. Three candidates are
+built and the one wasting least (then moving least) wins: best-fit packing
+largest parties first, best-fit packing in start order (interval
+partitioning), and moving bookings from the current assignment to smaller free
+tables until nothing moves. A packing that strands a booking is dropped; the
+last candidate never does.
+
+Seated and already started bookings, and bookings of other days overlapping
+this one, stay where they are and only block their tables.
+
+apply_assignment() writes a plan in one transaction: the moved bookings are
+first parked in a non-blocking status, then given their new tables and original
+status, so the overlap triggers (migration 0005) never see a transient
+overlap between two bookings that swap tables. Bookings made on the
+destination tables after the plan, e.g. on a table that was unavailable then,
+make it fail with AssignmentError like a changed snapshot does.
+"""
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from restaurants.models import Table
+from .availability import BLOCKING_STATUSES, MAX_DURATION, blocking_reservations, is_overlap_error
+from .grid import _day_bounds, grid_dates, invalidate_grid_dates
+from .models import Reservation
+
+MOVABLE_STATUSES = ('pending', 'confirmed')
+# non-blocking status the moved bookings pass through while applying a plan
+PARKING_STATUS = 'cancelled'
+ONE_MINUTE = timedelta(minutes=1)
+
+Booking = namedtuple('Booking', 'id table_id start end party_size status')
+
+
+class AssignmentError(Exception):
+    """The bookings changed since the plan was made."""
+
+
+class _TableSchedule:
+    """Non-overlapping stays of one table, kept sorted by start."""
+
+    def __init__(self) -> None:
+        self.starts = []
+        self.ends = []
+
+    def is_free(self, start, end) -> bool:
+        index = bisect_left(self.starts, end)       # stays starting before end
+        return index == 0 or self.ends[index - 1] <= start
+
+    def add(self, start, end) -> None:
+        index = bisect_left(self.starts, start)
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+
+    def remove(self, start, end) -> None:
+        index = bisect_left(self.starts, start)
+        del self.starts[index], self.ends[index]
+
+
+def _load(day, now):
+    day_start, day_end = _day_bounds(day)
+    rows = (
+        Reservation.objects
+        .filter(
+            status__in=BLOCKING_STATUSES,
+            reservation_time__gt=day_start - MAX_DURATION,
+            reservation_time__lt=day_end + MAX_DURATION,
+        )
+        .values_list('pk', 'table_id', 'reservation_time', 'end_time', 'party_size', 'status')
+    )
+    movable, fixed = [], []
+    for row in rows:
+        booking = Booking(*row)
+        on_day = day_start <= booking.start < day_end
+        if on_day and booking.status in MOVABLE_STATUSES and booking.start >= now:
+            movable.append(booking)
+        else:
+            fixed.append(booking)
+    tables = dict(Table.objects.filter(is_available=True).values_list('pk', 'size'))
+    numbers = dict(Table.objects.values_list('pk', 'number'))
+    return movable, fixed, tables, numbers
+
+
+def _best_fit(booking, tables, sizes, schedules):
+    """Smallest table free for the booking, its current one among equally small ones."""
+    best = None
+    for table_id in tables:
+        if sizes[table_id] < booking.party_size:
+            continue
+        if best is not None and sizes[table_id] > sizes[best]:
+            break
+        if schedules[table_id].is_free(booking.start, booking.end):
+            if best is None or table_id == booking.table_id:
+                best = table_id
+    return best
+
+
+def _fixed_schedules(fixed):
+    schedules = defaultdict(_TableSchedule)
+    for booking in fixed:
+        schedules[booking.table_id].add(booking.start, booking.end)
+    return schedules
+
+
+def _largest_first(booking):
+    return -booking.party_size, booking.start, booking.id
+
+
+def _earliest_first(booking):
+    return booking.start, -booking.party_size, booking.id
+
+
+def _pack(movable, order, tables, sizes, fixed):
+    """Place the bookings one by one in this order, None if one finds no table."""
+    schedules = _fixed_schedules(fixed)
+    assignment = {}
+    for booking in sorted(movable, key=order):
+        table_id = _best_fit(booking, tables, sizes, schedules)
+        if table_id is None:
+            return None
+        schedules[table_id].add(booking.start, booking.end)
+        assignment[booking.id] = table_id
+    return assignment
+
+
+def _improve(movable, tables, sizes, fixed):
+    """Move bookings to smaller free tables, starting from the current assignment.
+
+    Every move goes to a strictly smaller table, so this always ends, and it
+    never leaves a booking without a table.
+    """
+    schedules = _fixed_schedules(fixed)
+    assignment = {}
+    for booking in movable:
+        schedules[booking.table_id].add(booking.start, booking.end)
+        assignment[booking.id] = booking.table_id
+    changed = True
+    while changed:
+        changed = False
+        for booking in sorted(movable, key=_largest_first):
+            current = assignment[booking.id]
+            schedules[current].remove(booking.start, booking.end)
+            table_id = _best_fit(booking._replace(table_id=current), tables, sizes, schedules)
+            if table_id is None or table_id == current:
+                table_id = current
+            else:
+                changed = True
+            schedules[table_id].add(booking.start, booking.end)
+            assignment[booking.id] = table_id
+    return assignment
+
+
+def _wasted_seat_minutes(bookings, assignment, sizes) -> int:
+    wasted = 0
+    for booking in bookings:
+        wasted += (sizes[assignment[booking.id]] - booking.party_size) * ((booking.end - booking.start) // ONE_MINUTE)
+    return wasted
+
+
+def plan_assignment(day, now=None) -> dict:
+    """Best-fit assignment of the day's movable bookings; nothing is written."""
+    now = now or timezone.now()
+    movable, fixed, sizes, numbers = _load(day, now)
+    tables = sorted(sizes, key=lambda pk: (sizes[pk], numbers[pk]))
+    current = {booking.id: booking.table_id for booking in movable}
+    candidates = [
+        _pack(movable, _largest_first, tables, sizes, fixed),
+        _pack(movable, _earliest_first, tables, sizes, fixed),
+        _improve(movable, tables, sizes, fixed),
+    ]
+    # sizes of unavailable tables still holding bookings
+    all_sizes = {**dict(Table.objects.filter(pk__in=set(current.values()) - set(sizes)).values_list('pk', 'size')), **sizes}
+
+    def cost(assignment):
+        moved = sum(assignment[pk] != table_id for pk, table_id in current.items())
+        return _wasted_seat_minutes(movable, assignment, all_sizes), moved
+
+    assignment = min((candidate for candidate in candidates if candidate is not None), key=cost)
+    moves = sorted(
+        (booking for booking in movable if assignment[booking.id] != booking.table_id),
+        key=lambda b: (b.start, b.id),
+    )
+    return {
+        'date': day.isoformat(),
+        'bookings': len(movable),
+        'moves': [
+            {
+                'reservation': booking.id,
+                'reservation_time': booking.start,
+                'party_size': booking.party_size,
+                'from_table': numbers.get(booking.table_id),
+                'to_table': numbers.get(assignment[booking.id]),
+                'to_table_id': assignment[booking.id],
+            }
+            for booking in moves
+        ],
+        'wasted_seat_minutes_before': _wasted_seat_minutes(movable, current, all_sizes),
+        'wasted_seat_minutes_after': _wasted_seat_minutes(movable, assignment, all_sizes),
+        # what apply_assignment() checks before writing
+        'snapshot': {booking.id: (booking.table_id, booking.start, booking.end, booking.status) for booking in movable},
+    }
+
+
+@transaction.atomic
+def apply_assignment(plan) -> int:
+    """Write a plan made by plan_assignment(); returns the number of moved bookings."""
+    if not plan['moves']:
+        return 0
+    snapshot = plan['snapshot']
+    # no booking of these tables can be made or moved until commit (reservations/booking.py)
+    table_ids = {table_id for table_id, *_ in snapshot.values()} | {move['to_table_id'] for move in plan['moves']}
+    list(Table.objects.select_for_update().filter(pk__in=table_ids).values_list('pk'))
+
+    moved_ids = [move['reservation'] for move in plan['moves']]
+    reservations = Reservation.objects.select_for_update().in_bulk(moved_ids)
+    for pk in moved_ids:
+        reservation = reservations.get(pk)
+        current = reservation and (reservation.table_id, reservation.reservation_time, reservation.end_time, reservation.status)
+        if current != snapshot[pk]:
+            raise AssignmentError(f"Reservation {pk} changed since the plan was made, plan again.")
+
+    # the plan only knew the bookings of its time; the table locks keep this answer valid
+    moves = [(reservations[move['reservation']], move['to_table_id']) for move in plan['moves']]
+    taken = defaultdict(list)
+    rows = (
+        blocking_reservations(min(r.reservation_time for r, _ in moves), max(r.end_time for r, _ in moves))
+        .filter(table_id__in={table_id for _, table_id in moves})
+        .exclude(pk__in=moved_ids)
+        .values_list('table_id', 'reservation_time', 'end_time')
+    )
+    for table_id, start, end in rows:
+        taken[table_id].append((start, end))
+    for reservation, table_id in moves:
+        if any(start < reservation.end_time and reservation.reservation_time < end for start, end in taken[table_id]):
+            raise AssignmentError(f"Reservation {reservation.pk} would overlap a newer booking, plan again.")
+
+    # 1. park: the moved bookings stop blocking their tables
+    Reservation.objects.filter(pk__in=moved_ids).update(status=PARKING_STATUS)
+    # 2. new tables and original statuses; the final placement has no overlaps
+    updated = []
+    for reservation, table_id in moves:
+        reservation.table_id = table_id
+        updated.append(reservation)
+    try:
+        Reservation.objects.bulk_update(updated, ['table', 'status'], batch_size=500)
+    except DatabaseError as exc:
+        if is_overlap_error(exc):
+            raise AssignmentError("The new placement overlaps a booking, plan again.") from exc
+        raise
+
+    dates = set()
+    for reservation in updated:
+        dates |= grid_dates(reservation.reservation_time, reservation.end_time)
+    invalidate_grid_dates(dates)
+    return len(updated)
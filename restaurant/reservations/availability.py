@@ -0,0 +1,55 @@
+"""
+Which tables are free for a party at a given time.
+
+A reservation holds its table over [reservation_time, end_time) while its
+status is one of BLOCKING_STATUSES. Two reservations of a table overlap when
+each starts before the other ends. No reservation lasts longer than
+Reservation.MAX_DURATION, so only those starting in (start - MAX_DURATION, end)
+can overlap [start, end): a bounded range over the (table, reservation_time)
+index instead of the table's whole history. free_tables() answers with one
+query; the same condition is enforced by ReservationSerializer and by the
+database triggers of migration 0005.
+"""
+from datetime import timedelta
+from django.db.models import Exists, OuterRef
+from restaurants.models import Table
+from .models import Reservation
+
+BLOCKING_STATUSES = ('pending', 'confirmed', 'seated')
+MAX_DURATION = timedelta(minutes=Reservation.MAX_DURATION)
+# raised by the overlap triggers, see migration 0005
+OVERLAP_ERROR = 'reservation_overlap'
+
+
+def blocking_reservations(start, end):
+    """Reservations holding their table at some point of [start, end)."""
+    return Reservation.objects.filter(
+        status__in=BLOCKING_STATUSES,
+        reservation_time__gt=start - MAX_DURATION,
+        reservation_time__lt=end,
+        end_time__gt=start,
+    )
+
+
+def overlapping_reservations(table, start, end, exclude_pk=None):
+    """Blocking reservations of table overlapping [start, end), but exclude_pk."""
+    reservations = blocking_reservations(start, end).filter(table=table)
+    if exclude_pk is not None:
+        reservations = reservations.exclude(pk=exclude_pk)
+    return reservations
+
+
+def is_overlap_error(exc) -> bool:
+    """Whether a database error comes from the overlap triggers."""
+    return OVERLAP_ERROR in str(exc)
+
+
+def free_tables(start, party_size: int, duration: timedelta):
+    """Available tables seating party_size and free for the whole window, smallest first."""
+    end = start + duration
+    return (
+        Table.objects
+        .filter(is_available=True, size__gte=party_size)
+        .exclude(Exists(blocking_reservations(start, end).filter(table=OuterRef('pk'))))
+        .order_by('size', 'number')
+    )
@@ -0,0 +1,65 @@
+"""
+Contention-safe booking of tables.
+
+Every booking that can take a table (create, move, reactivate) runs in a
+transaction that first locks the table row with SELECT ... FOR UPDATE, so
+bookings of one table are serialized while other tables book in parallel. With
+the lock held, the overlap check and the write cannot interleave with another
+booking of the table. SQLite has no row locks, but its transactions start
+IMMEDIATE (see DATABASES in settings), which serializes writers the same way.
+
+A deadlock or lock timeout is retried a few times with a short backoff; if the
+table still cannot be locked, or the slot is taken, the caller gets a
+BookingConflict, answered with a 409 by the API. The overlap triggers of
+migration 0005 stay as the last line of defence.
+"""
+import random
+import time
+from django.db import DatabaseError, OperationalError, transaction
+from restaurants.models import Table
+from .availability import BLOCKING_STATUSES, is_overlap_error, overlapping_reservations
+from .models import Reservation
+
+BOOKING_ATTEMPTS = 3
+RETRY_BACKOFF = 0.05  # seconds, doubled after every attempt
+
+
+class BookingConflict(Exception):
+    """The table is taken for (part of) the requested time, or stayed locked."""
+
+    def __init__(self, message, conflict=None):
+        super().__init__(message)
+        self.conflict = conflict
+
+
+def _book_once(reservation):
+    with transaction.atomic():
+        if reservation.status in BLOCKING_STATUSES:
+            # serializes the bookings of this table until commit
+            Table.objects.select_for_update().only('pk').get(pk=reservation.table_id)
+            conflict = overlapping_reservations(
+                reservation.table_id, reservation.reservation_time, reservation.compute_end_time(),
+                exclude_pk=reservation.pk,
+            ).order_by('reservation_time').first()
+            if conflict is not None:
+                raise BookingConflict("The table is already booked for an overlapping time.", conflict)
+        reservation.save()
+    return reservation
+
+
+def book(reservation, attempts: int = BOOKING_ATTEMPTS):
+    """Save a new or changed reservation unless its table is taken at that time."""
+    delay = RETRY_BACKOFF
+    for attempt in range(1, attempts + 1):
+        try:
+            return _book_once(reservation)
+        except DatabaseError as exc:
+            if is_overlap_error(exc):
+                raise BookingConflict("The table is already booked for an overlapping time.") from exc
+            if not isinstance(exc, OperationalError):
+                raise
+            # deadlock or lock wait timeout: another booking of the table holds the lock
+            if attempt == attempts:
+                raise BookingConflict("The table is being booked by someone else, please try again.") from exc
+            time.sleep(delay * (1 + random.random()))
+            delay *= 2
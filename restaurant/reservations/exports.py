@@ -0,0 +1,32 @@
+"""Reservation rows for exports (see restaurant/exports.py)."""
+from typing import Iterator
+from restaurant.exports import EXPORT_CHUNK_SIZE, filter_export, iterate_in_chunks
+from .models import Reservation
+
+_COLUMNS = {
+    'reservation_id': 'id',
+    'reservation_time': 'reservation_time',
+    'end_time': 'end_time',
+    'status': 'status',
+    'party_size': 'party_size',
+    'table_id': 'table_id',
+    'table_number': 'table__number',
+    'user_id': 'user_id',
+    'username': 'user__username',
+    'special_requests': 'special_requests',
+    'created_at': 'created_at',
+}
+
+RESERVATION_EXPORT_FIELDS = list(_COLUMNS)
+
+
+def reservation_export_rows(params: dict, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[dict]:
+    reservations = filter_export(Reservation.objects.all(), params, 'reservation_time')
+    for reservation_ids in iterate_in_chunks(reservations, chunk_size):
+        rows = (
+            Reservation.objects.filter(id__in=reservation_ids)
+            .order_by('id')
+            .values_list(*_COLUMNS.values())
+        )
+        for values in rows:
+            yield dict(zip(_COLUMNS, values))
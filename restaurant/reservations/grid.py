@@ -0,0 +1,160 @@
+"""
+Availability grid of whole days: for every SLOT_MINUTES slot of the opening
+hours and every party size, how many tables could take the booking.
+
+A day is computed in one pass: the tables and the blocking reservations around
+the day are loaded with two queries, then each table's reservations are swept
+against the sorted slots, giving for every slot how long the table stays free.
+A party fits a table at a slot when the table seats it and stays free for the
+party's default duration.
+
+Grids are cached per date. The key holds a version counter of that date, bumped
+when a reservation touching it is saved or deleted (see the receivers in
+reservations/models.py), and the Table and Restaurant versions, so a grid is
+only recomputed after a change that can alter it.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.core.cache import cache
+from django.utils import timezone
+from restaurant.batching import defer_until_commit
+from restaurant.versioning import bump_named_versions, model_versions, named_versions
+from restaurants.hours import current_schedule
+from restaurants.models import Restaurant, Table
+from .availability import BLOCKING_STATUSES, MAX_DURATION
+from .models import Reservation
+
+SLOT_MINUTES = 15
+PARTY_SIZES = tuple(range(2, 11))
+GRID_CACHE_TIMEOUT = 60 * 60 * 24
+MAX_DAYS = 7
+
+
+def _day_bounds(day):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def _day_version_name(day) -> str:
+    return f'reservation-day:{day.isoformat()}'
+
+
+def grid_dates(start, end) -> set:
+    """Dates whose grid can change with a reservation over [start, end)."""
+    if start is None or end is None:
+        return set()
+    # a slot of the previous day can run into the reservation
+    first = timezone.localdate(start - MAX_DURATION)
+    last = timezone.localdate(end)
+    return {first + timedelta(days=offset) for offset in range((last - first).days + 1)}
+
+
+def invalidate_grid_dates(dates, using='default') -> None:
+    """Drop the cached grids of these dates once the transaction commits."""
+    defer_until_commit(
+        ('reservation_grid_dates', using), bump_named_versions,
+        [_day_version_name(day) for day in dates], using=using,
+    )
+
+
+def _slots(day):
+    start, end = _day_bounds(day)
+    schedule = current_schedule()
+    slots = []
+    moment = start
+    while moment < end:
+        if schedule is None or schedule.is_open_at(moment):
+            slots.append(moment)
+        moment += timedelta(minutes=SLOT_MINUTES)
+    return slots
+
+
+def _free_minutes(slots, intervals):
+    """For each slot, the minutes the table stays free from there (0 if taken).
+
+    intervals: (start, end) of the table's reservations, sorted by start.
+    """
+    starts = [start for start, _ in intervals]
+    # running maximum of the ends, to know if an earlier reservation still covers a slot
+    covered_until = []
+    latest = None
+    for _, end in intervals:
+        latest = end if latest is None or end > latest else latest
+        covered_until.append(latest)
+
+    free = []
+    for slot in slots:
+        index = bisect_left(starts, slot + timedelta(microseconds=1))   # reservations starting <= slot
+        if index and covered_until[index - 1] > slot:
+            free.append(0)
+        elif index < len(starts):
+            free.append((starts[index] - slot) // timedelta(minutes=1))
+        else:
+            free.append(None)   # free until the end of the known bookings
+    return free
+
+
+def compute_day_grid(day, party_sizes=PARTY_SIZES) -> dict:
+    slots = _slots(day)
+    day_start, day_end = _day_bounds(day)
+    longest = max(Reservation.default_duration(size) for size in party_sizes)
+    tables = list(Table.objects.filter(is_available=True).values_list('pk', 'size'))
+    reservations = (
+        Reservation.objects
+        .filter(
+            status__in=BLOCKING_STATUSES,
+            reservation_time__gt=day_start - MAX_DURATION,
+            reservation_time__lt=day_end + timedelta(minutes=longest),
+            end_time__gt=day_start,
+        )
+        .order_by('reservation_time')
+        .values_list('table_id', 'reservation_time', 'end_time')
+    )
+    intervals = defaultdict(list)
+    for table_id, start, end in reservations:
+        intervals[table_id].append((start, end))
+
+    durations = {size: Reservation.default_duration(size) for size in party_sizes}
+    counts = [dict.fromkeys(party_sizes, 0) for _ in slots]
+    for table_id, seats in tables:
+        fitting = [size for size in party_sizes if size <= seats]
+        if not fitting:
+            continue
+        for slot_counts, free in zip(counts, _free_minutes(slots, intervals.get(table_id, []))):
+            for size in fitting:
+                if free is None or free >= durations[size]:
+                    slot_counts[size] += 1
+
+    return {
+        'date': day.isoformat(),
+        'slot_minutes': SLOT_MINUTES,
+        'party_sizes': list(party_sizes),
+        'slots': [
+            {'time': slot.isoformat(), 'available': {str(size): count for size, count in slot_counts.items()}}
+            for slot, slot_counts in zip(slots, counts)
+        ],
+    }
+
+
+def day_grids(first_day, days: int = 1, party_sizes=PARTY_SIZES) -> list:
+    """Grids of days consecutive dates, from the cache where still current."""
+    dates = [first_day + timedelta(days=offset) for offset in range(days)]
+    table_version, restaurant_version = model_versions(Table, Restaurant)
+    day_versions = named_versions(*(_day_version_name(day) for day in dates))
+    sizes = ','.join(str(size) for size in party_sizes)
+    keys = {
+        day: f'reservation-grid:{day.isoformat()}:{version}:{table_version}:{restaurant_version}:{sizes}'
+        for day, version in zip(dates, day_versions)
+    }
+    cached = cache.get_many(keys.values())
+    grids = []
+    for day in dates:
+        grid = cached.get(keys[day])
+        if grid is None:
+            grid = compute_day_grid(day, party_sizes)
+            cache.set(keys[day], grid, GRID_CACHE_TIMEOUT)
+        grids.append(grid)
+    return grids
@@ -0,0 +1,88 @@
+"""
+Lifecycle sweep of overdue reservations.
+
+Reservations nobody closed stay pending/confirmed/seated after the guests are
+long gone, which keeps their tables "taken" for the overlap checks and bloats
+every query over active bookings. sweep_reservations() applies the
+RESERVATION_SWEEP_RULES setting:
+
+    (('pending', 'confirmed'), 'no_show', 'reservation_time', 30)
+
+moves reservations in one of the statuses to the new status once the time
+field is more than the given minutes in the past.
+
+Each rule runs as set-based UPDATEs of at most batch_size rows, one short
+transaction per batch, found on the (status, reservation_time) index. Queryset
+updates skip the save signals, so the availability grids of the touched dates
+are invalidated here.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from .grid import grid_dates, invalidate_grid_dates
+from .models import Reservation
+
+SWEEP_BATCH_SIZE = 500
+SWEEP_TIME_FIELDS = ('reservation_time', 'end_time')
+
+SweepRule = namedtuple('SweepRule', 'statuses status field minutes')
+
+
+def check_sweep_rule(rule) -> SweepRule:
+    rule = SweepRule(*rule)
+    statuses = dict(Reservation.STATUS_CHOICES)
+    unknown = [status for status in (*rule.statuses, rule.status) if status not in statuses]
+    # a rule moving rows to one of its own statuses would find them again forever
+    if unknown or rule.status in rule.statuses or rule.field not in SWEEP_TIME_FIELDS or rule.minutes < 0:
+        raise ImproperlyConfigured(f"Invalid RESERVATION_SWEEP_RULES entry: {rule!r}")
+    return rule
+
+
+def sweep_rules() -> list:
+    """The configured rules, checked against the reservation statuses."""
+    return [check_sweep_rule(rule) for rule in getattr(settings, 'RESERVATION_SWEEP_RULES', ())]
+
+
+def _overdue(rule, now):
+    cutoff = now - timedelta(minutes=rule.minutes)
+    # end_time >= reservation_time, so the first bound keeps end_time rules on the index too
+    bounds = {'reservation_time__lt': cutoff, f'{rule.field}__lt': cutoff}
+    return Reservation.objects.filter(status__in=rule.statuses, **bounds)
+
+
+def _sweep_batch(rule, now, batch_size):
+    """One UPDATE of up to batch_size overdue rows; returns (rows found, rows moved)."""
+    with transaction.atomic():
+        rows = list(
+            _overdue(rule, now).order_by('pk').values_list('pk', 'reservation_time', 'end_time')[:batch_size]
+        )
+        if not rows:
+            return 0, 0
+        # re-filtered, a row changed since the select keeps its new status
+        updated = _overdue(rule, now).filter(pk__in=[pk for pk, _, _ in rows]).update(status=rule.status)
+        dates = set()
+        for _, start, end in rows:
+            dates |= grid_dates(start, end)
+        invalidate_grid_dates(dates)
+    return len(rows), updated
+
+
+def sweep_reservations(now=None, rules=None, batch_size: int = SWEEP_BATCH_SIZE, dry_run: bool = False) -> list:
+    """Apply the rules; returns (rule, number of reservations moved) pairs."""
+    now = now or timezone.now()
+    summary = []
+    for rule in sweep_rules() if rules is None else [check_sweep_rule(rule) for rule in rules]:
+        if dry_run:
+            summary.append((rule, _overdue(rule, now).count()))
+            continue
+        moved = 0
+        while True:
+            found, updated = _sweep_batch(rule, now, batch_size)
+            if not found:
+                break
+            moved += updated
+        summary.append((rule, moved))
+    return summary
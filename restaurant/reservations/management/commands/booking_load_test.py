@@ -0,0 +1,136 @@
+import random
+import statistics
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from reservations.availability import BLOCKING_STATUSES
+from reservations.booking import BookingConflict, book
+from reservations.models import Reservation
+from restaurants.models import Table
+from users.models import User
+
+# Management command to hammer the booking service from concurrent threads
+# Usage: python manage.py booking_load_test [--threads 16] [--bookings 25] [--tables 3]
+# Creates a throw-away user and tables, books random overlapping slots of one
+# evening on them from all threads at once, then checks that no table ended up
+# double booked and reports the throughput. The fixtures are deleted afterwards
+# (unless --keep). Run it against a local database, never production.
+class Command(BaseCommand):
+    help = "Concurrent booking load test: proves there are no double bookings and reports throughput"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--bookings", type=int, default=25, help="Booking attempts per thread")
+        parser.add_argument("--tables", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--keep", action="store_true", help="Keep the fixtures for inspection")
+
+    def handle(self, *args, **options):
+        if min(options["threads"], options["bookings"], options["tables"]) < 1:
+            raise CommandError("--threads, --bookings and --tables must be positive")
+        rng = random.Random(options["seed"])
+        user, tables = self.create_fixtures(options["tables"])
+        try:
+            # one evening a year ahead, 18:00 to 22:00 in 15 minute steps
+            evening = timezone.make_aware(datetime.combine(
+                timezone.localdate() + timedelta(days=365), datetime.min.time()
+            )) + timedelta(hours=18)
+            starts = [evening + timedelta(minutes=15 * step) for step in range(17)]
+            plans = [
+                [(rng.choice(tables), rng.choice(starts), rng.choice((2, 4))) for _ in range(options["bookings"])]
+                for _ in range(options["threads"])
+            ]
+            results = {"booked": 0, "conflicts": 0, "errors": 0}
+            latencies = []
+            lock = threading.Lock()
+            barrier = threading.Barrier(options["threads"])
+
+            def worker(plan):
+                outcomes = {"booked": 0, "conflicts": 0, "errors": 0}
+                timings = []
+                barrier.wait()
+                try:
+                    for table, start, party_size in plan:
+                        began = time.perf_counter()
+                        try:
+                            book(Reservation(user=user, table=table, reservation_time=start, party_size=party_size))
+                            outcomes["booked"] += 1
+                        except BookingConflict:
+                            outcomes["conflicts"] += 1
+                        except Exception as exc:
+                            outcomes["errors"] += 1
+                            self.stderr.write(f"  {type(exc).__name__}: {exc}")
+                        timings.append(time.perf_counter() - began)
+                finally:
+                    connection.close()
+                with lock:
+                    for key, count in outcomes.items():
+                        results[key] += count
+                    latencies.extend(timings)
+
+            threads = [threading.Thread(target=worker, args=(plan,)) for plan in plans]
+            began = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - began
+
+            double_bookings = self.double_bookings(tables)
+            attempts = options["threads"] * options["bookings"]
+            latencies.sort()
+            self.stdout.write(f"  {options['threads']} threads, {attempts} attempts on {len(tables)} tables in {elapsed:.2f}s")
+            self.stdout.write(
+                f"  booked {results['booked']}, conflicts {results['conflicts']}, errors {results['errors']}"
+            )
+            self.stdout.write(
+                f"  throughput {attempts / elapsed:.1f} attempts/s, {results['booked'] / elapsed:.1f} bookings/s"
+            )
+            self.stdout.write(
+                f"  latency p50 {statistics.median(latencies) * 1000:.1f}ms, "
+                f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms, max {latencies[-1] * 1000:.1f}ms"
+            )
+            if double_bookings:
+                for first, second in double_bookings[:20]:
+                    self.stderr.write(f"  overlap: reservations {first} and {second}")
+                raise CommandError(f"{len(double_bookings)} double booking(s) found.")
+            if results["errors"]:
+                raise CommandError(f"{results['errors']} booking(s) failed with an unexpected error.")
+            self.stdout.write(self.style.SUCCESS("No double bookings."))
+        finally:
+            if not options["keep"]:
+                Reservation.objects.filter(table__in=tables).delete()
+                Table.objects.filter(pk__in=[table.pk for table in tables]).delete()
+                user.delete()
+
+    def create_fixtures(self, table_count):
+        tag = uuid.uuid4().hex[:12]
+        user = User.objects.create(username=f"loadtest-{tag}", email=f"loadtest-{tag}@example.invalid")
+        first_number = (Table.objects.aggregate(last=Max("number"))["last"] or 0) + 1
+        tables = [
+            Table.objects.create(number=first_number + offset, size=4)
+            for offset in range(table_count)
+        ]
+        return user, tables
+
+    def double_bookings(self, tables):
+        """Pairs of blocking reservations of the same table that overlap."""
+        overlaps = []
+        latest = {}
+        rows = (
+            Reservation.objects.filter(table__in=tables, status__in=BLOCKING_STATUSES)
+            .order_by("table_id", "reservation_time")
+            .values_list("pk", "table_id", "reservation_time", "end_time")
+        )
+        for pk, table_id, start, end in rows:
+            previous = latest.get(table_id)
+            if previous is not None and previous[1] > start:
+                overlaps.append((previous[0], pk))
+            if previous is None or end > previous[1]:
+                latest[table_id] = (pk, end)
+        return overlaps
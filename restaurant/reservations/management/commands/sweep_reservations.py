@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from reservations.lifecycle import SWEEP_BATCH_SIZE, sweep_reservations
+
+# Management command to close overdue reservations (no-shows, finished tables)
+# Usage: python manage.py sweep_reservations [--dry-run] [--batch-size 500] [--loop [--interval 300]]
+# The rules are the RESERVATION_SWEEP_RULES setting, see reservations/lifecycle.py.
+# Run it from cron, or keep it running with --loop.
+class Command(BaseCommand):
+    help = "Move overdue pending/confirmed/seated reservations to no_show/completed"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only count the overdue reservations")
+        parser.add_argument("--batch-size", type=int, default=SWEEP_BATCH_SIZE)
+        parser.add_argument("--loop", action="store_true", help="Sweep again every --interval seconds")
+        parser.add_argument("--interval", type=int, default=300)
+
+    def handle(self, *args, **options):
+        while True:
+            self.sweep(options)
+            if not options["loop"]:
+                return
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
+
+    def sweep(self, options):
+        started = time.monotonic()
+        summary = sweep_reservations(batch_size=options["batch_size"], dry_run=options["dry_run"])
+        verb = "overdue" if options["dry_run"] else "moved"
+        for rule, count in summary:
+            self.stdout.write(
+                f"  {', '.join(rule.statuses)} -> {rule.status} "
+                f"({rule.minutes} min after {rule.field}): {count} {verb}"
+            )
+        total = sum(count for _, count in summary)
+        message = f"{timezone.localtime():%Y-%m-%d %H:%M:%S} {total} reservation(s) {verb} in {time.monotonic() - started:.2f}s"
+        self.stdout.write(self.style.WARNING(message) if options["dry_run"] else self.style.SUCCESS(message))
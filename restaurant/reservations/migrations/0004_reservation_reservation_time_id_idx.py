@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0003_remove_reservation_time'),
+        ('restaurants', '0001_initial'),
+        ('users', '0002_alter_user_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['-reservation_time', 'id'], name='reservation_time_id_idx'),
+        ),
+    ]
@@ -0,0 +1,154 @@
+# Reservations get a duration and an end time; overlapping bookings of a table
+# are rejected by triggers on SQLite and MySQL (other backends rely on the
+# ReservationSerializer check). Replaces unique_table_reservation, which only
+# caught bookings at the exact same time and also blocked rebooking the time
+# of a cancelled reservation.
+#
+# With binary logging on, MySQL only lets a user create triggers with the
+# SUPER privilege or log_bin_trust_function_creators=1, which hosted servers
+# (PythonAnywhere) do not grant. The migration then skips the triggers with a
+# warning and overlaps are prevented by the row-locked booking path alone
+# (reservations/booking.py); set log_bin_trust_function_creators=1 and
+# migrate reservations back to 0004 and forward again to add them later.
+
+import logging
+from datetime import timedelta
+from django.db import DatabaseError, migrations, models
+import django.core.validators
+
+logger = logging.getLogger(__name__)
+
+BLOCKING_STATUSES = "('pending', 'confirmed', 'seated')"
+MAX_DURATION = 360  # minutes, Reservation.MAX_DURATION
+
+SQLITE_TRIGGER = """
+CREATE TRIGGER {name} BEFORE {event} ON reservations_reservation
+FOR EACH ROW WHEN NEW.status IN {statuses}
+BEGIN
+    SELECT RAISE(ABORT, 'reservation_overlap')
+    WHERE EXISTS (
+        SELECT 1 FROM reservations_reservation r
+        WHERE r.table_id = NEW.table_id
+          AND r.id <> {self_id}
+          AND r.status IN {statuses}
+          AND r.reservation_time > datetime(NEW.reservation_time, '-{max_duration} minutes')
+          AND r.reservation_time < NEW.end_time
+          AND r.end_time > NEW.reservation_time
+    );
+END
+"""
+
+MYSQL_TRIGGER = """
+CREATE TRIGGER {name} BEFORE {event} ON reservations_reservation
+FOR EACH ROW
+BEGIN
+    IF NEW.status IN {statuses} AND EXISTS (
+        SELECT 1 FROM reservations_reservation r
+        WHERE r.table_id = NEW.table_id
+          AND r.id <> {self_id}
+          AND r.status IN {statuses}
+          AND r.reservation_time > NEW.reservation_time - INTERVAL {max_duration} MINUTE
+          AND r.reservation_time < NEW.end_time
+          AND r.end_time > NEW.reservation_time
+    ) THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'reservation_overlap';
+    END IF;
+END
+"""
+
+# ER_TABLEACCESS_DENIED_ERROR (no TRIGGER privilege), ER_SPECIFIC_ACCESS_DENIED_ERROR,
+# ER_BINLOG_CREATE_ROUTINE_NEED_SUPER
+MYSQL_PRIVILEGE_ERRORS = (1142, 1227, 1419)
+
+TRIGGERS = {
+    'sqlite': (SQLITE_TRIGGER, {
+        'reservation_overlap_insert': ('INSERT', '0'),
+        'reservation_overlap_update': ('UPDATE OF table_id, reservation_time, end_time, status', 'NEW.id'),
+    }),
+    'mysql': (MYSQL_TRIGGER, {
+        'reservation_overlap_insert': ('INSERT', '0'),
+        'reservation_overlap_update': ('UPDATE', 'NEW.id'),
+    }),
+}
+
+
+def default_duration(party_size):
+    # Reservation.default_duration at the time of this migration
+    for size, minutes in ((2, 90), (4, 105), (6, 120)):
+        if party_size <= size:
+            return minutes
+    return 150
+
+
+def fill_end_times(apps, schema_editor):
+    Reservation = apps.get_model('reservations', 'Reservation')
+    reservations = list(Reservation.objects.only('reservation_time', 'party_size', 'duration'))
+    for reservation in reservations:
+        minutes = reservation.duration or default_duration(reservation.party_size)
+        reservation.end_time = reservation.reservation_time + timedelta(minutes=minutes)
+    Reservation.objects.bulk_update(reservations, ['end_time'], batch_size=500)
+
+
+def create_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in TRIGGERS:
+        return
+    template, triggers = TRIGGERS[vendor]
+    for name, (event, self_id) in triggers.items():
+        try:
+            schema_editor.execute(template.format(
+                name=name, event=event, self_id=self_id,
+                statuses=BLOCKING_STATUSES, max_duration=MAX_DURATION,
+            ))
+        except DatabaseError as exc:
+            if vendor != 'mysql' or exc.args[0] not in MYSQL_PRIVILEGE_ERRORS:
+                raise
+            logger.warning(
+                'Overlap triggers not created (%s); bookings rely on the row-locked booking path. '
+                'See the header of this migration to add them.', exc.args[1],
+            )
+            drop_triggers(apps, schema_editor)
+            return
+
+
+def drop_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in TRIGGERS:
+        return
+    for name in TRIGGERS[vendor][1]:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0004_reservation_reservation_time_id_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='reservation',
+            name='unique_table_reservation',
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='duration',
+            field=models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(15), django.core.validators.MaxValueValidator(360)]),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='end_time',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_end_times, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reservation',
+            name='end_time',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['table', 'reservation_time'], name='reservation_table_time_idx'),
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
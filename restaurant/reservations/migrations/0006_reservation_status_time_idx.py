@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0005_reservation_duration_overlap'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'reservation_time'], name='reservation_status_time_idx'),
+        ),
+    ]
@@ -1,4 +1,8 @@
+from datetime import timedelta
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
 from users.models import User
 from restaurants.models import Table
 
@@ -18,24 +22,115 @@ class Reservation(models.Model):
         ('no_show', 'No Show'),
     ]
 
+    # minutes a table is held when no duration is given, by largest party size
+    DURATION_BY_PARTY_SIZE = ((2, 90), (4, 105), (6, 120))
+    LARGE_PARTY_DURATION = 150
+    MIN_DURATION = 15
+    # bounds the overlap lookups: nothing that starts earlier can still be running
+    MAX_DURATION = 360
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservations')
     table = models.ForeignKey(Table, on_delete=models.CASCADE, related_name='reservations')
     reservation_time = models.DateTimeField()
     party_size = models.PositiveIntegerField()
+    # minutes; empty means derived from the party size
+    duration = models.PositiveIntegerField(
+        blank=True, null=True,
+        validators=[MinValueValidator(MIN_DURATION), MaxValueValidator(MAX_DURATION)],
+    )
+    end_time = models.DateTimeField(editable=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     special_requests = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
-    # ensure a table cannot be double-booked for the same date and time
+    # a table cannot be double-booked: overlapping reservations are rejected by
+    # ReservationSerializer and by database triggers (migration 0005)
     class Meta:
-        constraints = [
-            models.UniqueConstraint(
-                fields=['table', 'reservation_time'],
-                name='unique_table_reservation'
-            )
-        ]
         ordering = ['-reservation_time']
+        # supports the keyset pagination of the reservation list
+        indexes = [
+            models.Index(fields=['-reservation_time', 'id'], name='reservation_time_id_idx'),
+            # bounded neighbour lookups of the overlap checks
+            models.Index(fields=['table', 'reservation_time'], name='reservation_table_time_idx'),
+            # overdue lookups of the lifecycle sweeper (reservations/lifecycle.py)
+            models.Index(fields=['status', 'reservation_time'], name='reservation_status_time_idx'),
+        ]
+
+    @classmethod
+    def default_duration(cls, party_size):
+        for size, minutes in cls.DURATION_BY_PARTY_SIZE:
+            if party_size <= size:
+                return minutes
+        return cls.LARGE_PARTY_DURATION
+
+    @property
+    def effective_duration(self):
+        return self.duration or self.default_duration(self.party_size)
+
+    def compute_end_time(self):
+        return self.reservation_time + timedelta(minutes=self.effective_duration)
+
+    def save(self, *args, **kwargs):
+        self.end_time = self.compute_end_time()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'end_time' not in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'end_time'}
+        super().save(*args, **kwargs)
     
     # string representation of the reservation
     def __str__(self):
-        return f"Reservation by {self.user.username} for {self.party_size} on {self.reservation_time} (Table {self.table.number})"
\ No newline at end of file
+        return f"Reservation by {self.user.username} for {self.party_size} on {self.reservation_time} (Table {self.table.number})"
+
+
+# Model for WaitlistEntry
+# a party waiting for a table at a fully booked time; when a reservation is
+# cancelled the freed table goes to the best fitting waiting party, which then
+# links to the reservation it got (see reservations/waitlist.py)
+# status can be waiting, promoted, cancelled
+
+class WaitlistEntry(models.Model):
+    STATUS_CHOICES = [
+        ('waiting', 'Waiting'),
+        ('promoted', 'Promoted'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries')
+    party_size = models.PositiveIntegerField()
+    desired_time = models.DateTimeField()
+    # higher goes first among equally fitting parties that waited as long
+    priority = models.PositiveSmallIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
+    reservation = models.OneToOneField(
+        Reservation, on_delete=models.SET_NULL, null=True, blank=True, related_name='waitlist_entry'
+    )
+    special_requests = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name_plural = 'waitlist entries'
+        # promotion looks up the waiting parties around the freed time
+        indexes = [
+            models.Index(fields=['status', 'desired_time'], name='waitlist_status_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"Waitlist entry of {self.user.username} for {self.party_size} on {self.desired_time} ({self.status})"
+
+
+# === SIGNALS ===
+# remember the stay a reservation was loaded with, to invalidate its old dates too
+@receiver(post_init, sender=Reservation)
+def remember_reservation_window(sender, instance, **kwargs):
+    instance._saved_window = (instance.__dict__.get('reservation_time'), instance.__dict__.get('end_time'))
+
+
+# the cached availability grids (reservations/grid.py) of the dates it touches are stale
+@receiver([post_save, post_delete], sender=Reservation)
+def invalidate_reservation_grids(sender, instance, using='default', **kwargs):
+    from .grid import grid_dates, invalidate_grid_dates
+
+    dates = grid_dates(*instance._saved_window) | grid_dates(instance.reservation_time, instance.end_time)
+    invalidate_grid_dates(dates, using=using)
+    instance._saved_window = (instance.reservation_time, instance.end_time)
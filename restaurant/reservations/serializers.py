@@ -1,5 +1,19 @@
-from rest_framework import serializers
-from .models import Reservation
+from datetime import timedelta
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from restaurants.hours import closed_message
+from .availability import BLOCKING_STATUSES, overlapping_reservations
+from .booking import BookingConflict, book
+from .grid import MAX_DAYS as MAX_GRID_DAYS
+from .models import Reservation, WaitlistEntry
+
+
+# the table was booked by someone else between validation and save
+class ReservationConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The table is already booked for an overlapping time.'
+    default_code = 'reservation_overlap'
 
 class ReservationSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.username', read_only=True)
@@ -9,6 +23,125 @@ class ReservationSerializer(serializers.ModelSerializer):
         model = Reservation
         fields = [
             'id', 'user', 'user_name', 'table', 'table_number', 
-            'reservation_time', 'party_size', 
+            'reservation_time', 'party_size', 'duration', 'end_time',
             'status', 'special_requests', 'created_at'
-        ]
\ No newline at end of file
+        ]
+
+    def validate_reservation_time(self, value):
+        # checked against the cached opening hours, see restaurants/hours.py
+        unchanged = self.instance is not None and value == self.instance.reservation_time
+        message = None if unchanged else closed_message(value)
+        if message:
+            raise serializers.ValidationError(message)
+        return value
+
+    def validate(self, attrs):
+        # the table must be free for the whole stay, checked on the
+        # (table, reservation_time) index within Reservation.MAX_DURATION
+        values = {
+            field: attrs.get(field, getattr(self.instance, field, None))
+            for field in ('table', 'reservation_time', 'party_size', 'duration', 'status')
+        }
+        blocking = (values['status'] or 'pending') in BLOCKING_STATUSES
+        if blocking and values['table'] and values['reservation_time'] and values['party_size']:
+            start = values['reservation_time']
+            end_time = Reservation(
+                reservation_time=start, party_size=values['party_size'], duration=values['duration']
+            ).compute_end_time()
+            conflict = overlapping_reservations(
+                values['table'], start, end_time, exclude_pk=getattr(self.instance, 'pk', None),
+            ).order_by('reservation_time').first()
+            if conflict is not None:
+                raise serializers.ValidationError({'reservation_time': (
+                    f"Table {values['table'].number} is already booked from "
+                    f"{timezone.localtime(conflict.reservation_time):%Y-%m-%d %H:%M} to "
+                    f"{timezone.localtime(conflict.end_time):%H:%M}."
+                )})
+        return attrs
+
+    # saved through the booking service: locks the table, re-checks overlaps, retries
+    def create(self, validated_data):
+        return self._book(Reservation(**validated_data))
+
+    def update(self, instance, validated_data):
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        return self._book(instance)
+
+    @staticmethod
+    def _book(reservation):
+        try:
+            return book(reservation)
+        except BookingConflict as exc:
+            raise ReservationConflict(str(exc))
+
+
+# a party waiting for a fully booked time; promoted by reservations/waitlist.py
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    user_name = serializers.CharField(source='user.username', read_only=True)
+
+    class Meta:
+        model = WaitlistEntry
+        fields = [
+            'id', 'user', 'user_name', 'party_size', 'desired_time', 'priority',
+            'status', 'reservation', 'special_requests', 'created_at'
+        ]
+        read_only_fields = ['status', 'reservation']
+
+    def validate_desired_time(self, value):
+        if value <= timezone.now():
+            raise serializers.ValidationError("The desired time is in the past.")
+        message = closed_message(value)
+        if message:
+            raise serializers.ValidationError(message)
+        return value
+
+    # only staff rank parties up
+    def validate_priority(self, value):
+        request = self.context.get('request')
+        if value and not (request and request.user.is_staff):
+            raise serializers.ValidationError("Only staff can set a priority.")
+        return value
+
+
+# query parameters of the availability endpoint
+# ?time=2026-05-01T19:30:00Z&party_size=4&duration=90 (minutes, derived from the party size if left out)
+class AvailabilityParamsSerializer(serializers.Serializer):
+    time = serializers.DateTimeField()
+    party_size = serializers.IntegerField(min_value=1)
+    duration = serializers.IntegerField(
+        min_value=Reservation.MIN_DURATION, max_value=Reservation.MAX_DURATION, required=False
+    )
+
+    def validate_time(self, value):
+        message = closed_message(value)
+        if message:
+            raise serializers.ValidationError(message)
+        return value
+
+    def validate(self, attrs):
+        minutes = attrs.get('duration') or Reservation.default_duration(attrs['party_size'])
+        attrs['duration'] = timedelta(minutes=minutes)
+        return attrs
+
+
+# query parameters of the grid endpoint
+# ?date=2026-05-01&days=7&party_sizes=2,4,6
+class GridParamsSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    days = serializers.IntegerField(min_value=1, max_value=MAX_GRID_DAYS, default=1)
+    party_sizes = serializers.CharField(required=False)
+
+    def validate_party_sizes(self, value):
+        try:
+            sizes = sorted({int(size) for size in value.split(',') if size.strip()})
+        except ValueError:
+            raise serializers.ValidationError("Expected a comma separated list of party sizes.")
+        if not sizes or sizes[0] < 1 or sizes[-1] > 50:
+            raise serializers.ValidationError("Party sizes must be between 1 and 50.")
+        return tuple(sizes)
+
+
+# query parameters of the assignment dry run: ?date=2026-05-01
+class AssignmentParamsSerializer(serializers.Serializer):
+    date = serializers.DateField()
@@ -1,3 +1,403 @@
+import json
+import random
+from importlib import import_module
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, transaction
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from restaurants.models import Table
+from users.models import User
+from .assignment import AssignmentError, apply_assignment, plan_assignment
+from .availability import free_tables
+from .booking import BookingConflict, book
+from .grid import compute_day_grid
+from .lifecycle import SweepRule, sweep_reservations
+from .models import Reservation, WaitlistEntry
 
-# Create your tests here.
+
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username='guest', email='guest@example.com')
+        Table.objects.create(number=1, size=2)
+        four = Table.objects.create(number=2, size=4)
+        six = Table.objects.create(number=3, size=6)
+        Table.objects.create(number=4, size=8, is_available=False)
+        evening = datetime(2030, 5, 1, 18, 30, tzinfo=dt_timezone.utc)
+        Reservation.objects.create(user=user, table=four, reservation_time=evening, party_size=4)
+        Reservation.objects.create(user=user, table=six, reservation_time=evening + timedelta(hours=2), party_size=4, status='cancelled')
+
+    def free_tables(self, **params):
+        response = APIClient().get('/api/reservations/availability/', params)
+        self.assertEqual(response.status_code, 200)
+        return [table['number'] for table in response.json()['tables']]
+
+    def test_free_tables_for_the_whole_stay_smallest_first(self):
+        # table 2 is booked, table 3 only by a cancelled reservation, table 4 is out of service
+        self.assertEqual(self.free_tables(time='2030-05-01T19:30:00Z', party_size=3), [3])
+        self.assertEqual(self.free_tables(time='2030-05-01T20:15:00Z', party_size=3, duration=60), [2, 3])
+        self.assertEqual(self.free_tables(time='2030-05-01T16:00:00Z', party_size=3, duration=180), [3])
+
+    def test_invalid_parameters_are_a_400(self):
+        response = APIClient().get('/api/reservations/availability/', {'time': 'x', 'party_size': 0})
+        self.assertEqual(response.status_code, 400)
+
+
+class OverlapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(username='guest', email='guest@example.com')
+        self.table = Table.objects.create(number=1, size=4)
+
+    def book(self, moment, party_size=2, **data):
+        return self.client.post('/api/reservations/reservations/', {
+            'user': self.user.pk, 'table': self.table.pk, 'reservation_time': moment, 'party_size': party_size, **data,
+        }, format='json')
+
+    def test_stays_of_a_table_cannot_overlap(self):
+        first = self.book('2030-05-01T19:00:00Z', party_size=4)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(self.book('2030-05-01T19:15:00Z').status_code, 400)
+        # back to back stays are fine, before and after
+        self.assertEqual(self.book(first.json()['end_time'], duration=30).status_code, 201)
+        self.assertEqual(self.book('2030-05-01T18:00:00Z', duration=60).status_code, 201)
+        # a booking may be edited without clashing with itself
+        response = self.client.put(f"/api/reservations/reservations/{first.json()['id']}/", {
+            'user': self.user.pk, 'table': self.table.pk, 'reservation_time': '2030-05-01T19:00:00Z', 'party_size': 3,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_the_database_refuses_overlaps_too(self):
+        start = datetime(2030, 5, 1, 19, tzinfo=dt_timezone.utc)
+        Reservation.objects.create(user=self.user, table=self.table, reservation_time=start, party_size=2)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Reservation.objects.create(user=self.user, table=self.table, reservation_time=start + timedelta(minutes=30), party_size=2)
+        # cancelled stays do not block
+        Reservation.objects.update(status='cancelled')
+        Reservation.objects.create(user=self.user, table=self.table, reservation_time=start + timedelta(minutes=30), party_size=2)
+
+    def test_reactivating_a_stay_taken_meanwhile_is_a_conflict(self):
+        first = self.book('2030-05-01T19:00:00Z').json()['id']
+        url = f'/api/reservations/reservations/{first}/update_status/'
+        self.assertEqual(self.client.post(url, {'status': 'cancelled'}).status_code, 200)
+        self.assertEqual(self.book('2030-05-01T19:00:00Z', duration=60).status_code, 201)
+        self.assertEqual(self.client.post(url, {'status': 'confirmed'}).status_code, 409)
+
+    def test_triggers_are_skipped_without_the_mysql_privilege(self):
+        migration = import_module('reservations.migrations.0005_reservation_duration_overlap')
+
+        def execute(sql):
+            statements.append(sql.split()[0])
+            if statements[-1] == 'CREATE':
+                raise OperationalError(error, 'denied')
+
+        schema_editor = mock.Mock(connection=mock.Mock(vendor='mysql'), execute=execute)
+        statements, error = [], 1419
+        with self.assertLogs(migration.logger, 'WARNING'):
+            migration.create_triggers(None, schema_editor)
+        self.assertEqual(statements, ['CREATE', 'DROP', 'DROP'])
+        statements, error = [], 1064        # anything else still fails the migration
+        with self.assertRaises(OperationalError):
+            migration.create_triggers(None, schema_editor)
+
+
+class AvailabilityGridTests(TestCase):
+    day = date(2030, 5, 1)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        generator = random.Random(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create(username='guest', email='guest@example.com')
+            for number in range(12):
+                table = Table.objects.create(number=number, size=generator.choice([2, 4, 6, 8, 10]))
+                moment = datetime(2030, 5, 1, tzinfo=dt_timezone.utc) - timedelta(hours=3)
+                for _ in range(8):
+                    moment += timedelta(minutes=generator.choice([0, 15, 30, 45, 60, 120]))
+                    reservation = Reservation.objects.create(
+                        user=self.user, table=table, reservation_time=moment,
+                        party_size=generator.randint(1, table.size),
+                        status=generator.choice(['pending', 'confirmed', 'cancelled']),
+                    )
+                    moment = reservation.end_time
+
+    def grid(self, **params):
+        response = self.client.get('/api/reservations/availability/grid/', {'date': self.day.isoformat(), **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_grid_matches_the_availability_search(self):
+        grid = compute_day_grid(self.day)
+        for slot in grid['slots'][::7]:
+            start = datetime.fromisoformat(slot['time'])
+            for size in (2, 5, 10):
+                expected = free_tables(start, size, timedelta(minutes=Reservation.default_duration(size))).count()
+                self.assertEqual(slot['available'][str(size)], expected, (slot['time'], size))
+
+    def test_cached_grid_follows_bookings_of_its_day(self):
+        first = self.grid(days=2)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.grid(days=2), first)
+
+        slot = first['days'][0]['slots'][40]
+        start = datetime.fromisoformat(slot['time'])
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation = Reservation.objects.create(
+                user=self.user, table=free_tables(start, 2, timedelta(minutes=90)).first(),
+                reservation_time=start, party_size=2,
+            )
+        self.assertEqual(self.grid()['days'][0]['slots'][40]['available']['2'], slot['available']['2'] - 1)
+        # moved to another day: both days are rebuilt
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation.reservation_time += timedelta(days=3)
+            reservation.save()
+        self.assertEqual(self.grid()['days'][0]['slots'][40]['available'], slot['available'])
+        response = self.client.get('/api/reservations/availability/grid/', {'date': self.day.isoformat(), 'party_sizes': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BookingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='guest', email='guest@example.com')
+        self.table = Table.objects.create(number=1, size=4)
+        self.start = datetime(2030, 5, 1, 19, tzinfo=dt_timezone.utc)
+
+    def reservation(self, minutes=0):
+        return Reservation(
+            user=self.user, table=self.table, reservation_time=self.start + timedelta(minutes=minutes), party_size=2,
+        )
+
+    def test_a_taken_slot_is_a_conflict(self):
+        first = book(self.reservation())
+        with self.assertRaises(BookingConflict) as raised:
+            book(self.reservation(minutes=30))
+        self.assertEqual(raised.exception.conflict, first)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    @mock.patch('reservations.booking.time.sleep')
+    def test_lock_timeouts_are_retried(self, sleep):
+        save = Reservation.save
+        failures = iter([OperationalError('lock wait timeout'), OperationalError('deadlock')])
+
+        def flaky_save(reservation, *args, **kwargs):
+            error = next(failures, None)
+            if error is not None:
+                raise error
+            return save(reservation, *args, **kwargs)
+
+        with mock.patch.object(Reservation, 'save', flaky_save):
+            book(self.reservation())
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+        with mock.patch.object(Reservation, 'save', side_effect=OperationalError('lock wait timeout')):
+            with self.assertRaises(BookingConflict):
+                book(self.reservation(minutes=240))
+
+    def test_a_lost_race_is_a_409(self):
+        client = APIClient()
+        data = {'user': self.user.pk, 'table': self.table.pk, 'reservation_time': self.start.isoformat(), 'party_size': 2}
+        # the slot is taken between validation and booking
+        with mock.patch('reservations.serializers.book', side_effect=BookingConflict('taken')):
+            response = client.post('/api/reservations/reservations/', data, format='json')
+        self.assertEqual(response.status_code, 409)
+
+
+class TableAssignmentTests(TestCase):
+    def setUp(self):
+        self.day = timezone.localdate() + timedelta(days=30)
+        self.evening = datetime.combine(self.day, time(18), tzinfo=timezone.get_current_timezone())
+        self.user = User.objects.create(username='guest', email='guest@example.com')
+        self.two = Table.objects.create(number=1, size=2)
+        self.ten = Table.objects.create(number=2, size=10)
+        # a couple holding the big table
+        self.couple = Reservation.objects.create(
+            user=self.user, table=self.ten, reservation_time=self.evening, party_size=2,
+        )
+
+    def test_plan_moves_small_parties_to_small_tables(self):
+        plan = plan_assignment(self.day)
+        self.assertEqual([(move['reservation'], move['to_table']) for move in plan['moves']], [(self.couple.pk, 1)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(apply_assignment(plan), 1)
+        self.couple.refresh_from_db()
+        self.assertEqual((self.couple.table_id, self.couple.status), (self.two.pk, 'pending'))
+
+    def test_a_booking_made_after_the_plan_stops_it(self):
+        plan = plan_assignment(self.day)
+        Reservation.objects.create(
+            user=self.user, table=self.two, reservation_time=self.evening + timedelta(minutes=30), party_size=2,
+        )
+        with self.assertRaises(AssignmentError):
+            apply_assignment(plan)
+        self.couple.refresh_from_db()
+        self.assertEqual((self.couple.table_id, self.couple.status), (self.ten.pk, 'pending'))
+
+    def test_the_overlap_triggers_are_an_assignment_error(self):
+        plan = plan_assignment(self.day)
+        Reservation.objects.create(
+            user=self.user, table=self.two, reservation_time=self.evening + timedelta(minutes=30), party_size=2,
+        )
+        # skip the check under the locks, the triggers (migration 0005) still refuse the overlap
+        with mock.patch('reservations.assignment.blocking_reservations', return_value=Reservation.objects.none()):
+            with self.assertRaises(AssignmentError):
+                apply_assignment(plan)
+
+    def test_a_changed_booking_stops_the_plan(self):
+        plan = plan_assignment(self.day)
+        Reservation.objects.filter(pk=self.couple.pk).update(status='cancelled')
+        with self.assertRaises(AssignmentError):
+            apply_assignment(plan)
+
+
+class ReservationExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username='guest', email='guest@example.com')
+        table = Table.objects.create(number=7, size=4)
+        start = timezone.now() + timedelta(days=1)
+        self.reservations = [
+            Reservation.objects.create(user=user, table=table, reservation_time=start + timedelta(hours=3 * index), party_size=2)
+            for index in range(3)
+        ]
+        Reservation.objects.filter(pk=self.reservations[2].pk).update(status='cancelled')
+
+    def test_export_streams_the_filtered_rows(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create(username='admin', is_staff=True))
+        response = client.get('/api/reservations/reservations/export/', {'output': 'ndjson', 'status': 'pending'})
+        self.assertEqual(response.status_code, 200)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['reservation_id'] for row in rows], [self.reservations[0].pk, self.reservations[1].pk])
+        self.assertEqual(rows[0]['table_number'], 7)
+
+        output = StringIO()
+        call_command('export_reservations', stdout=output)
+        self.assertEqual(len(output.getvalue().splitlines()), 4)   # header and 3 rows
+
+
+class IdempotentReservationCreateTests(TestCase):
+    def test_retries_book_the_table_once(self):
+        cache.clear()
+        user = User.objects.create(username='guest', email='guest@example.com')
+        table = Table.objects.create(number=1, size=4)
+        data = {
+            'user': user.id, 'table': table.id, 'party_size': 2,
+            'reservation_time': (timezone.now() + timedelta(days=1)).isoformat(),
+        }
+        client = APIClient()
+        statuses = [
+            client.post('/api/reservations/reservations/', data, format='json', HTTP_IDEMPOTENCY_KEY='r').status_code
+            for _ in range(3)
+        ]
+        self.assertEqual(statuses, [201, 201, 201])
+        self.assertEqual(Reservation.objects.count(), 1)
+
+
+class ReservationSweepTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.user = User.objects.create(username='guest', email='guest@example.com')
+        table = Table.objects.create(number=1, size=4)
+        reservations = []
+        for index in range(40):
+            reservation = Reservation(
+                user=self.user, table=table, reservation_time=self.now - timedelta(days=3) + timedelta(hours=3 * index),
+                party_size=2, status=('pending', 'confirmed', 'seated', 'completed')[index % 4],
+            )
+            reservation.end_time = reservation.compute_end_time()
+            reservations.append(reservation)
+        Reservation.objects.bulk_create(reservations)
+        cutoff = self.now - timedelta(minutes=30)
+        self.no_shows = sum(1 for r in reservations if r.status in ('pending', 'confirmed') and r.reservation_time < cutoff)
+        self.completed = sum(1 for r in reservations if r.status == 'seated' and r.end_time < cutoff)
+
+    def test_overdue_reservations_are_closed_in_batches(self):
+        output = StringIO()
+        call_command('sweep_reservations', '--dry-run', stdout=output)
+        self.assertIn(f'{self.no_shows} overdue', output.getvalue())
+        self.assertFalse(Reservation.objects.filter(status='no_show').exists())
+
+        summary = sweep_reservations(now=self.now, batch_size=7)
+        self.assertEqual([moved for _, moved in summary], [self.no_shows, self.completed])
+        cutoff = self.now - timedelta(minutes=30)
+        self.assertFalse(Reservation.objects.filter(status__in=['pending', 'confirmed'], reservation_time__lt=cutoff).exists())
+        # upcoming ones are left alone
+        self.assertTrue(Reservation.objects.filter(status__in=['pending', 'confirmed']).exists())
+        self.assertEqual([moved for _, moved in sweep_reservations(now=self.now)], [0, 0])
+
+    def test_rules_are_checked(self):
+        for rule in [(('pending',), 'bogus', 'end_time', 5), (('seated', 'completed'), 'completed', 'end_time', 30)]:
+            with self.settings(RESERVATION_SWEEP_RULES=[rule]):
+                with self.assertRaises(ImproperlyConfigured):
+                    sweep_reservations()
+        with self.assertRaises(ImproperlyConfigured):
+            sweep_reservations(now=self.now, rules=[SweepRule(('seated', 'completed'), 'completed', 'end_time', 30)])
+        rule = SweepRule(('seated',), 'completed', 'end_time', 0)
+        ((_, moved),) = sweep_reservations(now=self.now, rules=[rule])
+        self.assertGreaterEqual(moved, self.completed)
+
+
+class WaitlistTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.start = timezone.now().replace(second=0, microsecond=0) + timedelta(days=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create(username='guest', email='guest@example.com')
+            self.staff = User.objects.create(username='host', email='host@example.com', is_staff=True)
+            self.table = Table.objects.create(number=1, size=4)
+            Table.objects.create(number=2, size=8)
+            self.booked = Reservation.objects.create(
+                user=self.user, table=self.table, reservation_time=self.start, party_size=4, status='confirmed',
+            )
+            self.later = Reservation.objects.create(
+                user=self.user, table=self.table, reservation_time=self.start + timedelta(minutes=150), party_size=2,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def wait(self, party_size, minutes, client=None, **data):
+        return (client or self.client).post('/api/reservations/waitlist/', {
+            'user': self.user.pk, 'party_size': party_size,
+            'desired_time': (self.start + timedelta(minutes=minutes)).isoformat(), **data,
+        })
+
+    def cancel(self, reservation_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/reservations/reservations/{reservation_id}/update_status/', {'status': 'cancelled'})
+        self.assertEqual(response.status_code, 200)
+        return response.json().get('waitlist_entry')
+
+    def test_the_best_fitting_party_is_promoted(self):
+        couple = self.wait(2, 0).json()['id']
+        four = self.wait(4, 15).json()['id']
+        clash = self.wait(4, 60).json()['id']      # would run into the later booking
+        self.wait(6, 0)                            # does not fit the table
+        staff = APIClient()
+        staff.force_authenticate(self.staff)
+        priority = self.wait(4, 15, client=staff, priority=5).json()['id']
+
+        self.assertEqual(self.cancel(self.booked.pk), four)
+        entry = WaitlistEntry.objects.get(pk=four)
+        self.assertEqual((entry.status, entry.reservation.table_id), ('promoted', self.table.pk))
+        self.assertEqual(entry.reservation.reservation_time, self.start + timedelta(minutes=15))
+        # same fit and wait: the priority decides; a stay that does not fit is skipped
+        self.assertEqual(self.cancel(entry.reservation_id), priority)
+        self.assertEqual(self.cancel(WaitlistEntry.objects.get(pk=priority).reservation_id), couple)
+        self.assertEqual(WaitlistEntry.objects.get(pk=clash).status, 'waiting')
+
+    def test_entries_are_validated_and_cancellable(self):
+        self.assertEqual(self.wait(4, 0, priority=5).status_code, 400)      # priority is for staff
+        self.assertEqual(self.wait(2, -3 * 24 * 60).status_code, 400)       # in the past
+        entry = self.wait(2, 0).json()['id']
+        self.assertEqual(self.client.post(f'/api/reservations/waitlist/{entry}/cancel/').json(), {'status': 'cancelled'})
+        self.assertEqual(self.client.post(f'/api/reservations/waitlist/{entry}/cancel/').status_code, 400)
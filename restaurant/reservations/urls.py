@@ -1,10 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ReservationViewSet
+from .views import (
+    ReservationViewSet, WaitlistEntryViewSet, AvailabilityView, AvailabilityGridView, AssignmentPlanView
+)
 
 router = DefaultRouter()
 router.register(r'reservations', ReservationViewSet)
+router.register(r'waitlist', WaitlistEntryViewSet)
 
 urlpatterns = [
+    path('availability/', AvailabilityView.as_view(), name='reservation-availability'),
+    path('availability/grid/', AvailabilityGridView.as_view(), name='reservation-availability-grid'),
+    path('availability/assignments/', AssignmentPlanView.as_view(), name='reservation-assignment-plan'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
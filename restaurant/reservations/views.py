@@ -1,22 +1,133 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from .models import Reservation
-from .serializers import ReservationSerializer
+from rest_framework.views import APIView
+from restaurants.serializers import TableSerializer
+from restaurant.exports import ExportParamsSerializer, streaming_export
+from restaurant.idempotency import IdempotentCreateMixin
+from .exports import RESERVATION_EXPORT_FIELDS, reservation_export_rows
+from .assignment import plan_assignment
+from .availability import free_tables
+from .booking import BookingConflict, book
+from .grid import PARTY_SIZES, day_grids
+from .models import Reservation, WaitlistEntry
+from .serializers import (
+    AssignmentParamsSerializer, AvailabilityParamsSerializer, GridParamsSerializer, ReservationConflict,
+    ReservationSerializer, WaitlistEntrySerializer
+)
+from .waitlist import frees_table, promote_waitlist
 
-class ReservationViewSet(viewsets.ModelViewSet):
-    queryset = Reservation.objects.all()
+class ReservationViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
+    queryset = Reservation.objects.select_related('user', 'table')
     serializer_class = ReservationSerializer
+    cursor_ordering = ('-reservation_time', 'id')
     
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
         reservation = self.get_object()
         new_status = request.data.get('status')
         if new_status in dict(Reservation.STATUS_CHOICES).keys():
+            old_status = reservation.status
             reservation.status = new_status
-            reservation.save()
-            return Response({'status': 'status updated'})
+            try:
+                # reactivating takes the table again, see reservations/booking.py
+                book(reservation)
+            except BookingConflict as exc:
+                raise ReservationConflict(str(exc))
+            data = {'status': 'status updated'}
+            # a cancelled table goes to the best fitting waiting party
+            if frees_table(old_status, reservation):
+                entry = promote_waitlist(reservation.table_id, reservation.reservation_time, reservation.end_time)
+                if entry is not None:
+                    data['waitlist_entry'] = entry.pk
+                    data['reservation'] = entry.reservation_id
+            return Response(data)
         return Response(
             {'error': 'Invalid status'}, 
             status=status.HTTP_400_BAD_REQUEST
-        )
\ No newline at end of file
+        )
+
+    # streamed export of reservations in constant memory
+    # ?start=YYYY-MM-DD&end=YYYY-MM-DD&status=confirmed,seated&output=csv|ndjson
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        params = ExportParamsSerializer(
+            data=request.query_params, context={'status_choices': dict(Reservation.STATUS_CHOICES)}
+        )
+        params.is_valid(raise_exception=True)
+        return streaming_export(
+            request,
+            reservation_export_rows(params.validated_data),
+            RESERVATION_EXPORT_FIELDS,
+            params.validated_data['output'],
+            'reservations',
+        )
+
+
+# Parties waiting for a fully booked time, promoted when a table is cancelled
+
+class WaitlistEntryViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
+    queryset = WaitlistEntry.objects.select_related('user')
+    serializer_class = WaitlistEntrySerializer
+    cursor_ordering = ('created_at', 'id')
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        entry = self.get_object()
+        if entry.status != 'waiting':
+            return Response(
+                {'error': f'The entry is already {entry.status}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        entry.status = 'cancelled'
+        entry.save(update_fields=['status'])
+        return Response({'status': 'cancelled'})
+
+
+# Free tables for a party: ?time=2026-05-01T19:30:00Z&party_size=4&duration=90
+# one query, smallest fitting tables first, see reservations/availability.py
+
+class AvailabilityView(APIView):
+    def get(self, request):
+        params = AvailabilityParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start = params.validated_data['time']
+        duration = params.validated_data['duration']
+        tables = free_tables(start, params.validated_data['party_size'], duration)
+        return Response({
+            'time': start,
+            'end': start + duration,
+            'party_size': params.validated_data['party_size'],
+            'tables': TableSerializer(tables, many=True).data,
+        })
+
+
+# Slot grid of the booking widget: ?date=2026-05-01&days=7&party_sizes=2,4,6
+# free tables per 15 minute slot and party size, cached per date, see reservations/grid.py
+
+class AvailabilityGridView(APIView):
+    def get(self, request):
+        params = GridParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        grids = day_grids(
+            params.validated_data['date'],
+            params.validated_data['days'],
+            params.validated_data.get('party_sizes', PARTY_SIZES),
+        )
+        return Response({'days': grids})
+
+
+# Dry run of the table assignment optimizer for a day: ?date=2026-05-01
+# the moves that would seat the day's bookings best-fit, see reservations/assignment.py;
+# python manage.py assign_tables applies them
+
+class AssignmentPlanView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        params = AssignmentParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        plan = plan_assignment(params.validated_data['date'])
+        plan.pop('snapshot')
+        return Response(plan)
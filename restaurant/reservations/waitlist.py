@@ -0,0 +1,90 @@
+"""
+Promotion of waiting parties to freed tables.
+
+When a reservation stops blocking its table (cancelled through
+ReservationViewSet.update_status), promote_waitlist() offers the table to
+the waiting parties whose stay would overlap the freed time, best first:
+
+1. party size fit: the fewest empty seats at this table,
+2. wait time: the earliest entry,
+3. priority: the highest.
+
+The candidates come from the (status, desired_time) index, ranked and limited
+in SQL. The table's blocking reservations around the freed time are loaded
+once, and the first candidate whose whole stay is free gets a reservation.
+
+Promotion is one short transaction that holds the table row lock, like any
+booking of the table (reservations/booking.py). It also locks the chosen
+waitlist rows and skips rows another promotion holds. Two cancellations
+freeing different tables at the same time therefore cannot promote the same
+party, and a booking racing for the table waits for the lock.
+"""
+from django.db import transaction
+from django.db.models import F, Value
+from django.utils import timezone
+from restaurants.models import Table
+from .availability import BLOCKING_STATUSES, MAX_DURATION, overlapping_reservations
+from .booking import BookingConflict, book
+from .models import Reservation, WaitlistEntry
+
+# ranked candidates looked at per freed table
+PROMOTION_CANDIDATES = 20
+
+
+def frees_table(old_status: str, reservation) -> bool:
+    """The status change gives the rest of the reservation's stay back."""
+    return (
+        old_status in BLOCKING_STATUSES
+        and reservation.status not in BLOCKING_STATUSES
+        and reservation.end_time > timezone.now()
+    )
+
+
+def _stay(entry):
+    return Reservation(reservation_time=entry.desired_time, party_size=entry.party_size).compute_end_time()
+
+
+@transaction.atomic
+def promote_waitlist(table_id, start, end, now=None):
+    """Book the table for the best fitting waiting party; returns its entry or None."""
+    now = now or timezone.now()
+    table = Table.objects.select_for_update().get(pk=table_id)
+    if not table.is_available:
+        return None
+    candidates = list(
+        WaitlistEntry.objects
+        .select_for_update(skip_locked=True)
+        .filter(
+            status='waiting',
+            desired_time__gt=max(start - MAX_DURATION, now),
+            desired_time__lt=end,
+            party_size__lte=table.size,
+        )
+        .annotate(spare_seats=Value(table.size) - F('party_size'))
+        .order_by('spare_seats', 'created_at', '-priority')[:PROMOTION_CANDIDATES]
+    )
+    if not candidates:
+        return None
+    latest_end = max(_stay(entry) for entry in candidates)
+    taken = list(
+        overlapping_reservations(table.pk, min(entry.desired_time for entry in candidates), latest_end)
+        .values_list('reservation_time', 'end_time')
+    )
+    for entry in candidates:
+        entry_end = _stay(entry)
+        if any(taken_start < entry_end and entry.desired_time < taken_end for taken_start, taken_end in taken):
+            continue
+        reservation = Reservation(
+            user_id=entry.user_id, table=table, reservation_time=entry.desired_time,
+            party_size=entry.party_size, special_requests=entry.special_requests,
+        )
+        try:
+            # the table lock is already held, this only re-checks and saves
+            book(reservation, attempts=1)
+        except BookingConflict:
+            continue
+        entry.status = 'promoted'
+        entry.reservation = reservation
+        entry.save(update_fields=['status', 'reservation'])
+        return entry
+    return None
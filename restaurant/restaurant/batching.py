@@ -0,0 +1,54 @@
+"""
+Per-transaction batching of on_commit work.
+
+Signal receivers that fire once per row (order lines, status changes, ...) hand
+their item to defer_until_commit(). Items of the same key are collected for the
+whole transaction and the callback runs once, with all of them, when it commits.
+Outside of an atomic block on_commit fires immediately, so autocommit code keeps
+its behaviour.
+"""
+import threading
+from typing import Callable, Hashable, Iterable
+
+_batches = threading.local()
+
+
+def _registry(using: str) -> dict:
+    registry = getattr(_batches, using, None)
+    if registry is None:
+        registry = {}
+        setattr(_batches, using, registry)
+    return registry
+
+
+class _CommitBatch:
+    """on_commit callback holding the (deduplicated) items of one transaction."""
+
+    def __init__(self, key: Hashable, callback: Callable[[list], None], using: str) -> None:
+        self.key = key
+        self.callback = callback
+        self.using = using
+        self.items: dict = {}
+
+    def __call__(self) -> None:
+        registry = _registry(self.using)
+        if registry.get(self.key) is self:
+            del registry[self.key]
+        self.callback(list(self.items))
+
+
+def defer_until_commit(key: Hashable, callback: Callable[[list], None], items: Iterable, using: str = 'default') -> None:
+    """Queue items for callback, called once per transaction at commit time."""
+    from django.db import transaction
+
+    connection = transaction.get_connection(using)
+    registry = _registry(using)
+    batch = registry.get(key)
+    # a rolled back (or already run) batch is no longer in run_on_commit
+    if batch is None or not any(entry[1] is batch for entry in connection.run_on_commit):
+        batch = _CommitBatch(key, callback, using)
+        registry[key] = batch
+        batch.items.update(dict.fromkeys(items))
+        transaction.on_commit(batch, using=using)
+    else:
+        batch.items.update(dict.fromkeys(items))
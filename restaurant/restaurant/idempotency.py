@@ -0,0 +1,87 @@
+"""
+Idempotency-Key support for create endpoints.
+
+Mobile clients retry POSTs on flaky networks. A viewset using
+IdempotentCreateMixin stores the first successful response of a key in the
+cache and replays it for every retry within IDEMPOTENCY_KEY_TTL, so a retry
+costs one cache lookup instead of a second write. Keys are scoped per endpoint
+and per user, and bound to the request body: reusing a key for a different
+payload is rejected with 422.
+"""
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+IN_FLIGHT_TIMEOUT = 60  # seconds a key stays locked while its first request runs
+
+
+class IdempotentCreateMixin:
+    """Replays the stored response of a create() for a repeated Idempotency-Key."""
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cache_key = self._idempotency_cache_key(request, key)
+        fingerprint = hashlib.sha256(
+            json.dumps(request.data, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+        # cache.add is atomic: only the first request of a key gets to run
+        if not cache.add(cache_key, {'fingerprint': fingerprint, 'in_flight': True}, IN_FLIGHT_TIMEOUT):
+            return self._replay(cache.get(cache_key), fingerprint)
+
+        try:
+            response = super().create(request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        if status.is_success(response.status_code):
+            cache.set(cache_key, {
+                'fingerprint': fingerprint,
+                'status': response.status_code,
+                'data': response.data,
+                'headers': {name: value for name, value in response.items() if name == 'Location'},
+            }, settings.IDEMPOTENCY_KEY_TTL)
+        else:
+            # failed requests are not remembered, the client may fix them and retry
+            cache.delete(cache_key)
+        return response
+
+    def _idempotency_cache_key(self, request, key: str) -> str:
+        user = request.user.pk if request.user and request.user.is_authenticated else 'anon'
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return f'idempotency:{self.basename}:{user}:{digest}'
+
+    def _replay(self, stored, fingerprint: str) -> Response:
+        if stored is None:
+            # the first request failed or expired in between, let the client retry
+            return Response(
+                {'error': 'A request with this Idempotency-Key was just processed, retry'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if stored['fingerprint'] != fingerprint:
+            return Response(
+                {'error': f'{IDEMPOTENCY_HEADER} was already used with a different request body'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if stored.get('in_flight'):
+            return Response(
+                {'error': 'A request with this Idempotency-Key is still being processed'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        response = Response(stored['data'], status=stored['status'], headers=stored['headers'])
+        response['Idempotent-Replayed'] = 'true'
+        return response
@@ -0,0 +1,209 @@
+"""
+Responsive variants of uploaded images.
+
+Every image field listed with track_image_variants() gets resized copies
+(thumb, card, full) in WebP and JPEG. Their names are kept on the row in a JSON
+field next to the SHA-256 of the source they were made from:
+
+    {"source": "menu/soup.png", "hash": "<sha256>",
+     "thumb": {"webp": "variants/menu/soup-<hash>-thumb.webp", "jpeg": ...}, ...}
+
+Resizing runs in a process pool once the upload is committed, so neither the
+request nor the GIL pays for it. Variants are only rendered again when the
+content hash of the source changes; re-saving a row or re-uploading the same
+file costs at most one hash. Existing media is handled by the
+generate_image_variants management command.
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from restaurant.versioning import bump_model_version
+
+logger = logging.getLogger(__name__)
+
+# name -> bounding box; images are only ever scaled down
+IMAGE_VARIANTS = {
+    'thumb': (160, 160),
+    'card': (480, 360),
+    'full': (1280, 1280),
+}
+IMAGE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANTS_DIR = 'variants'
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def render_variants(data: bytes) -> dict:
+    """{variant: {format: encoded bytes}} of one source image (runs in a worker)."""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ('RGB', 'L'):
+            # flatten transparency on white, JPEG has no alpha channel
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+            image = background
+        image = image.convert('RGB')
+
+        rendered = {}
+        for variant, size in IMAGE_VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail(size, Image.LANCZOS)
+            rendered[variant] = {}
+            for extension, (pil_format, options) in IMAGE_FORMATS.items():
+                buffer = io.BytesIO()
+                resized.save(buffer, pil_format, **options)
+                rendered[variant][extension] = buffer.getvalue()
+        return rendered
+
+
+def variant_name(source_name: str, digest: str, variant: str, extension: str) -> str:
+    stem = os.path.splitext(source_name)[0]
+    return f'{VARIANTS_DIR}/{stem}-{digest[:12]}-{variant}.{extension}'
+
+
+def store_variants(source_name: str, digest: str, rendered: dict) -> dict:
+    variants = {'source': source_name, 'hash': digest}
+    for variant, encoded in rendered.items():
+        variants[variant] = {}
+        for extension, content in encoded.items():
+            name = variant_name(source_name, digest, variant, extension)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            variants[variant][extension] = default_storage.save(name, ContentFile(content))
+    return variants
+
+
+def variant_names(variants: dict) -> set:
+    return {name for variant in IMAGE_VARIANTS for name in ((variants or {}).get(variant) or {}).values()}
+
+
+def variant_urls(variants: dict, request=None) -> dict:
+    """{variant: {format: url}} for a serializer, absolute when a request is given."""
+    urls = {}
+    for variant in IMAGE_VARIANTS:
+        names = (variants or {}).get(variant)
+        if names:
+            urls[variant] = {
+                extension: request.build_absolute_uri(default_storage.url(name)) if request else default_storage.url(name)
+                for extension, name in names.items()
+            }
+    return urls
+
+
+# === PROCESS POOL ===
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: forking a threaded server process is not safe
+                _executor = ProcessPoolExecutor(
+                    max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+    return _executor
+
+
+# === VARIANT STATE OF A ROW ===
+
+def pending_source(instance, field_name: str, variants_field: str, force: bool = False):
+    """(source name, bytes, digest) when the variants are out of date, else None.
+
+    A variants dict made from the same file name is current without reading it;
+    a new name is hashed, and an unchanged hash only records the new name.
+    A removed image yields ('', b'', '').
+    """
+    field_file = getattr(instance, field_name)
+    variants = getattr(instance, variants_field) or {}
+    if not field_file:
+        return ('', b'', '') if variants else None
+    if not force and variants.get('source') == field_file.name and variants.get('hash'):
+        return None
+    with field_file.open('rb') as source:
+        data = source.read()
+    digest = content_hash(data)
+    if not force and variants.get('hash') == digest:
+        save_variants(instance, variants_field, {**variants, 'source': field_file.name})
+        return None
+    return field_file.name, data, digest
+
+
+def save_variants(instance, variants_field: str, variants: dict) -> None:
+    # a queryset update: no signals, the row itself is not saved again
+    type(instance)._default_manager.filter(pk=instance.pk).update(**{variants_field: variants})
+    setattr(instance, variants_field, variants)
+    # cached payloads of the model (menu snapshot, ...) embed the variant urls
+    bump_model_version(type(instance))
+
+
+def apply_variants(instance, variants_field: str, source_name: str, digest: str, rendered: dict) -> None:
+    """Store rendered variants (none for a removed image) and drop the replaced files."""
+    old_names = variant_names(getattr(instance, variants_field))
+    variants = store_variants(source_name, digest, rendered) if source_name else {}
+    save_variants(instance, variants_field, variants)
+    for name in old_names - variant_names(variants):
+        default_storage.delete(name)
+
+
+def _finish_in_background(label: str, pk, field_name: str, variants_field: str, source_name: str, digest: str, future) -> None:
+    try:
+        rendered = future.result()
+        instance = apps.get_model(label)._default_manager.filter(pk=pk).first()
+        # skip results overtaken by a newer upload
+        if instance is not None and getattr(instance, field_name).name == source_name:
+            apply_variants(instance, variants_field, source_name, digest, rendered)
+    except Exception:
+        logger.exception('Could not build image variants of %s %s', label, pk)
+    finally:
+        # runs in a thread of the executor, whose connection is never reused
+        connection.close()
+
+
+def schedule_variants(instance, field_name: str, variants_field: str) -> None:
+    """Render the variants of a committed row in the process pool if they are stale."""
+    pending = pending_source(instance, field_name, variants_field)
+    if pending is None:
+        return
+    source_name, data, digest = pending
+    if not data:
+        apply_variants(instance, variants_field, '', '', {})
+        return
+    if not getattr(settings, 'IMAGE_VARIANTS_ASYNC', True):
+        apply_variants(instance, variants_field, source_name, digest, render_variants(data))
+        return
+    future = get_executor().submit(render_variants, data)
+    future.add_done_callback(
+        lambda done: _finish_in_background(
+            instance._meta.label, instance.pk, field_name, variants_field, source_name, digest, done
+        )
+    )
+
+
+def track_image_variants(model, field_name: str = 'image', variants_field: str = 'image_variants') -> None:
+    """Keep model.<variants_field> in sync with uploads to model.<field_name>."""
+    def on_save(sender, instance, using='default', **kwargs):
+        transaction.on_commit(lambda: schedule_variants(instance, field_name, variants_field), using=using)
+
+    post_save.connect(on_save, sender=model, weak=False, dispatch_uid=f'track_image_variants:{model._meta.label_lower}')
@@ -0,0 +1,114 @@
+import json
+import operator
+from functools import reduce
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class StableCursorPagination(CursorPagination):
+    """
+    Keyset pagination shared by every list endpoint.
+
+    Views declare their order with `cursor_ordering`; the last field must be
+    unique (usually 'id'). The cursor holds the values of every ordering field
+    of the row it stopped at, and the next page is the rows after that tuple:
+
+        (order > 3) OR (order = 3 AND id > 41)
+
+    so pages never skip or repeat rows, even when the leading field repeats
+    (DRF's CursorPagination positions on the first field only and falls back
+    to an OFFSET among equal values). Deep pages cost the same as the first one.
+    Clients may opt in to bigger pages with ?page_size=, capped at max_page_size.
+    """
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        self.ordering = getattr(view, 'cursor_ordering', self.ordering)
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor is not None else None
+
+        ordering = [_flip(field) for field in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        try:
+            if position is not None:
+                queryset = queryset.filter(_after(ordering, position))
+            # one extra row tells whether there is a page beyond this one
+            results = list(queryset[:self.page_size + 1])
+        except (ValueError, ValidationError):
+            # position values that do not parse as the field's type
+            raise NotFound(self.invalid_cursor_message)
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        # a cursor from an empty page (its rows were deleted) starts from the old position
+        self.next_position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else position
+        self.previous_position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=json.dumps(self.next_position)))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=json.dumps(self.previous_position)))
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=cursor.reverse, position=position)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(None if value is None else str(value))
+        return values
+
+
+def _flip(field: str) -> str:
+    return field[1:] if field.startswith('-') else '-' + field
+
+
+def _after(ordering, position) -> Q:
+    """Rows strictly after position in this ordering (lexicographic on the fields)."""
+    conditions = []
+    equal = Q()
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        lookup = '__lt' if field.startswith('-') else '__gt'
+        conditions.append(equal & Q(**{name + lookup: value}))
+        equal &= Q(**{name: value})
+    return reduce(operator.or_, conditions)
@@ -0,0 +1,118 @@
+"""
+HTTP response cache for read endpoints, invalidated per model.
+
+A view opts in by naming the models its responses are built from:
+
+    class MenuItemViewSet(viewsets.ModelViewSet):
+        cache_dependencies = (MenuItem, MenuCategory, SpecialOffer)
+        cache_per_day = True          # output also depends on today's date
+
+GET/HEAD responses of the list and retrieve actions are stored in the cache
+under the path, query string, Accept header and auth scope (anonymous, or a
+hash of the bearer token / session cookie) plus the current versions of those
+models (restaurant/versioning.py). Any save or delete of a dependency bumps its
+version, so stale entries are never read again. A hit is answered from the
+cache without entering DRF or the ORM, and carries an ETag and Last-Modified
+for conditional requests (If-None-Match / If-Modified-Since -> 304).
+"""
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from restaurant.versioning import model_versions
+
+CACHED_ACTIONS = ('list', 'retrieve')
+CACHED_HEADERS = ('Content-Type', 'Allow', 'Vary')
+
+
+def auth_scope(request) -> str:
+    """Who the response is for, read from the request without a query."""
+    credentials = request.headers.get('Authorization', '')
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+    if not credentials and not session:
+        return 'anonymous'
+    return hashlib.sha256(f'{credentials}\n{session}'.encode()).hexdigest()
+
+
+def _not_modified(request, etag: str, last_modified: float) -> bool:
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return etag in parse_etags(if_none_match) or if_none_match.strip() == '*'
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(last_modified) <= since
+
+
+class ResponseCacheMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 60 * 60)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, '_response_cache_key', None)
+        if key and self._cacheable(response):
+            entry = {
+                'status': response.status_code,
+                'content': response.content,
+                'headers': {name: response[name] for name in CACHED_HEADERS if response.has_header(name)},
+                'etag': '"%s"' % hashlib.sha256(response.content).hexdigest()[:32],
+                'last_modified': time.time(),
+            }
+            cache.set(key, entry, self.timeout)
+            return self._respond(request, entry, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        dependencies = getattr(view_class, 'cache_dependencies', None)
+        if not dependencies or request.method not in ('GET', 'HEAD'):
+            return None
+        actions = getattr(view_func, 'actions', None)
+        if actions is not None and actions.get('get') not in CACHED_ACTIONS:
+            return None
+
+        key_parts = [
+            request.path,
+            request.META.get('QUERY_STRING', ''),
+            request.headers.get('Accept', ''),
+            auth_scope(request),
+            '.'.join(str(version) for version in model_versions(*dependencies)),
+        ]
+        if getattr(view_class, 'cache_per_day', False):
+            key_parts.append(timezone.localdate().isoformat())
+        key = 'response-cache:' + hashlib.sha256('\n'.join(key_parts).encode()).hexdigest()
+
+        entry = cache.get(key)
+        if entry is None:
+            request._response_cache_key = key
+            return None
+        return self._respond(request, entry)
+
+    @staticmethod
+    def _cacheable(response) -> bool:
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and 'no-store' not in response.get('Cache-Control', '')
+        )
+
+    @staticmethod
+    def _respond(request, entry, response=None):
+        """The cached response, a 304 when the client copy is current."""
+        if _not_modified(request, entry['etag'], entry['last_modified']):
+            response = HttpResponseNotModified()
+        elif response is None:
+            response = HttpResponse(entry['content'], status=entry['status'])
+            for name, value in entry['headers'].items():
+                response[name] = value
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        # clients revalidate every time, the server side answers from the cache
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Accept', 'Authorization', 'Cookie'))
+        return response
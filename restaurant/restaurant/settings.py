@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 from pathlib import Path
 import os 
+import sys
 import environ # pyright: ignore[reportMissingImports]
 
 
@@ -46,6 +48,7 @@ INSTALLED_APPS = [
     'orders',
     'reviews',
     'reservations',
+    'analytics',
     'rest_framework', # requied for api
     "rest_framework_simplejwt", 
  
@@ -59,6 +62,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     "security.middleware.SecurityMiddleware",  # 👈 our custom one
+    # cached GET responses of views declaring cache_dependencies
+    "restaurant.response_cache.ResponseCacheMiddleware",
     
 ]
 
@@ -82,6 +87,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'restaurant.wsgi.application'
+# served by uvicorn workers (see Procfile) so the live order stream can hold connections
+ASGI_APPLICATION = 'restaurant.asgi.application'
 
 
 # Database
@@ -114,9 +121,61 @@ else:
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            "OPTIONS": {
+                # take the write lock when a transaction starts, so concurrent
+                # bookings queue instead of failing on lock upgrade (reservations/booking.py)
+                "transaction_mode": "IMMEDIATE",
+                "timeout": 20,
+            },
+        }
+    }
+
+
+
+# Cache
+# shared through the database by default: idempotency keys and the model
+# version counters bumped by management commands (restaurant/versioning.py)
+# must reach every worker; run `python manage.py createcachetable` on deploy
+# (see Procfile). Local memory is one cache per process, used for DEBUG and
+# the tests, or with DJANGO_CACHE=locmem for a single-process server.
+
+TESTING = sys.argv[1:2] == ["test"]
+CACHE_BACKEND = os.environ.get("DJANGO_CACHE", "locmem" if DEBUG or TESTING else "db")
+
+if CACHE_BACKEND == "db":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "django_cache",
         }
     }
+elif CACHE_BACKEND == "locmem":
+    if int(os.environ.get("WEB_CONCURRENCY", 1)) > 1:
+        raise ImproperlyConfigured(
+            "DJANGO_CACHE=locmem is not shared between the WEB_CONCURRENCY workers, use DJANGO_CACHE=db."
+        )
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "restaurant",
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unknown DJANGO_CACHE {CACHE_BACKEND!r}, use 'db' or 'locmem'.")
 
+# responses of create endpoints are replayed for a repeated Idempotency-Key header
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24  # seconds
+
+# cached read responses (restaurant/response_cache.py); entries are keyed on
+# model versions, the timeout only bounds how long unused ones are kept
+RESPONSE_CACHE_TIMEOUT = 60 * 60  # seconds
+
+# overdue reservations moved on by `python manage.py sweep_reservations`
+# (reservations/lifecycle.py): (statuses, new status, time field, minutes after it)
+RESERVATION_SWEEP_RULES = [
+    (('pending', 'confirmed'), 'no_show', 'reservation_time', 30),
+    (('seated',), 'completed', 'end_time', 30),
+]
 
 
 # Password validation
@@ -156,6 +215,11 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Uploaded images and their resized variants (restaurant/images.py)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+IMAGE_VARIANT_WORKERS = int(os.environ.get('IMAGE_VARIANT_WORKERS', 2))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -168,6 +232,9 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ],
+    # keyset pagination for every list endpoint, see restaurant/pagination.py
+    'DEFAULT_PAGINATION_CLASS': 'restaurant.pagination.StableCursorPagination',
+    'PAGE_SIZE': 50,
 }
 
 # settings.py
@@ -14,6 +14,8 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.decorators import api_view
@@ -27,8 +29,10 @@ def api_root(request, format=None):
         'orders': reverse('order-list', request=request, format=format),
         'reservations': reverse('reservation-list', request=request, format=format),
         'restaurants': reverse('restaurant-list', request=request, format=format),
+        'menu': reverse('menu', request=request, format=format),
         'reviews': reverse('review-list', request=request, format=format),
         'users': reverse('user-list', request=request, format=format),
+        'analytics': reverse('sales-report', request=request, format=format),
     })
 
 urlpatterns = [
@@ -41,10 +45,14 @@ urlpatterns = [
     path('api/restaurants/', include('restaurants.urls')),
     path('api/reviews/', include('reviews.urls')),
     path('api/users/', include('users.urls')),
+    path('api/analytics/', include('analytics.urls')),
     # Adding the password reset URL pattern at the project level
     path('reset-password/<str:uidb64>/<str:token>/', 
          PasswordResetConfirmView.as_view(), 
          name="password_reset_confirm"),
 ]
     # This allows access to the password reset confirmation view
-    # at the project level, if needed.
\ No newline at end of file
+    # at the project level, if needed.
+
+# uploaded media, served by Django only in development
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
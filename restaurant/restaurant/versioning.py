@@ -0,0 +1,107 @@
+"""
+Per-model version counters, kept in the cache.
+
+Cached payloads built from a model include its version in their cache key;
+saving or deleting a row bumps the version once the transaction commits, so
+stale entries are never read again and simply expire. Counters start from a
+millisecond timestamp, so a counter evicted from the cache never comes back
+with a number that was already used.
+
+Finer grained counters (e.g. one per reservation date) work the same way
+through named_versions() / bump_named_versions().
+"""
+import time
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_init, post_save
+from restaurant.batching import defer_until_commit
+
+
+def _version_key(model) -> str:
+    return f'model-version:{model._meta.label_lower}'
+
+
+def _named_key(name: str) -> str:
+    return f'version:{name}'
+
+
+def _fresh_version() -> int:
+    return int(time.time() * 1000)
+
+
+def _read_versions(keys) -> tuple:
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _fresh_version(), None)
+            versions[key] = cache.get(key)
+    return tuple(versions[key] for key in keys)
+
+
+def _bump(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), None)
+
+
+def model_versions(*models) -> tuple:
+    """Current version of each model, read with one cache round trip."""
+    return _read_versions([_version_key(model) for model in models])
+
+
+def named_versions(*names) -> tuple:
+    """Current version of each named counter, read with one cache round trip."""
+    return _read_versions([_named_key(name) for name in names])
+
+
+def bump_model_version(model) -> None:
+    """Invalidate every cached payload that depends on model."""
+    _bump(_version_key(model))
+
+
+def bump_named_versions(names) -> None:
+    for name in names:
+        _bump(_named_key(name))
+
+
+def bump_model_versions(models) -> None:
+    for model in models:
+        bump_model_version(model)
+
+
+def _bump_on_commit(sender, using='default', **kwargs) -> None:
+    # one bump per model and transaction, after commit so that no reader can
+    # cache the old rows under the new version
+    defer_until_commit(('model_versions', using), bump_model_versions, [sender], using=using)
+
+
+# model -> the fields its cached payloads show, for models tracked with fields=
+_tracked_fields: dict = {}
+
+
+def _remember_fields(sender, instance, **kwargs) -> None:
+    instance._versioned_values = tuple(instance.__dict__.get(field) for field in _tracked_fields[sender])
+
+
+def _bump_on_field_change(sender, instance, created, using='default', **kwargs) -> None:
+    values = tuple(getattr(instance, field) for field in _tracked_fields[sender])
+    if created or values != instance._versioned_values:
+        _bump_on_commit(sender, using=using)
+    instance._versioned_values = values
+
+
+def track_model_versions(*models, fields=None) -> None:
+    """
+    Bump the version of each model when one of its rows is saved or deleted.
+    With fields, saving an existing row bumps it only when one of them changed
+    (e.g. a User shown by its username is not stale after a login).
+    """
+    for model in models:
+        uid = f'track_model_versions:{model._meta.label_lower}'
+        if fields:
+            _tracked_fields[model] = tuple(fields)
+            post_init.connect(_remember_fields, sender=model, dispatch_uid=uid)
+            post_save.connect(_bump_on_field_change, sender=model, dispatch_uid=uid)
+        else:
+            post_save.connect(_bump_on_commit, sender=model, dispatch_uid=uid)
+        post_delete.connect(_bump_on_commit, sender=model, dispatch_uid=uid)
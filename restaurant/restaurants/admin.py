@@ -1,7 +1,18 @@
-from django.contrib import admin
+import os
+from django import forms
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from .menu_sync import MenuSyncError, parse_menu, sync_menu
 from .models import Restaurant, MenuCategory, MenuItem, SpecialOffer, Table
 
 
+class MenuSyncForm(forms.Form):
+    menu_file = forms.FileField(help_text="CSV or JSON, see restaurants/menu_sync.py for the layout")
+    dry_run = forms.BooleanField(required=False, initial=True, help_text="Only report the changes")
+
+
 @admin.register(Restaurant)
 class RestaurantAdmin(admin.ModelAdmin):
     list_display = ("name", "phone", "email", "opening_hours", "closing_hours")
@@ -23,6 +34,41 @@ class MenuItemAdmin(admin.ModelAdmin):
     list_editable = ("price", "is_available", "order")
     list_filter = ("category", "is_available")
     search_fields = ("name", "description")
+    # adds the "Sync menu" button
+    change_list_template = "admin/restaurants/menuitem/change_list.html"
+
+    def get_urls(self):
+        return [
+            path("sync/", self.admin_site.admin_view(self.sync_view), name="restaurants_menuitem_sync"),
+        ] + super().get_urls()
+
+    # same as the sync_menu management command, from an uploaded file
+    def sync_view(self, request):
+        if not self.has_change_permission(request) or not self.has_add_permission(request):
+            return redirect("admin:restaurants_menuitem_changelist")
+        form = MenuSyncForm(request.POST or None, request.FILES or None)
+        report = errors = None
+        if request.method == "POST" and form.is_valid():
+            upload = form.cleaned_data["menu_file"]
+            dry_run = form.cleaned_data["dry_run"]
+            try:
+                menu = parse_menu(upload.read(), os.path.splitext(upload.name)[1].lstrip(".").lower())
+                report = sync_menu(menu, dry_run=dry_run)
+            except MenuSyncError as exc:
+                errors = exc.errors
+            else:
+                if not dry_run:
+                    messages.success(request, "Menu synced.")
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Sync menu",
+            "form": form,
+            # pairs: report["items"] would shadow .items in the template
+            "report": list(report.items()) if report else None,
+            "errors": errors,
+        }
+        return TemplateResponse(request, "admin/restaurants/menuitem/sync_menu.html", context)
 
 
 @admin.register(SpecialOffer)
@@ -0,0 +1,167 @@
+"""
+Opening hours of the restaurant as a weekly schedule.
+
+The schedule comes from Restaurant.weekly_hours when set:
+
+    {"mon": [["11:30", "14:30"], ["18:00", "23:00"]], "fri": [["18:00", "02:00"]], ...}
+
+(a closing time before the opening time runs past midnight; a missing day is
+closed), otherwise from opening_hours/closing_hours applied to every day.
+
+It is expanded once into one byte per minute of the week plus, for each minute,
+the distance to the next open minute, so is_open_at() and next_open_slot() are
+two index lookups. current_schedule() keeps the parsed schedule of the single
+Restaurant in process memory until the Restaurant version changes, so checking
+the hours of a request costs no query.
+"""
+import re
+import threading
+from array import array
+from datetime import datetime, timedelta
+from typing import Optional
+from django.utils import timezone
+from restaurant.versioning import model_versions
+
+DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+CLOSED = 0xFFFF
+
+_TIME_RE = re.compile(r'^\s*(\d{1,2})(?:[:.h](\d{2}))?\s*([ap]\.?m\.?)?\s*$', re.IGNORECASE)
+
+
+def parse_time(value: str) -> int:
+    """Minute of the day of '9', '09:30', '9.30', '9:30 pm', '21h30' or '24:00'."""
+    match = _TIME_RE.match(value or '')
+    if not match:
+        raise ValueError(f"Invalid time: {value!r}")
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    meridiem = (match.group(3) or '').lower().replace('.', '')
+    if meridiem:
+        if not 1 <= hour <= 12:
+            raise ValueError(f"Invalid time: {value!r}")
+        hour = hour % 12 + (12 if meridiem == 'pm' else 0)
+    if minute > 59 or hour > 24 or (hour == 24 and minute):
+        raise ValueError(f"Invalid time: {value!r}")
+    return hour * 60 + minute
+
+
+class WeeklySchedule:
+    def __init__(self, intervals) -> None:
+        """intervals: (day index, opening minute, closing minute) triples."""
+        self.open = bytearray(MINUTES_PER_WEEK)
+        for day, opens, closes in intervals:
+            if closes <= opens:
+                closes += MINUTES_PER_DAY          # past midnight
+            for minute in range(day * MINUTES_PER_DAY + opens, day * MINUTES_PER_DAY + closes):
+                self.open[minute % MINUTES_PER_WEEK] = 1
+
+        # minutes from each minute of the week to the next open one, CLOSED if never open
+        self.wait = array('H', [CLOSED]) * MINUTES_PER_WEEK
+        if any(self.open):
+            distance = CLOSED
+            for minute in reversed(range(2 * MINUTES_PER_WEEK)):
+                index = minute % MINUTES_PER_WEEK
+                distance = 0 if self.open[index] else min(distance + 1, CLOSED)
+                self.wait[index] = distance
+
+    @classmethod
+    def from_weekly_hours(cls, weekly_hours: dict) -> "WeeklySchedule":
+        # JSON from the API or the admin: every level is checked before use
+        if not isinstance(weekly_hours, dict):
+            raise ValueError(f"Expected an object of days, got {weekly_hours!r}")
+        intervals = []
+        for day, periods in weekly_hours.items():
+            if day not in DAYS:
+                raise ValueError(f"Unknown day {day!r}, expected one of {', '.join(DAYS)}")
+            if not isinstance(periods, list):
+                raise ValueError(f"{day}: expected a list of periods, got {periods!r}")
+            for period in periods:
+                if not isinstance(period, list) or len(period) != 2 or not all(isinstance(value, str) for value in period):
+                    raise ValueError(f"{day}: expected [opening, closing], got {period!r}")
+                intervals.append((DAYS.index(day), parse_time(period[0]), parse_time(period[1])))
+        return cls(intervals)
+
+    @classmethod
+    def from_daily_hours(cls, opening: str, closing: str) -> "WeeklySchedule":
+        opens, closes = parse_time(opening), parse_time(closing)
+        return cls((day, opens, closes) for day in range(7))
+
+    @classmethod
+    def for_restaurant(cls, restaurant) -> "WeeklySchedule":
+        if restaurant.weekly_hours:
+            return cls.from_weekly_hours(restaurant.weekly_hours)
+        return cls.from_daily_hours(restaurant.opening_hours, restaurant.closing_hours)
+
+    @staticmethod
+    def _minute_of_week(moment: datetime) -> int:
+        local = timezone.localtime(moment) if timezone.is_aware(moment) else moment
+        return local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute
+
+    def is_open_at(self, moment: datetime) -> bool:
+        return bool(self.open[self._minute_of_week(moment)])
+
+    def next_open_slot(self, moment: Optional[datetime] = None) -> Optional[datetime]:
+        """moment itself when open, else the start of the next opening; None if never open."""
+        moment = moment or timezone.now()
+        wait = self.wait[self._minute_of_week(moment)]
+        if wait == CLOSED:
+            return None
+        if wait == 0:
+            return moment
+        return moment.replace(second=0, microsecond=0) + timedelta(minutes=wait)
+
+
+_current = None
+_current_version = None
+_current_lock = threading.Lock()
+
+
+def _load():
+    from .models import Restaurant
+
+    restaurant = Restaurant.objects.first()
+    if restaurant is None:
+        return None, None
+    try:
+        schedule = WeeklySchedule.for_restaurant(restaurant)
+    except (ValueError, TypeError):
+        # free text predating weekly_hours that cannot be read: hours unknown
+        schedule = None
+    return restaurant, schedule
+
+
+def _current_entry():
+    global _current, _current_version
+    from .models import Restaurant
+
+    version = model_versions(Restaurant)[0]
+    if _current_version != version:
+        with _current_lock:
+            if _current_version != version:
+                _current = _load()
+                _current_version = version
+    return _current
+
+
+def current_restaurant():
+    """The Restaurant row, or None if it is not configured yet."""
+    return _current_entry()[0]
+
+
+def current_schedule() -> Optional[WeeklySchedule]:
+    """Schedule of the restaurant; None when there is no restaurant or no readable hours."""
+    return _current_entry()[1]
+
+
+def closed_message(moment: datetime) -> Optional[str]:
+    """Why moment is outside the opening hours, or None when it is not (or hours are unknown)."""
+    schedule = current_schedule()
+    if schedule is None or schedule.is_open_at(moment):
+        return None
+    next_slot = schedule.next_open_slot(moment)
+    if next_slot is None:
+        return "The restaurant is closed."
+    if timezone.is_aware(next_slot):
+        next_slot = timezone.localtime(next_slot)
+    return f"The restaurant is closed at that time, it opens again at {next_slot.isoformat()}."
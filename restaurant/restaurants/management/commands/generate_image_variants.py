@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from restaurant.images import apply_variants, get_executor, pending_source, render_variants
+from restaurants.models import MenuItem, Restaurant
+
+# Management command to (re)build the resized variants of existing images
+# Usage: python manage.py generate_image_variants [--force] [--batch-size 32]
+# New uploads are handled automatically after commit; this covers media that
+# predates the pipeline. Rows whose variants match the source hash are skipped
+# unless --force is given. Rendering is spread over the image process pool.
+class Command(BaseCommand):
+    help = "Generate thumb/card/full WebP and JPEG variants of restaurant and menu images"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Render again even if the source is unchanged")
+        parser.add_argument("--batch-size", type=int, default=32, help="Images rendered concurrently")
+
+    def handle(self, *args, **options):
+        executor = get_executor()
+        for model in (Restaurant, MenuItem):
+            rendered = skipped = failed = 0
+            rows = model.objects.exclude(image='').exclude(image__isnull=True).order_by('pk')
+            batch = []
+            for instance in rows.iterator(chunk_size=options["batch_size"]):
+                try:
+                    pending = pending_source(instance, 'image', 'image_variants', force=options["force"])
+                except OSError as exc:
+                    self.stderr.write(f"  {model.__name__} {instance.pk}: {exc}")
+                    failed += 1
+                    continue
+                if pending is None:
+                    skipped += 1
+                    continue
+                source_name, data, digest = pending
+                batch.append((instance, source_name, digest, executor.submit(render_variants, data)))
+                if len(batch) >= options["batch_size"]:
+                    done, errors = self.apply(batch)
+                    rendered, failed, batch = rendered + done, failed + errors, []
+            done, errors = self.apply(batch)
+            rendered, failed = rendered + done, failed + errors
+            self.stdout.write(f"  {model.__name__}: {rendered} rendered, {skipped} up to date, {failed} failed")
+        self.stdout.write(self.style.SUCCESS("Image variants are up to date."))
+
+    def apply(self, batch):
+        done = errors = 0
+        for instance, source_name, digest, future in batch:
+            try:
+                apply_variants(instance, 'image_variants', source_name, digest, future.result())
+                done += 1
+            except Exception as exc:
+                self.stderr.write(f"  {type(instance).__name__} {instance.pk}: {exc}")
+                errors += 1
+        return done, errors
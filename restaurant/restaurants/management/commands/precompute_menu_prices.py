@@ -0,0 +1,30 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from restaurants.models import DailyMenuPrice, MenuItem
+from restaurants.pricing import effective_prices
+
+# Management command to fill the per-day price table ahead of time
+# Usage: python manage.py precompute_menu_prices [--days 7]
+# Prices are otherwise computed on first use of each day; running this from a
+# nightly job keeps that first order of the day on the fast path. Rows of past
+# days are never read again and are dropped first.
+class Command(BaseCommand):
+    help = "Precompute the effective price of every menu item for the next days"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7)
+
+    def handle(self, *args, **options):
+        if options["days"] < 1:
+            raise CommandError("--days must be positive")
+        today = timezone.localdate()
+        pruned, _ = DailyMenuPrice.objects.filter(date__lt=today).delete()
+        self.stdout.write(f"  dropped {pruned} prices of past days")
+        menu_item_ids = list(MenuItem.objects.values_list("pk", flat=True))
+        for offset in range(options["days"]):
+            day = today + timedelta(days=offset)
+            prices = effective_prices(menu_item_ids, day)
+            discounted = sum(1 for price in prices.values() if price.offer_id)
+            self.stdout.write(f"  {day}: {len(prices)} prices, {discounted} discounted")
+        self.stdout.write(self.style.SUCCESS(f"Precomputed prices for {options['days']} days."))
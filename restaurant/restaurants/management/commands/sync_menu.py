@@ -0,0 +1,41 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from restaurants.menu_sync import MenuSyncError, parse_menu, sync_menu
+
+# Management command to sync the whole menu from a CSV or JSON file
+# Usage: python manage.py sync_menu menu.csv [--format csv|json] [--dry-run]
+# Categories, items and offers are created/updated in bulk in one transaction;
+# rows missing from the file are deactivated, never deleted.
+# See restaurants/menu_sync.py for the file layout.
+class Command(BaseCommand):
+    help = "Create, update and deactivate menu categories, items and offers from a CSV/JSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=str)
+        parser.add_argument("--format", choices=["csv", "json"], help="Defaults to the file extension")
+        parser.add_argument("--dry-run", action="store_true", help="Only report the changes")
+
+    def handle(self, *args, **options):
+        file_format = options["format"] or os.path.splitext(options["path"])[1].lstrip(".").lower()
+        try:
+            with open(options["path"], "rb") as menu_file:
+                menu = parse_menu(menu_file.read(), file_format)
+            report = sync_menu(menu, dry_run=options["dry_run"])
+        except OSError as exc:
+            raise CommandError(str(exc))
+        except MenuSyncError as exc:
+            for error in exc.errors:
+                self.stderr.write(f"  {error}")
+            raise CommandError(f"{len(exc.errors)} error(s) in {options['path']}, nothing was changed.")
+
+        for section, changes in report.items():
+            counts = ", ".join(f"{len(names)} {change}" for change, names in changes.items())
+            self.stdout.write(f"  {section}: {counts}")
+            if options["verbosity"] > 1 or options["dry_run"]:
+                for change, names in changes.items():
+                    for name in names:
+                        self.stdout.write(f"    {change}: {name}")
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING("Dry run, nothing was changed."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Menu synced."))
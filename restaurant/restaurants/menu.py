@@ -0,0 +1,56 @@
+"""
+Full menu snapshot: active categories, their available items and the offers
+valid today, built with three queries and cached as rendered JSON.
+
+The cache key holds the versions of MenuCategory, MenuItem and SpecialOffer
+(see restaurant/versioning.py) and today's date, so any menu change or the
+start/end of an offer yields a new snapshot. The ETag is a hash of the
+payload, so an unchanged menu keeps its ETag across rebuilds.
+"""
+import hashlib
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from restaurant.versioning import model_versions
+from .models import MenuCategory, MenuItem, SpecialOffer
+from .pricing import effective_prices
+from .serializers import MenuSnapshotCategorySerializer
+
+MENU_MODELS = (MenuCategory, MenuItem, SpecialOffer)
+MENU_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def menu_version() -> str:
+    return '.'.join(str(version) for version in model_versions(*MENU_MODELS))
+
+
+def build_menu(on_date) -> list:
+    offers = SpecialOffer.objects.filter(
+        is_active=True, start_date__lte=on_date, end_date__gte=on_date
+    ).order_by('-discount_percentage', 'id')
+    items = MenuItem.objects.filter(is_available=True).order_by('order', 'id').prefetch_related(
+        Prefetch('special_offers', queryset=offers)
+    )
+    categories = list(MenuCategory.objects.filter(is_active=True).prefetch_related(
+        Prefetch('menu_items', queryset=items)
+    ))
+    prices = effective_prices(
+        (item.pk for category in categories for item in category.menu_items.all()), on_date
+    )
+    return MenuSnapshotCategorySerializer(
+        categories, many=True, context={'effective_prices': prices}
+    ).data
+
+
+def menu_snapshot() -> tuple[str, bytes]:
+    """(etag, rendered JSON) of today's menu, from the cache when possible."""
+    today = timezone.localdate()
+    key = f'menu-snapshot:{menu_version()}:{today.isoformat()}'
+    snapshot = cache.get(key)
+    if snapshot is None:
+        content = JSONRenderer().render({'date': today, 'categories': build_menu(today)})
+        etag = '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+        snapshot = (etag, content)
+        cache.set(key, snapshot, MENU_CACHE_TIMEOUT)
+    return snapshot
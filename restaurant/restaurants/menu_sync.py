@@ -0,0 +1,343 @@
+"""
+Bulk menu sync from a CSV or JSON menu description.
+
+The file is the whole menu. JSON nests categories > items > offers:
+
+    {"categories": [{"name": "Soups", "description": "", "order": 1, "is_active": true,
+                     "items": [{"name": "Tomato", "price": "4.50", "description": "", "order": 1,
+                                "is_available": true,
+                                "offers": [{"title": "Soup week", "discount_percentage": "10",
+                                            "start_date": "2026-01-05", "end_date": "2026-01-11"}]}]}]}
+
+CSV has one row per item (columns category, name, price and optionally
+description, order, is_available, category_order) plus optional offer_title,
+offer_discount, offer_start, offer_end columns; an item is repeated on one row
+per offer.
+
+Rows are matched by category name, (category, item name) and (item, offer
+title). The diff against the database is applied with bulk_create/bulk_update
+in one transaction. Rows missing from the file are not deleted, since order
+history points at them: categories are deactivated, items made unavailable and
+offers switched off. Bulk queries send no model signals, so the menu version
+bump and the price invalidation the signals would do are done here once.
+"""
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from restaurant.versioning import bump_model_versions
+from .models import DailyMenuPrice, MenuCategory, MenuItem, SpecialOffer
+
+CATEGORY_FIELDS = ('description', 'order', 'is_active')
+ITEM_FIELDS = ('category_id', 'description', 'price', 'is_available', 'order')
+OFFER_FIELDS = ('description', 'discount_percentage', 'start_date', 'end_date', 'is_active')
+BULK_BATCH_SIZE = 500
+TRUE_VALUES = ('1', 'true', 'yes', 'y')
+FALSE_VALUES = ('0', 'false', 'no', 'n', '')
+
+
+class MenuSyncError(ValueError):
+    """The menu file is invalid; errors lists one message per problem."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(errors))
+
+
+# === PARSING ===
+
+def _decimal(value, where, errors, maximum=None):
+    try:
+        number = Decimal(str(value).strip()).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        errors.append(f"{where}: invalid number {value!r}")
+        return None
+    if number < 0 or (maximum is not None and number > maximum):
+        errors.append(f"{where}: {value} is out of range")
+        return None
+    return number
+
+
+def _boolean(value, where, errors, default=True):
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return default if text == '' else False
+    errors.append(f"{where}: invalid boolean {value!r}")
+    return default
+
+
+def _integer(value, where, errors):
+    if value in (None, ''):
+        return 0
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        errors.append(f"{where}: invalid integer {value!r}")
+        return 0
+    if number < 0:
+        errors.append(f"{where}: {value} is negative")
+    return number
+
+
+def _date(value, where, errors):
+    try:
+        return value if isinstance(value, date) else date.fromisoformat(str(value).strip())
+    except ValueError:
+        errors.append(f"{where}: invalid date {value!r}")
+        return None
+
+
+def _normalize(categories) -> dict:
+    """Validated menu: {category: {fields, 'items': {name: {fields, 'offers': {title: fields}}}}}."""
+    errors = []
+    menu = {}
+    for category_index, category in enumerate(categories, 1):
+        name = (category.get('name') or '').strip()
+        where = f"category {category_index}"
+        if not name:
+            errors.append(f"{where}: name is required")
+            continue
+        entry = menu.setdefault(name, {
+            'description': category.get('description') or '',
+            'order': _integer(category.get('order'), where, errors),
+            'is_active': _boolean(category.get('is_active'), where, errors),
+            'items': {},
+        })
+        for item_index, item in enumerate(category.get('items') or [], 1):
+            item_name = (item.get('name') or '').strip()
+            where = item.get('_where') or f"{name} item {item_index}"
+            if not item_name:
+                errors.append(f"{where}: name is required")
+                continue
+            if item.get('price') in (None, ''):
+                errors.append(f"{where}: price is required")
+                continue
+            item_entry = entry['items'].get(item_name)
+            if item_entry is None:
+                item_entry = entry['items'][item_name] = {
+                    'description': item.get('description') or '',
+                    'price': _decimal(item['price'], where, errors, Decimal('9999.99')),
+                    'is_available': _boolean(item.get('is_available'), where, errors),
+                    'order': _integer(item.get('order'), where, errors),
+                    'offers': {},
+                }
+            for offer in item.get('offers') or []:
+                title = (offer.get('title') or '').strip()
+                if not title:
+                    errors.append(f"{where}: offer title is required")
+                    continue
+                start = _date(offer.get('start_date'), f"{where} offer {title}", errors)
+                end = _date(offer.get('end_date'), f"{where} offer {title}", errors)
+                if start and end and end < start:
+                    errors.append(f"{where} offer {title}: ends before it starts")
+                item_entry['offers'][title] = {
+                    'description': offer.get('description') or '',
+                    'discount_percentage': _decimal(
+                        offer.get('discount_percentage'), f"{where} offer {title}", errors, Decimal('100')
+                    ),
+                    'start_date': start,
+                    'end_date': end,
+                    'is_active': _boolean(offer.get('is_active'), f"{where} offer {title}", errors),
+                }
+    if errors:
+        raise MenuSyncError(errors)
+    return menu
+
+
+def _categories_from_csv(text: str) -> list:
+    reader = csv.DictReader(io.StringIO(text))
+    missing = {'category', 'name', 'price'} - set(reader.fieldnames or ())
+    if missing:
+        raise MenuSyncError([f"CSV is missing the columns: {', '.join(sorted(missing))}"])
+    categories = {}
+    for line, row in enumerate(reader, 2):
+        row = {key: (value or '').strip() for key, value in row.items() if key}
+        category = categories.setdefault(row['category'], {
+            'name': row['category'], 'order': row.get('category_order'), 'items': [],
+        })
+        item = {
+            'name': row['name'], 'description': row.get('description'), 'price': row['price'],
+            'is_available': row.get('is_available') or None, 'order': row.get('order'),
+            'offers': [], '_where': f"line {line}",
+        }
+        if row.get('offer_title'):
+            item['offers'].append({
+                'title': row['offer_title'], 'discount_percentage': row.get('offer_discount'),
+                'start_date': row.get('offer_start'), 'end_date': row.get('offer_end'),
+            })
+        # an item repeated for several offers is merged by _normalize()
+        category['items'].append(item)
+    return list(categories.values())
+
+
+def parse_menu(content, file_format: str) -> dict:
+    """Validated menu of a 'csv' or 'json' file (bytes or text)."""
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    if file_format == 'csv':
+        return _normalize(_categories_from_csv(content))
+    if file_format == 'json':
+        try:
+            data = json.loads(content)
+        except ValueError as exc:
+            raise MenuSyncError([f"Invalid JSON: {exc}"])
+        categories = data.get('categories') if isinstance(data, dict) else data
+        if not isinstance(categories, list):
+            raise MenuSyncError(["JSON must be a list of categories or {\"categories\": [...]}"])
+        return _normalize(categories)
+    raise MenuSyncError([f"Unknown format {file_format!r}, expected csv or json"])
+
+
+# === DIFF AND APPLY ===
+
+def _blank_to_none(value):
+    return None if value == '' else value
+
+
+def _changed(instance, values: dict, fields) -> set:
+    """Copy values onto instance; returns the fields that differed (NULL and '' are the same)."""
+    changed = set()
+    for field in fields:
+        if _blank_to_none(getattr(instance, field)) != _blank_to_none(values[field]):
+            setattr(instance, field, values[field])
+            changed.add(field)
+    return changed
+
+
+def _bulk_update(model, instances, fields) -> None:
+    # only the columns that changed somewhere: each one costs a CASE per row
+    if instances and fields:
+        model.objects.bulk_update(instances, sorted(fields), batch_size=BULK_BATCH_SIZE)
+
+
+def _report_section():
+    return {'created': [], 'updated': [], 'deactivated': []}
+
+
+@transaction.atomic
+def sync_menu(menu: dict, dry_run: bool = False) -> dict:
+    """Apply a parsed menu; returns the created/updated/deactivated names per model."""
+    report = {'categories': _report_section(), 'items': _report_section(), 'offers': _report_section()}
+    categories = {category.name: category for category in MenuCategory.objects.select_for_update()}
+
+    # categories
+    new_categories, changed_categories, category_fields = [], [], set()
+    for name, values in menu.items():
+        category = categories.get(name)
+        if category is None:
+            new_categories.append(MenuCategory(name=name, **{field: values[field] for field in CATEGORY_FIELDS}))
+            report['categories']['created'].append(name)
+        elif changed := _changed(category, values, CATEGORY_FIELDS):
+            category_fields |= changed
+            changed_categories.append(category)
+            report['categories']['updated'].append(name)
+    for name, category in categories.items():
+        if name not in menu and category.is_active:
+            category.is_active = False
+            category_fields.add('is_active')
+            changed_categories.append(category)
+            report['categories']['deactivated'].append(name)
+    if dry_run:
+        # new categories have no pk, their items are all new
+        for name in report['categories']['created']:
+            report['items']['created'].extend(f"{name} / {item}" for item in menu[name]['items'])
+    else:
+        MenuCategory.objects.bulk_create(new_categories, batch_size=BULK_BATCH_SIZE)
+        _bulk_update(MenuCategory, changed_categories, category_fields)
+        if new_categories:
+            # MySQL does not return the pks of bulk inserted rows
+            categories = {category.name: category for category in MenuCategory.objects.all()}
+    category_names = {category.pk: name for name, category in categories.items()}
+
+    # items
+    items = {
+        (category_names.get(item.category_id), item.name): item
+        for item in MenuItem.objects.select_for_update()
+    }
+    new_items, changed_items, item_fields = [], [], set()
+    for category_name, category_values in menu.items():
+        category = categories.get(category_name)
+        if category is None or category.pk is None:
+            continue
+        for name, values in category_values['items'].items():
+            values = {**values, 'category_id': category.pk}
+            item = items.get((category_name, name))
+            if item is None:
+                new_items.append(MenuItem(name=name, **{field: values[field] for field in ITEM_FIELDS}))
+                report['items']['created'].append(f"{category_name} / {name}")
+            elif changed := _changed(item, values, ITEM_FIELDS):
+                item_fields |= changed
+                changed_items.append(item)
+                report['items']['updated'].append(f"{category_name} / {name}")
+    for (category_name, name), item in items.items():
+        if name not in menu.get(category_name, {}).get('items', {}) and item.is_available:
+            item.is_available = False
+            item_fields.add('is_available')
+            changed_items.append(item)
+            report['items']['deactivated'].append(f"{category_name} / {name}")
+    if not dry_run:
+        MenuItem.objects.bulk_create(new_items, batch_size=BULK_BATCH_SIZE)
+        _bulk_update(MenuItem, changed_items, item_fields)
+        if new_items:
+            items = {
+                (category_names.get(item.category_id), item.name): item
+                for item in MenuItem.objects.all()
+            }
+    item_names = {item.pk: key for key, item in items.items()}
+
+    # offers
+    offers = {
+        (item_names.get(offer.menu_item_id), offer.title): offer
+        for offer in SpecialOffer.objects.select_for_update()
+    }
+    new_offers, changed_offers, offer_fields = [], [], set()
+    wanted = set()
+    for category_name, category_values in menu.items():
+        for item_name, item_values in category_values['items'].items():
+            item = items.get((category_name, item_name))
+            if item is None or item.pk is None:
+                # only in a dry run: the item is new, so are its offers
+                report['offers']['created'].extend(
+                    f"{category_name} / {item_name} / {title}" for title in item_values['offers']
+                )
+                continue
+            for title, values in item_values['offers'].items():
+                key = ((category_name, item_name), title)
+                wanted.add(key)
+                offer = offers.get(key)
+                label = f"{category_name} / {item_name} / {title}"
+                if offer is None:
+                    new_offers.append(SpecialOffer(menu_item_id=item.pk, title=title, **values))
+                    report['offers']['created'].append(label)
+                elif changed := _changed(offer, values, OFFER_FIELDS):
+                    offer_fields |= changed
+                    changed_offers.append(offer)
+                    report['offers']['updated'].append(label)
+    for key, offer in offers.items():
+        if key not in wanted and offer.is_active:
+            offer.is_active = False
+            offer_fields.add('is_active')
+            changed_offers.append(offer)
+            report['offers']['deactivated'].append(f"{key[0][0]} / {key[0][1]} / {key[1]}")
+    if not dry_run:
+        SpecialOffer.objects.bulk_create(new_offers, batch_size=BULK_BATCH_SIZE)
+        _bulk_update(SpecialOffer, changed_offers, offer_fields)
+
+        # what the post_save/post_delete receivers would have done, once
+        repriced = {item.pk for item in changed_items} | {offer.menu_item_id for offer in changed_offers}
+        repriced |= {offer.menu_item_id for offer in new_offers}
+        changed_models = [
+            model for model, section in ((MenuCategory, 'categories'), (MenuItem, 'items'), (SpecialOffer, 'offers'))
+            if any(report[section].values())
+        ]
+        transaction.on_commit(lambda: DailyMenuPrice.invalidate(repriced))
+        transaction.on_commit(lambda: bump_model_versions(changed_models))
+    return report
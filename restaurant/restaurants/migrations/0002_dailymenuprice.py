@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMenuPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('base_price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('discount_percentage', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_prices', to='restaurants.menuitem')),
+                ('offer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_prices', to='restaurants.specialoffer')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'menu_item'), name='unique_daily_menu_price')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0003_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='singleton',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='weekly_hours',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddConstraint(
+            model_name='restaurant',
+            constraint=models.UniqueConstraint(fields=('singleton',), name='single_restaurant'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0004_restaurant_singleton_weekly_hours'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='menucategory',
+            index=models.Index(fields=['order', 'id'], name='menucategory_order_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['order', 'id'], name='menuitem_order_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0005_menu_order_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailymenuprice',
+            name='version',
+            field=models.CharField(default='', max_length=64),
+        ),
+    ]
@@ -1,4 +1,9 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from restaurant.images import track_image_variants
+from restaurant.versioning import track_model_versions
 
 # Create your models here.
 class Restaurant(models.Model):
@@ -9,15 +14,37 @@ class Restaurant(models.Model):
     email = models.EmailField()
     opening_hours = models.CharField(max_length=100)
     closing_hours = models.CharField(max_length=100)
+    # per-day opening periods overriding opening_hours/closing_hours, see restaurants/hours.py
+    # {"mon": [["11:30", "14:30"], ["18:00", "23:00"]], ...}
+    weekly_hours = models.JSONField(default=dict, blank=True)
     image = models.ImageField(upload_to='restaurant/', blank=True, null=True)  
+    # resized copies of image, see restaurant/images.py
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # always True: the unique constraint on it allows a single row
+    singleton = models.BooleanField(default=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['singleton'], name='single_restaurant'),
+        ]
+
+    def clean(self):
+        from .hours import WeeklySchedule
+        try:
+            WeeklySchedule.for_restaurant(self)
+        except (ValueError, TypeError) as exc:
+            raise ValidationError({'weekly_hours' if self.weekly_hours else 'opening_hours': str(exc)})
 
     def save (self, *args, **kwargs):
-        # Custom save logic can be added here
         # Ensure only one restaurant instance exists
-
-        if not self.pk and Restaurant.objects.exists():
-            raise ValueError('Only one restaurant instance is allowed.')
-        super().save(*args, **kwargs)
+        # enforced by the single_restaurant constraint instead of a query per save
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        try:
+            with transaction.atomic(using=kwargs.get('using')):
+                super().save(*args, **kwargs)
+        except IntegrityError as exc:
+            raise ValueError('Only one restaurant instance is allowed.') from exc
 
     def __str__(self):
         return self.name
@@ -36,6 +63,10 @@ class MenuCategory(models.Model):
     class Meta:
         ordering = ['order', 'name']
         verbose_name_plural = 'Menu Categories'
+        # supports the keyset pagination of the category list
+        indexes = [
+            models.Index(fields=['order', 'id'], name='menucategory_order_id_idx'),
+        ]
 
 
     def __str__(self):
@@ -56,13 +87,17 @@ class MenuItem(models.Model):
     description = models.TextField(blank=True, null=True)
     price = models.DecimalField(max_digits=6, decimal_places=2)
     image = models.ImageField(upload_to='menu/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_available = models.BooleanField(default=True)
-    image = models.ImageField(upload_to='menu/', blank=True, null=True)
     order = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['order']
         verbose_name_plural = 'Menu Items'
+        # supports the keyset pagination of the item list
+        indexes = [
+            models.Index(fields=['order', 'id'], name='menuitem_order_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -107,4 +142,65 @@ class Table(models.Model):
     is_available = models.BooleanField(default=True)
 
     def __str__(self):
-        return f"Table {self.number} - {self.size} seats"
\ No newline at end of file
+        return f"Table {self.number} - {self.size} seats"
+
+
+# model for the precomputed effective prices
+# one row per menu item and day, filled lazily by restaurants/pricing.py
+# rows are a cache: they are dropped whenever the item or one of its offers changes,
+# and only read back while the menu versions they were computed under are current
+
+class DailyMenuPrice(models.Model):
+    date = models.DateField()
+    menu_item = models.ForeignKey(MenuItem, related_name='daily_prices', on_delete=models.CASCADE)
+    base_price = models.DecimalField(max_digits=6, decimal_places=2)
+    discount_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    offer = models.ForeignKey(SpecialOffer, related_name='daily_prices', on_delete=models.SET_NULL, blank=True, null=True)
+    # MenuItem and SpecialOffer versions read before the price was computed
+    version = models.CharField(max_length=64, default='')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'menu_item'], name='unique_daily_menu_price'),
+        ]
+
+    def __str__(self):
+        return f"{self.menu_item_id} on {self.date}: {self.price}"
+
+    @classmethod
+    def invalidate(cls, menu_item_ids):
+        """Drop the precomputed prices of these items, they are rebuilt on next use."""
+        cls.objects.filter(menu_item_id__in=list(menu_item_ids)).delete()
+
+
+# bump the cached menu snapshot (restaurants/menu.py) on every menu change
+track_model_versions(MenuCategory, MenuItem, SpecialOffer)
+# drop the cached restaurant and schedule (restaurants/hours.py) on change
+track_model_versions(Restaurant)
+track_model_versions(Table)
+
+# thumb/card/full variants of uploaded images, rendered after commit
+track_image_variants(Restaurant)
+track_image_variants(MenuItem)
+
+
+# === SIGNALS ===
+# a new price or a changed offer makes the precomputed prices of the item stale
+@receiver([post_save, post_delete], sender=MenuItem)
+def invalidate_menu_item_prices(sender, instance, **kwargs):
+    transaction.on_commit(lambda: DailyMenuPrice.invalidate([instance.pk]))
+
+
+# remember the item an offer was loaded with: moving the offer makes both items stale
+@receiver(post_init, sender=SpecialOffer)
+def remember_offer_item(sender, instance, **kwargs):
+    instance._saved_menu_item_id = instance.__dict__.get('menu_item_id')
+
+
+# every price of the item is dropped, so discount and date changes are covered too
+@receiver([post_save, post_delete], sender=SpecialOffer)
+def invalidate_offer_prices(sender, instance, **kwargs):
+    menu_item_ids = {instance.menu_item_id, instance._saved_menu_item_id} - {None}
+    transaction.on_commit(lambda: DailyMenuPrice.invalidate(menu_item_ids))
+    instance._saved_menu_item_id = instance.menu_item_id
@@ -0,0 +1,83 @@
+"""
+Effective prices: MenuItem.price minus the best SpecialOffer valid on a day.
+
+Overlapping offers are resolved deterministically: the highest
+discount_percentage wins, then the most recent start_date, then the lowest id.
+Prices of a whole batch of items are computed with one query (a correlated
+subquery picks the winning offer of every item) and stored in DailyMenuPrice,
+so later lookups for the same day are a single indexed read.
+
+Stored rows are stamped with the MenuItem and SpecialOffer versions read
+before computing them, and rows with other versions are ignored. Versions
+are bumped after the commit of a change, so a price computed from the rows
+before a change can never carry the versions that follow it, even when it
+is stored after the invalidation of restaurants/models.py ran.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterable, NamedTuple, Optional
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from restaurant.versioning import model_versions
+from .models import DailyMenuPrice, MenuItem, SpecialOffer
+
+CENT = Decimal('0.01')
+
+
+class EffectivePrice(NamedTuple):
+    price: Decimal
+    base_price: Decimal
+    discount_percentage: Decimal
+    offer_id: Optional[int]
+
+
+def discounted(base_price: Decimal, discount_percentage: Decimal) -> Decimal:
+    return (base_price * (100 - discount_percentage) / 100).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def price_version() -> str:
+    return '.'.join(str(version) for version in model_versions(MenuItem, SpecialOffer))
+
+
+def _compute(menu_item_ids, on_date) -> dict[int, EffectivePrice]:
+    best_offer = SpecialOffer.objects.filter(
+        menu_item=OuterRef('pk'), is_active=True, start_date__lte=on_date, end_date__gte=on_date
+    ).order_by('-discount_percentage', '-start_date', 'id')
+    rows = MenuItem.objects.filter(pk__in=menu_item_ids).annotate(
+        offer_id=Subquery(best_offer.values('id')[:1]),
+        discount=Subquery(best_offer.values('discount_percentage')[:1]),
+    ).values_list('pk', 'price', 'offer_id', 'discount')
+
+    prices = {}
+    for pk, base_price, offer_id, discount in rows:
+        discount = Decimal(discount or 0)
+        prices[pk] = EffectivePrice(discounted(base_price, discount), base_price, discount, offer_id)
+    return prices
+
+
+def effective_prices(menu_item_ids: Iterable[int], on_date=None) -> dict[int, EffectivePrice]:
+    """Effective price of every menu item id on on_date (default: today)."""
+    on_date = on_date or timezone.localdate()
+    menu_item_ids = set(menu_item_ids)
+    version = price_version()   # before computing, see the module docstring
+    prices = {
+        row.menu_item_id: EffectivePrice(row.price, row.base_price, row.discount_percentage, row.offer_id)
+        for row in DailyMenuPrice.objects.filter(date=on_date, menu_item_id__in=menu_item_ids, version=version)
+    }
+    missing = menu_item_ids - prices.keys()
+    if missing:
+        computed = _compute(missing, on_date)
+        # rows of older versions make way for the new ones
+        DailyMenuPrice.objects.filter(date=on_date, menu_item_id__in=missing).exclude(version=version).delete()
+        DailyMenuPrice.objects.bulk_create([
+            DailyMenuPrice(
+                date=on_date, menu_item_id=pk, price=value.price, base_price=value.base_price,
+                discount_percentage=value.discount_percentage, offer_id=value.offer_id, version=version,
+            )
+            for pk, value in computed.items()
+        ], ignore_conflicts=True)
+        prices.update(computed)
+    return prices
+
+
+def effective_price(menu_item_id: int, on_date=None) -> EffectivePrice:
+    return effective_prices([menu_item_id], on_date)[menu_item_id]
@@ -0,0 +1,161 @@
+"""
+In-process full-text search over the menu.
+
+The index covers MenuItem.name, MenuItem.description and MenuCategory.name of
+the orderable items (available, in an active category). It is rebuilt with one
+query whenever the menu version changes (see restaurants/menu.py), so it never
+serves stale results and costs nothing between menu edits.
+
+Matching, per query term:
+- exact terms, through the inverted index
+- prefixes ("chick" -> "chicken"), with a bisect over the sorted vocabulary
+- typos (one edit, two for long words), with a symmetric-delete index:
+  every vocabulary term is stored under its one-letter deletions, so a query
+  term is matched by looking up its own deletions instead of scanning terms
+Scores are BM25 with per-field weights; exact matches beat prefix matches,
+which beat typo matches, and items matching more query terms rank first.
+"""
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from .models import MenuItem
+
+FIELD_WEIGHTS = {'name': 3.0, 'category': 2.0, 'description': 1.0}
+MATCH_WEIGHTS = {'exact': 1.0, 'prefix': 0.7, 'typo': 0.5}
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSIONS = 50
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text) -> list:
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _deletions(term: str) -> set:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance with adjacent transpositions, cut off above limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            cost = char_a != char_b
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 and i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class MenuSearchIndex:
+    def __init__(self, documents) -> None:
+        """documents: iterable of (item id, {field: text})."""
+        self.postings: dict = defaultdict(dict)   # term -> {item id: weighted tf}
+        self.lengths: dict = {}                   # item id -> weighted length
+        for item_id, fields in documents:
+            length = 0.0
+            for field, text in fields.items():
+                weight = FIELD_WEIGHTS[field]
+                for term in tokenize(text):
+                    self.postings[term][item_id] = self.postings[term].get(item_id, 0.0) + weight
+                    length += weight
+            self.lengths[item_id] = length
+        self.postings = dict(self.postings)
+        self.vocabulary = sorted(self.postings)
+        self.average_length = (sum(self.lengths.values()) / len(self.lengths)) if self.lengths else 0.0
+
+        self.deletions: dict = defaultdict(set)   # one-letter deletion -> terms
+        for term in self.vocabulary:
+            if len(term) > 3:
+                for variant in _deletions(term):
+                    self.deletions[variant].add(term)
+
+    @classmethod
+    def build(cls) -> "MenuSearchIndex":
+        rows = MenuItem.objects.filter(is_available=True, category__is_active=True).values_list(
+            'pk', 'name', 'description', 'category__name'
+        )
+        return cls(
+            (pk, {'name': name, 'description': description, 'category': category})
+            for pk, name, description, category in rows
+        )
+
+    def _expand(self, term: str) -> dict:
+        """Index terms matching a query term, with the weight of the match kind."""
+        matches = {}
+        if term in self.postings:
+            matches[term] = MATCH_WEIGHTS['exact']
+        if len(term) >= MIN_PREFIX_LENGTH:
+            start = bisect_left(self.vocabulary, term)
+            for candidate in self.vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+                if not candidate.startswith(term):
+                    break
+                matches.setdefault(candidate, MATCH_WEIGHTS['prefix'])
+        if len(term) > 3:
+            limit = 2 if len(term) >= 8 else 1
+            candidates = set(self.deletions.get(term, ()))
+            for variant in _deletions(term) | {term}:
+                candidates |= self.deletions.get(variant, set())
+                if variant in self.postings:
+                    candidates.add(variant)
+            for candidate in candidates:
+                if candidate not in matches and _edit_distance(term, candidate, limit) <= limit:
+                    matches[candidate] = MATCH_WEIGHTS['typo']
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """[(item id, score)] best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.lengths:
+            return []
+        documents = len(self.lengths)
+        scores: dict = defaultdict(float)
+        coverage: dict = defaultdict(int)
+        for term in terms:
+            matched = set()
+            for candidate, match_weight in self._expand(term).items():
+                postings = self.postings[candidate]
+                idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+                for item_id, tf in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[item_id] / self.average_length)
+                    scores[item_id] += match_weight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+                    matched.add(item_id)
+            for item_id in matched:
+                coverage[item_id] += 1
+        ranked = sorted(scores, key=lambda item_id: (-coverage[item_id], -scores[item_id], item_id))
+        return [(item_id, round(scores[item_id], 4)) for item_id in ranked[:limit]]
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> MenuSearchIndex:
+    """The index of the current menu version, rebuilt after menu changes."""
+    global _index, _index_version
+    from .menu import menu_version
+
+    version = menu_version()
+    if _index_version != version:
+        with _index_lock:
+            if _index_version != version:
+                _index = MenuSearchIndex.build()
+                _index_version = version
+    return _index
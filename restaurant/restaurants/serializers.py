@@ -1,25 +1,64 @@
 from rest_framework import serializers
+from restaurant.images import variant_urls
+from .hours import WeeklySchedule
 from .models import Restaurant, MenuCategory, MenuItem, SpecialOffer, Table
+from .pricing import effective_prices
+
+# urls of the resized copies of image: {variant: {format: url}}
+class ImageVariantsField(serializers.Field):
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return variant_urls(value, self.context.get('request'))
 
 class RestaurantSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Restaurant
         fields = '__all__'
 
+    def validate_weekly_hours(self, value):
+        # Restaurant.clean() is not run by the serializer, the schedule is read on every order
+        if value:
+            try:
+                WeeklySchedule.from_weekly_hours(value)
+            except (ValueError, TypeError) as exc:
+                raise serializers.ValidationError(str(exc))
+        return value
+
 class MenuCategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = MenuCategory
         fields = '__all__'
 
+# resolves the effective prices of a whole page of items with one lookup
+class MenuItemListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        self.child.context['effective_prices'] = effective_prices(item.pk for item in items)
+        return super().to_representation(items)
+
 class MenuItemSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
+    effective_price = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField()
     
     class Meta:
         model = MenuItem
         fields = [
             'id', 'category', 'category_name', 'name', 'description', 
-            'price', 'image', 'is_available', 'order'
+            'price', 'effective_price', 'image', 'image_variants', 'is_available', 'order'
         ]
+        list_serializer_class = MenuItemListSerializer
+
+    def get_effective_price(self, obj):
+        prices = self.context.get('effective_prices')
+        if prices is None or obj.pk not in prices:
+            prices = effective_prices([obj.pk])
+        return str(prices[obj.pk].price)
 
 class SpecialOfferSerializer(serializers.ModelSerializer):
     menu_item_name = serializers.CharField(source='menu_item.name', read_only=True)
@@ -34,4 +73,35 @@ class SpecialOfferSerializer(serializers.ModelSerializer):
 class TableSerializer(serializers.ModelSerializer):
     class Meta:
         model = Table
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+# nested serializers of the menu snapshot (restaurants/menu.py)
+# parents are implied by the nesting, so no per-row category/item lookups
+
+class MenuSnapshotOfferSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SpecialOffer
+        fields = ['id', 'title', 'description', 'discount_percentage', 'start_date', 'end_date']
+
+class MenuSnapshotItemSerializer(serializers.ModelSerializer):
+    special_offers = MenuSnapshotOfferSerializer(many=True, read_only=True)
+    effective_price = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField()
+
+    class Meta:
+        model = MenuItem
+        fields = [
+            'id', 'name', 'description', 'price', 'effective_price', 'image', 'image_variants',
+            'order', 'special_offers'
+        ]
+
+    def get_effective_price(self, obj):
+        # prices of the whole menu are resolved once by restaurants/menu.py
+        return str(self.context['effective_prices'][obj.pk].price)
+
+class MenuSnapshotCategorySerializer(serializers.ModelSerializer):
+    menu_items = MenuSnapshotItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = MenuCategory
+        fields = ['id', 'name', 'description', 'order', 'menu_items']
@@ -1,3 +1,492 @@
-from django.test import TestCase
+import base64
+import io
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from decimal import Decimal
+from io import StringIO
+from urllib.parse import urlencode
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from orders.models import Order, OrderItem
+from users.models import User
+from .hours import WeeklySchedule, closed_message, current_schedule, parse_time
+from .menu_sync import parse_menu, sync_menu
+from . import pricing
+from .models import DailyMenuPrice, MenuCategory, MenuItem, Restaurant, SpecialOffer, Table
+from .pricing import effective_price, effective_prices
+from .search import MenuSearchIndex
 
-# Create your tests here.
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = MenuCategory.objects.create(name='Mains')
+        # the leading ordering field repeats for almost every row
+        for index in range(23):
+            MenuItem.objects.create(category=category, name=f'Item {index}', price='5.00', order=0)
+        for index in range(3):
+            MenuItem.objects.create(category=category, name=f'Late {index}', price='5.00', order=1)
+        self.expected = list(MenuItem.objects.order_by('order', 'id').values_list('id', flat=True))
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            pages.append([item['id'] for item in data['results']])
+            url = data[link]
+        return pages
+
+    def test_pages_follow_the_composite_order_without_gaps_or_repeats(self):
+        pages = self.walk('/api/restaurants/menu-items/?page_size=4', 'next')
+        self.assertEqual([pk for page in pages for pk in page], self.expected)
+        self.assertTrue(all(len(page) == 4 for page in pages[:-1]))
+
+    def test_previous_links_walk_back_through_the_same_pages(self):
+        forward = self.walk('/api/restaurants/menu-items/?page_size=5', 'next')
+        last = self.client.get('/api/restaurants/menu-items/?page_size=5').json()
+        while last['next']:
+            last_url = last['next']
+            last = self.client.get(last_url).json()
+        backward = self.walk(last_url, 'previous')
+        self.assertEqual(backward, list(reversed(forward)))
+
+    def test_deep_pages_use_the_keyset_not_an_offset(self):
+        url = '/api/restaurants/menu-items/?page_size=4'
+        for _ in range(5):
+            url = self.client.get(url).json()['next']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        page_query = next(query['sql'] for query in queries.captured_queries if 'LIMIT 5' in query['sql'])
+        self.assertNotIn('OFFSET', page_query)
+        self.assertIn('"restaurants_menuitem"."id" >', page_query)
+
+    def test_a_forged_cursor_is_a_404(self):
+        for position in ('x', '["1"]', '["a", "b"]'):
+            cursor = base64.b64encode(urlencode({'p': position}).encode()).decode()
+            response = self.client.get('/api/restaurants/menu-items/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, position)
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class OpeningHoursTests(TestCase):
+    # 2030-01-07 is a Monday
+    def test_weekly_schedule_lookups(self):
+        self.assertEqual(parse_time('9:30 pm'), 21 * 60 + 30)
+        self.assertEqual(parse_time('21h30'), 21 * 60 + 30)
+        with self.assertRaises(ValueError):
+            parse_time('25:00')
+        schedule = WeeklySchedule.from_weekly_hours({
+            'mon': [['11:30', '14:30'], ['18:00', '23:00']], 'sun': [['20:00', '02:00']],
+        })
+        self.assertTrue(schedule.is_open_at(utc(2030, 1, 7, 12, 0)))
+        self.assertFalse(schedule.is_open_at(utc(2030, 1, 7, 15, 0)))
+        self.assertEqual(schedule.next_open_slot(utc(2030, 1, 7, 15, 0, 30)), utc(2030, 1, 7, 18, 0))
+        # sunday's evening runs past midnight
+        self.assertTrue(schedule.is_open_at(utc(2030, 1, 7, 1, 0)))
+        self.assertEqual(schedule.next_open_slot(utc(2030, 1, 7, 23, 0)), utc(2030, 1, 13, 20, 0))
+        self.assertIsNone(WeeklySchedule([]).next_open_slot(utc(2030, 1, 1)))
+
+    def test_orders_and_reservations_follow_the_cached_hours(self):
+        cache.clear()
+        client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            restaurant = Restaurant.objects.create(
+                name='Bistro', description='', address='', phone='', email='bistro@example.com',
+                opening_hours='9:00', closing_hours='10:00',
+            )
+        current_schedule()
+        with self.assertNumQueries(0):
+            current_schedule()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create(username='guest', email='guest@example.com')
+            table = Table.objects.create(number=1, size=4)
+        with mock.patch('django.utils.timezone.now', return_value=utc(2030, 1, 7, 12)):
+            response = client.post('/api/orders/orders/', {'user': user.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        def reserve(moment):
+            return client.post('/api/reservations/reservations/', {
+                'user': user.pk, 'table': table.pk, 'reservation_time': moment, 'party_size': 2,
+            }, format='json')
+
+        self.assertEqual(reserve('2030-01-07T12:00:00Z').status_code, 400)
+        self.assertEqual(reserve('2030-01-07T09:30:00Z').status_code, 201)
+        with self.captureOnCommitCallbacks(execute=True):
+            restaurant.weekly_hours = {'mon': [['11:00', '13:00']]}
+            restaurant.save()
+        self.assertEqual(reserve('2030-01-07T12:00:00Z').status_code, 201)
+
+
+class WeeklyHoursValidationTests(TestCase):
+    restaurant = {
+        'name': 'Bistro', 'description': 'Food', 'address': '1 Main St', 'phone': '555',
+        'email': 'bistro@example.com', 'opening_hours': '09:00', 'closing_hours': '23:00',
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_malformed_weekly_hours_are_a_400(self):
+        for weekly_hours in (['x'], {'mon': 'x'}, {'mon': [[9, 17]]}, {'mon': [['9:00']]}, {'funday': []}):
+            response = self.client.post(
+                '/api/restaurants/restaurants/', {**self.restaurant, 'weekly_hours': weekly_hours}, format='json',
+            )
+            self.assertEqual(response.status_code, 400, weekly_hours)
+            self.assertIn('weekly_hours', response.json())
+        self.assertFalse(Restaurant.objects.exists())
+
+    def test_valid_weekly_hours_are_saved(self):
+        weekly_hours = {'mon': [['11:30', '14:30'], ['18:00', '02:00']]}
+        response = self.client.post(
+            '/api/restaurants/restaurants/', {**self.restaurant, 'weekly_hours': weekly_hours}, format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Restaurant.objects.get().weekly_hours, weekly_hours)
+
+    def test_unreadable_stored_hours_do_not_break_orders(self):
+        # written around the serializer, e.g. by a migration or the shell
+        Restaurant.objects.create(**self.restaurant, weekly_hours=['x'])
+        self.assertIsNone(closed_message(timezone.now()))
+        user = User.objects.create(username='guest', email='guest@example.com')
+        response = self.client.post('/api/orders/orders/', {'user': user.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+
+class OfferPriceInvalidationTests(TestCase):
+    def setUp(self):
+        category = MenuCategory.objects.create(name='Mains')
+        self.first = MenuItem.objects.create(category=category, name='Soup', price='10.00')
+        self.second = MenuItem.objects.create(category=category, name='Stew', price='20.00')
+        self.today = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.offer = SpecialOffer.objects.create(
+                menu_item=self.first, title='Half off', discount_percentage='50.00',
+                start_date=self.today, end_date=self.today,
+            )
+
+    def prices(self):
+        return effective_price(self.first.pk).price, effective_price(self.second.pk).price
+
+    def save_offer(self, **changes):
+        # loaded again, as the API and the admin do
+        offer = SpecialOffer.objects.get(pk=self.offer.pk)
+        for name, value in changes.items():
+            setattr(offer, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            offer.save()
+
+    def test_moving_an_offer_reprices_both_items(self):
+        self.assertEqual(self.prices(), (Decimal('5.00'), Decimal('20.00')))
+        self.save_offer(menu_item=self.second)
+        self.assertEqual(self.prices(), (Decimal('10.00'), Decimal('10.00')))
+
+    def test_discount_and_date_changes_reprice_the_item(self):
+        self.assertEqual(self.prices()[0], Decimal('5.00'))
+        self.save_offer(discount_percentage=Decimal('20.00'))
+        self.assertEqual(self.prices()[0], Decimal('8.00'))
+        self.save_offer(start_date=self.today + timedelta(days=1), end_date=self.today + timedelta(days=2))
+        self.assertEqual(self.prices()[0], Decimal('10.00'))
+
+
+class EffectivePriceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            category = MenuCategory.objects.create(name='Mains')
+            self.items = [MenuItem.objects.create(category=category, name=f'Dish {index}', price='10.00') for index in range(20)]
+            first, second = self.items[:2]
+            SpecialOffer.objects.create(menu_item=first, title='Ten', discount_percentage='10', start_date=self.today, end_date=self.today)
+            self.best = SpecialOffer.objects.create(
+                menu_item=first, title='Quarter', discount_percentage='25',
+                start_date=self.today - timedelta(days=1), end_date=self.today,
+            )
+            SpecialOffer.objects.create(
+                menu_item=second, title='Soon', discount_percentage='50',
+                start_date=self.today + timedelta(days=1), end_date=self.today + timedelta(days=3),
+            )
+
+    def test_the_best_valid_offer_wins(self):
+        prices = effective_prices(item.pk for item in self.items)
+        self.assertEqual(prices[self.items[0].pk].price, Decimal('7.50'))
+        self.assertEqual(prices[self.items[0].pk].offer_id, self.best.pk)
+        self.assertEqual(prices[self.items[1].pk].price, Decimal('10.00'))
+        later = self.today + timedelta(days=2)
+        self.assertEqual(effective_price(self.items[1].pk, later).price, Decimal('5.00'))
+
+    def test_a_batch_is_computed_once_then_read(self):
+        ids = [item.pk for item in self.items]
+        with CaptureQueriesContext(connection) as queries:
+            effective_prices(ids)
+        self.assertEqual(len(queries), 4)      # cached rows, computation, stale rows, insert
+        with self.assertNumQueries(1):
+            effective_prices(ids)
+
+    def test_order_lines_take_the_effective_price(self):
+        user = User.objects.create(username='guest', email='guest@example.com')
+        order = Order.objects.create(user=user)
+        line = OrderItem.objects.create(order=order, menu_item=self.items[0])
+        self.assertEqual(line.price, Decimal('7.50'))
+
+    def test_a_price_computed_before_a_change_is_not_served_after_it(self):
+        compute = pricing._compute
+
+        def change_meanwhile(menu_item_ids, on_date):
+            computed = compute(menu_item_ids, on_date)
+            # the offer change commits and its invalidation runs before the insert
+            with self.captureOnCommitCallbacks(execute=True):
+                self.best.discount_percentage = Decimal('50')
+                self.best.save()
+            return computed
+
+        with mock.patch.object(pricing, '_compute', change_meanwhile):
+            self.assertEqual(effective_price(self.items[0].pk).price, Decimal('7.50'))
+        self.assertEqual(effective_price(self.items[0].pk).price, Decimal('5.00'))
+
+    def test_past_prices_are_pruned(self):
+        ids = [item.pk for item in self.items]
+        effective_prices(ids, self.today - timedelta(days=3))
+        call_command('precompute_menu_prices', '--days', '2', stdout=StringIO())
+        self.assertEqual(
+            set(DailyMenuPrice.objects.values_list('date', flat=True)), {self.today, self.today + timedelta(days=1)}
+        )
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            Table.objects.create(number=1, size=4)
+
+    def test_hits_skip_the_database_and_answer_conditional_requests(self):
+        first = self.client.get('/api/restaurants/tables/')
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            hit = self.client.get('/api/restaurants/tables/')
+        self.assertEqual((hit.content, hit['Content-Type']), (first.content, first['Content-Type']))
+        self.assertEqual(self.client.get('/api/restaurants/tables/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(
+            self.client.get('/api/restaurants/tables/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304,
+        )
+
+    def test_changes_of_a_dependency_are_served_at_once(self):
+        etag = self.client.get('/api/restaurants/tables/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Table.objects.create(number=2, size=4)
+        response = self.client.get('/api/restaurants/tables/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            category = MenuCategory.objects.create(name='Soups')
+            item = MenuItem.objects.create(category=category, name='Tomato', price=1)
+        self.client.get(f'/api/restaurants/menu-items/{item.pk}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            category.name = 'Broths'
+            category.save()
+        self.assertEqual(self.client.get(f'/api/restaurants/menu-items/{item.pk}/').json()['category_name'], 'Broths')
+
+
+class MenuSyncTests(TestCase):
+    menu = (
+        'category,name,price,order,offer_title,offer_discount,offer_start,offer_end\n'
+        'Soups,Tomato,4.50,1,Soup week,10,2026-01-05,2026-01-11\n'
+        'Soups,Leek,5.00,2,,,,\n'
+    )
+
+    def sync(self, content=None):
+        return sync_menu(parse_menu(content or self.menu, 'csv'))
+
+    def test_a_second_sync_of_the_same_file_changes_nothing(self):
+        report = self.sync()
+        self.assertEqual(sorted(report['items']['created']), ['Soups / Leek', 'Soups / Tomato'])
+        report = self.sync()
+        for section in report.values():
+            self.assertEqual(section['updated'], [])
+            self.assertEqual(section['created'], [])
+
+    def test_null_descriptions_match_empty_ones(self):
+        self.sync()
+        # rows created outside the sync keep NULL descriptions
+        MenuCategory.objects.update(description=None)
+        MenuItem.objects.update(description=None)
+        SpecialOffer.objects.update(description=None)
+        report = self.sync()
+        self.assertEqual([section['updated'] for section in report.values()], [[], [], []])
+
+    def test_rows_missing_from_the_file_are_switched_off(self):
+        self.sync()
+        report = self.sync(self.menu.replace('Soup week,10,2026-01-05,2026-01-11', ',,,').replace('Soups,Leek,5.00,2,,,,\n', ''))
+        self.assertEqual(report['items']['deactivated'], ['Soups / Leek'])
+        self.assertEqual(report['offers']['deactivated'], ['Soups / Tomato / Soup week'])
+        self.assertFalse(MenuItem.objects.get(name='Leek').is_available)
+        self.assertFalse(SpecialOffer.objects.get().is_active)
+
+    def test_a_dry_run_writes_nothing(self):
+        report = sync_menu(parse_menu(self.menu, 'csv'), dry_run=True)
+        self.assertEqual(len(report['items']['created']), 2)
+        self.assertFalse(MenuItem.objects.exists())
+        self.assertFalse(MenuCategory.objects.exists())
+
+    def test_changed_values_are_updated(self):
+        self.sync()
+        report = self.sync(self.menu.replace('Leek,5.00', 'Leek,5.50'))
+        self.assertEqual(len(report['items']['updated']), 1)
+        self.assertEqual(MenuItem.objects.get(name='Leek').price, Decimal('5.50'))
+
+
+class MenuSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        today = timezone.localdate()
+        # run the version bumps now, later saves would only join this pending batch
+        with self.captureOnCommitCallbacks(execute=True):
+            category = MenuCategory.objects.create(name='Mains')
+            MenuCategory.objects.create(name='Hidden', is_active=False)
+            self.dish = MenuItem.objects.create(category=category, name='Soup', price='2.50')
+            MenuItem.objects.create(category=category, name='Sold out', price='2.50', is_available=False)
+            SpecialOffer.objects.create(
+                menu_item=self.dish, title='Today', discount_percentage='10', start_date=today, end_date=today,
+            )
+            SpecialOffer.objects.create(
+                menu_item=self.dish, title='Past', discount_percentage='50',
+                start_date=today - timedelta(days=9), end_date=today - timedelta(days=2),
+            )
+
+    def test_snapshot_lists_what_is_on_offer_today(self):
+        menu = self.client.get('/api/restaurants/menu/').json()
+        self.assertEqual([category['name'] for category in menu['categories']], ['Mains'])
+        (item,) = menu['categories'][0]['menu_items']
+        self.assertEqual(item['name'], 'Soup')
+        self.assertEqual([offer['title'] for offer in item['special_offers']], ['Today'])
+        self.assertEqual(Decimal(item['effective_price']), Decimal('2.25'))
+
+    def test_cached_until_the_menu_changes(self):
+        first = self.client.get('/api/restaurants/menu/')
+        with self.assertNumQueries(0):
+            unchanged = self.client.get('/api/restaurants/menu/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(unchanged.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dish.price = Decimal('3.00')
+            self.dish.save()
+        changed = self.client.get('/api/restaurants/menu/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+        self.assertEqual(Decimal(changed.json()['categories'][0]['menu_items'][0]['effective_price']), Decimal('2.70'))
+
+
+class MenuSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sandwiches = MenuCategory.objects.create(name='Sandwiches', description='')
+            desserts = MenuCategory.objects.create(name='Desserts', description='', is_active=False)
+            self.club = MenuItem.objects.create(
+                category=self.sandwiches, name='Chicken Club', description='grilled chicken, bacon, lettuce', price=10,
+            )
+            self.wrap = MenuItem.objects.create(
+                category=self.sandwiches, name='Veggie Wrap', description='hummus and chickpeas', price=8,
+            )
+            MenuItem.objects.create(category=desserts, name='Chicken cake', description='', price=5)
+
+    def search(self, query):
+        response = self.client.get('/api/restaurants/menu/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [result['id'] for result in response.json()['results']]
+
+    def test_exact_prefix_and_typo_matches(self):
+        self.assertEqual(self.search('chiken'), [self.club.pk])
+        # the name prefix ranks above the description prefix
+        self.assertEqual(self.search('chick'), [self.club.pk, self.wrap.pk])
+        self.assertEqual(sorted(self.search('sandwich')), sorted([self.club.pk, self.wrap.pk]))
+        self.assertEqual(self.client.get('/api/restaurants/menu/search/').status_code, 400)
+
+    def test_index_follows_menu_changes(self):
+        self.assertEqual(self.search('tuna'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            tuna = MenuItem.objects.create(category=self.sandwiches, name='Tuna melt', description='', price=9)
+        self.assertEqual(self.search('tuna'), [tuna.pk])
+
+    def test_more_matching_terms_rank_first(self):
+        index = MenuSearchIndex([
+            (1, {'name': 'Crème brûlée', 'description': '', 'category': 'Desserts'}),
+            (2, {'name': 'Brulee tart', 'description': 'with cream', 'category': 'Desserts'}),
+        ])
+        self.assertEqual([pk for pk, _ in index.search('creme brulee')], [1, 2])
+
+
+def png(color, size=(2000, 1500)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGBA', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+# rendered inline instead of in the process pool
+@override_settings(IMAGE_VARIANTS_ASYNC=False)
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(self.settings(MEDIA_ROOT=media_root))
+        self.category = MenuCategory.objects.create(name='Soups')
+
+    def create_item(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            item = MenuItem.objects.create(
+                category=self.category, name='Soup', price=3, image=SimpleUploadedFile('soup.png', image),
+            )
+        item.refresh_from_db()
+        return item
+
+    def test_uploads_get_scaled_down_variants(self):
+        item = self.create_item(png((255, 0, 0, 128)))
+        self.assertEqual(set(item.image_variants), {'source', 'hash', 'thumb', 'card', 'full'})
+        for variant, size in (('thumb', (160, 120)), ('card', (480, 360)), ('full', (1280, 960))):
+            for extension in ('webp', 'jpeg'):
+                with default_storage.open(item.image_variants[variant][extension]) as stored:
+                    self.assertEqual(Image.open(stored).size, size)
+        urls = APIClient().get(f'/api/restaurants/menu-items/{item.pk}/').json()['image_variants']
+        self.assertTrue(urls['thumb']['webp'].endswith('.webp'))
+
+    def test_variants_follow_the_source_file(self):
+        item = self.create_item(png((255, 0, 0, 255)))
+        old = dict(item.image_variants)
+        with self.captureOnCommitCallbacks(execute=True):
+            item.name = 'Tomato soup'
+            item.save()
+        item.refresh_from_db()
+        self.assertEqual(item.image_variants, old)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.image = SimpleUploadedFile('soup2.png', png((0, 255, 0, 255)))
+            item.save()
+        item.refresh_from_db()
+        self.assertNotEqual(item.image_variants['hash'], old['hash'])
+        self.assertFalse(default_storage.exists(old['full']['jpeg']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.image = None
+            item.save()
+        item.refresh_from_db()
+        self.assertEqual(item.image_variants, {})
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     RestaurantViewSet, MenuCategoryViewSet, MenuItemViewSet,
-    SpecialOfferViewSet, TableViewSet
+    SpecialOfferViewSet, TableViewSet, MenuView, MenuSearchView
 )
 
 router = DefaultRouter()
@@ -13,5 +13,7 @@ router.register(r'special-offers', SpecialOfferViewSet)
 router.register(r'tables', TableViewSet)
 
 urlpatterns = [
+    path('menu/', MenuView.as_view(), name='menu'),
+    path('menu/search/', MenuSearchView.as_view(), name='menu-search'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
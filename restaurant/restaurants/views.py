@@ -1,4 +1,12 @@
-from rest_framework import viewsets
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework import serializers, viewsets
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .menu import menu_snapshot
+from .search import get_search_index
 from .models import Restaurant, MenuCategory, MenuItem, SpecialOffer, Table
 from .serializers import (
     RestaurantSerializer, 
@@ -11,19 +19,78 @@ from .serializers import (
 class RestaurantViewSet(viewsets.ModelViewSet):
     queryset = Restaurant.objects.all()
     serializer_class = RestaurantSerializer
+    cursor_ordering = ('id',)
+    # responses are cached until one of these models changes, see restaurant/response_cache.py
+    cache_dependencies = (Restaurant,)
 
 class MenuCategoryViewSet(viewsets.ModelViewSet):
     queryset = MenuCategory.objects.filter(is_active=True)
     serializer_class = MenuCategorySerializer
+    cursor_ordering = ('order', 'id')
+    cache_dependencies = (MenuCategory,)
 
 class MenuItemViewSet(viewsets.ModelViewSet):
-    queryset = MenuItem.objects.filter(is_available=True)
+    queryset = MenuItem.objects.filter(is_available=True).select_related('category')
     serializer_class = MenuItemSerializer
+    cursor_ordering = ('order', 'id')
+    # effective_price depends on the offers valid today
+    cache_dependencies = (MenuItem, MenuCategory, SpecialOffer)
+    cache_per_day = True
 
 class SpecialOfferViewSet(viewsets.ModelViewSet):
-    queryset = SpecialOffer.objects.filter(is_active=True)
+    queryset = SpecialOffer.objects.filter(is_active=True).select_related('menu_item')
     serializer_class = SpecialOfferSerializer
+    cursor_ordering = ('-start_date', 'id')
+    cache_dependencies = (SpecialOffer, MenuItem)
+    cache_per_day = True
+
+    # the list shows the offers valid today, ?all=true includes past and upcoming ones
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list' and self.request.query_params.get('all') != 'true':
+            today = timezone.localdate()
+            queryset = queryset.filter(start_date__lte=today, end_date__gte=today)
+        return queryset
 
 class TableViewSet(viewsets.ModelViewSet):
     queryset = Table.objects.filter(is_available=True)
-    serializer_class = TableSerializer
\ No newline at end of file
+    serializer_class = TableSerializer
+    cursor_ordering = ('number',)
+    cache_dependencies = (Table,)
+
+# Whole menu in one request: categories > items > today's offers
+# served from the cache with a strong ETag, a matching If-None-Match gets a 304
+
+class MenuView(APIView):
+    def get(self, request):
+        etag, content = menu_snapshot()
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+# Menu search: ?q=chiken sand&limit=20
+# ranked matches on item name, description and category, with prefix and typo tolerance
+# answered from the in-process index of restaurants/search.py
+
+class MenuSearchView(APIView):
+    class ParamsSerializer(serializers.Serializer):
+        q = serializers.CharField(max_length=200)
+        limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+
+    def get(self, request):
+        params = self.ParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        matches = get_search_index().search(params.validated_data['q'], params.validated_data['limit'])
+
+        items = MenuItem.objects.select_related('category').in_bulk([item_id for item_id, _ in matches])
+        ranked = [items[item_id] for item_id, _ in matches if item_id in items]
+        results = MenuItemSerializer(ranked, many=True).data
+        scores = dict(matches)
+        for result in results:
+            result['score'] = scores[result['id']]
+        return Response({'query': params.validated_data['q'], 'count': len(results), 'results': results})
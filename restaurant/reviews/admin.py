@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Review
+from .models import DailyRating, RatingSummary, Review
 
 
 @admin.register(Review)
@@ -8,3 +8,24 @@ class ReviewAdmin(admin.ModelAdmin):
     list_filter = ("rating", "created_at")
     search_fields = ("user__username", "comment")
     ordering = ("-created_at",)
+
+
+# aggregates are maintained by signals and the rebuild command, never edited by hand
+class ReadOnlyRatingAdmin(admin.ModelAdmin):
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RatingSummary)
+class RatingSummaryAdmin(ReadOnlyRatingAdmin):
+    list_display = ("count", "total", "stars_1", "stars_2", "stars_3", "stars_4", "stars_5")
+
+
+@admin.register(DailyRating)
+class DailyRatingAdmin(ReadOnlyRatingAdmin):
+    list_display = ("date", "count", "total", "stars_1", "stars_2", "stars_3", "stars_4", "stars_5")
+    date_hierarchy = "date"
+    ordering = ("-date",)
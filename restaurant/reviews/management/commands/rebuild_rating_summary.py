@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from restaurant.versioning import bump_model_version
+from reviews.models import RATING_FIELDS, DailyRating, RatingSummary, Review, count_ratings, rating_totals
+
+# Management command to rebuild the rating aggregates from the reviews
+# Usage: python manage.py rebuild_rating_summary [--check]
+# Counts the reviews per day and rating with one GROUP BY and replaces the
+# summary and daily rows in one transaction. The summary row stays locked
+# meanwhile, so reviews saved during the rebuild are added on top of it.
+# With --check only the drift of the stored aggregates is reported.
+class Command(BaseCommand):
+    help = "Recompute the review rating summary and daily rating rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only report the drift")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            RatingSummary.objects.get_or_create(singleton=True)
+            RatingSummary.objects.select_for_update().get(singleton=True)
+
+            daily = count_ratings(Review.objects.all())
+            totals = rating_totals(daily)
+
+            stored = {row.pop('date'): row for row in DailyRating.objects.values('date', *RATING_FIELDS)}
+            drifted = sorted(
+                day for day in {*daily, *stored}
+                if stored.get(day, dict.fromkeys(RATING_FIELDS, 0)) != daily.get(day, dict.fromkeys(RATING_FIELDS, 0))
+            )
+            summary = RatingSummary.objects.values(*RATING_FIELDS).get(singleton=True)
+            if summary != totals:
+                self.stdout.write(f"  summary: stored {summary}, actual {totals}")
+            for day in drifted[:20]:
+                self.stdout.write(f"  {day}: stored {stored.get(day)}, actual {daily.get(day)}")
+            if options["check"]:
+                message = f"{len(drifted)} drifted day(s), summary {'ok' if summary == totals else 'drifted'}."
+                self.stdout.write(self.style.WARNING(message) if drifted or summary != totals else message)
+                return
+
+            DailyRating.objects.all().delete()
+            DailyRating.objects.bulk_create(
+                [DailyRating(date=day, **figures) for day, figures in sorted(daily.items())], batch_size=1000
+            )
+            RatingSummary.objects.filter(singleton=True).update(**totals)
+            transaction.on_commit(lambda: bump_model_version(RatingSummary))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt rating aggregates: {totals['count']} reviews over {len(daily)} day(s), "
+            f"{len(drifted)} day(s) had drifted."
+        ))
@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from restaurant.versioning import bump_model_version
+from reviews.models import Review, ReviewBucket, ReviewSignature
+from reviews.similarity import MAX_CANDIDATES, bucket_keys, best_match, minhash_rows
+
+# Management command to score historical reviews for near-duplicates
+# Usage: python manage.py score_reviews [--rebuild] [--workers 4] [--chunk-size 500]
+# Reviews without a signature are read in id order, one chunk at a time; the
+# MinHash signatures are computed in worker processes while the main process
+# looks up the LSH buckets of earlier reviews and writes each chunk in one
+# transaction, skipping the reviews edited (and so indexed) or deleted since
+# the chunk was read. --rebuild drops every signature first. See reviews/similarity.py.
+class Command(BaseCommand):
+    help = "Compute MinHash signatures of reviews and flag near-duplicates"
+
+    # keys per IN query, below the SQLite parameter limit
+    KEYS_PER_QUERY = 900
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true", help="Drop all signatures and score every review")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["chunk_size"] < 1:
+            raise CommandError("--workers and --chunk-size must be positive")
+        if options["rebuild"]:
+            with transaction.atomic():
+                ReviewBucket.objects.all().delete()
+                ReviewSignature.objects.all().delete()
+
+        started = time.monotonic()
+        scored = flagged = 0
+        # spawn: workers only import reviews.similarity, no Django setup needed
+        with ProcessPoolExecutor(
+            max_workers=options["workers"], mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            for signatures in self._signatures(executor, options["chunk_size"], options["workers"] * 2):
+                stored, duplicates = self._store(signatures)
+                scored += stored
+                flagged += duplicates
+                self.stdout.write(f"  {scored} reviews scored, {flagged} flagged (last id {signatures[-1][0]})")
+
+        if scored:
+            # cached review responses now carry duplicate_of
+            bump_model_version(Review)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {scored} reviews in {elapsed:.1f}s, {flagged} flagged as near-duplicates."
+        ))
+
+    def _signatures(self, executor, chunk_size, ahead):
+        """Signatures of the unscored reviews chunk by chunk, in id order, with up to ahead chunks in flight."""
+        unscored = Review.objects.filter(signature__isnull=True).order_by("id")
+        pending = deque()
+        last_id = 0
+        while True:
+            while len(pending) < ahead:
+                rows = list(unscored.filter(id__gt=last_id).values_list("id", "comment")[:chunk_size])
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                pending.append(executor.submit(minhash_rows, rows))
+            if not pending:
+                return
+            yield pending.popleft().result()
+
+    def _store(self, signatures) -> tuple:
+        """Flag and index one chunk against the earlier reviews; returns (stored, flagged)."""
+        keys = {pk: bucket_keys(signature) for pk, signature in signatures if signature is not None}
+        members = {}
+        all_keys = sorted({key for review_keys in keys.values() for key in review_keys})
+        for start in range(0, len(all_keys), self.KEYS_PER_QUERY):
+            rows = ReviewBucket.objects.filter(key__in=all_keys[start:start + self.KEYS_PER_QUERY])
+            for key, review_id in rows.values_list("key", "review_id"):
+                members.setdefault(key, set()).add(review_id)
+        candidate_ids = set().union(*members.values()) if members else set()
+        known = dict(ReviewSignature.objects.filter(review_id__in=candidate_ids).values_list("review_id", "signature"))
+
+        new_signatures, buckets = [], []
+        for pk, signature in signatures:
+            duplicate_of = score = None
+            if signature is not None:
+                candidates = {
+                    other for key in keys[pk] for other in members.get(key, ()) if other < pk and other in known
+                }
+                latest = sorted(candidates, reverse=True)[:MAX_CANDIDATES]
+                duplicate_of, score = best_match(signature, ((other, known[other]) for other in latest))
+                # later reviews of the chunk are compared with this one
+                for key in keys[pk]:
+                    members.setdefault(key, set()).add(pk)
+                known[pk] = signature
+                buckets.extend(ReviewBucket(review_id=pk, key=key) for key in keys[pk])
+            new_signatures.append(ReviewSignature(
+                review_id=pk, signature=signature, duplicate_of_id=duplicate_of,
+                similarity=score if duplicate_of else None,
+            ))
+        with transaction.atomic():
+            # reviews edited (indexed by their post_save signal) or deleted
+            # since the chunk was read are left as they are now
+            ids = [pk for pk, _ in signatures]
+            unscored = set(Review.objects.select_for_update().filter(pk__in=ids).values_list("pk", flat=True))
+            unscored -= set(ReviewSignature.objects.filter(review_id__in=ids).values_list("review_id", flat=True))
+            new_signatures = [row for row in new_signatures if row.review_id in unscored]
+            ReviewSignature.objects.bulk_create(new_signatures, batch_size=500)
+            ReviewBucket.objects.bulk_create([row for row in buckets if row.review_id in unscored], batch_size=1000)
+        return len(new_signatures), sum(row.duplicate_of_id is not None for row in new_signatures)
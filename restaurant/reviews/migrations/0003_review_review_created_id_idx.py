@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_initial'),
+        ('users', '0002_alter_user_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['-created_at', 'id'], name='review_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:47
+
+from django.db import migrations, models
+from reviews.models import count_ratings, rating_totals
+
+
+def build_rating_aggregates(apps, schema_editor):
+    # existing reviews must be counted: removing one would otherwise
+    # decrement aggregates that never held it
+    Review = apps.get_model('reviews', 'Review')
+    DailyRating = apps.get_model('reviews', 'DailyRating')
+    RatingSummary = apps.get_model('reviews', 'RatingSummary')
+    daily = count_ratings(Review.objects.all())
+    DailyRating.objects.bulk_create(
+        [DailyRating(date=day, **figures) for day, figures in sorted(daily.items())], batch_size=1000
+    )
+    RatingSummary.objects.create(singleton=True, **rating_totals(daily))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_review_review_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('date', models.DateField(unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Ratings',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RatingSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('singleton', models.BooleanField(default=True, editable=False)),
+            ],
+            options={
+                'verbose_name_plural': 'Rating Summary',
+                'constraints': [models.UniqueConstraint(fields=('singleton',), name='single_rating_summary')],
+            },
+        ),
+        migrations.RunPython(build_rating_aggregates, migrations.RunPython.noop),
+    ]
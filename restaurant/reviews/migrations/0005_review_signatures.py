@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewSignature',
+            fields=[
+                ('review', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='reviews.review')),
+                ('signature', models.BinaryField(null=True)),
+                ('similarity', models.FloatField(blank=True, null=True)),
+                ('duplicate_of', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='reviews.review')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReviewBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField()),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='reviews.review')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key'], name='review_bucket_key_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,12 @@
-from django.db import models
+from collections import defaultdict
+from datetime import timedelta
+from django.db import models, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest, TruncDate
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from restaurant.versioning import track_model_versions
 from users.models import User
 
 # Create your models here.
@@ -16,5 +24,206 @@ class Review(models.Model):
     comment = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # supports the keyset pagination of the review list
+        indexes = [
+            models.Index(fields=['-created_at', 'id'], name='review_created_id_idx'),
+        ]
+
     def __str__(self):
-        return f'Review by {self.user.username} - {self.rating} stars'
\ No newline at end of file
+        return f'Review by {self.user.username} - {self.rating} stars'
+
+
+# bump the cached review responses (restaurant/response_cache.py) on change
+track_model_versions(Review)
+
+
+"""
+Rating aggregates
+- One summary row for all reviews, one row per day (of created_at)
+- Both hold the count, the sum of the ratings and a 1-5 star histogram
+- Kept current by the review signals with F() increments, in the transaction
+  of the review change; decrements stop at 0, so a row that missed reviews
+  never fails the review write (rebuild_rating_summary --check reports it)
+- Rolling windows add up the daily rows of the window (at most 90 rows)
+- Built by migration 0004 and rebuilt with the rebuild_rating_summary command,
+  both from count_ratings()
+"""
+
+RATING_WINDOWS = (30, 90)  # days
+STAR_FIELDS = {rating: f'stars_{rating}' for rating, _ in Review.Rating_CHOICES}
+RATING_FIELDS = ('count', 'total', *STAR_FIELDS.values())
+
+
+class RatingFigures(models.Model):
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)  # sum of the ratings
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class RatingSummary(RatingFigures):
+    # always True: the unique constraint on it allows a single row
+    singleton = models.BooleanField(default=True, editable=False)
+
+    class Meta:
+        verbose_name_plural = 'Rating Summary'
+        constraints = [
+            models.UniqueConstraint(fields=['singleton'], name='single_rating_summary'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.count} reviews'
+
+
+class DailyRating(RatingFigures):
+    date = models.DateField(unique=True)
+
+    class Meta:
+        ordering = ['date']
+        verbose_name_plural = 'Daily Ratings'
+
+    def __str__(self) -> str:
+        return f'{self.date}: {self.count} reviews'
+
+
+def _increment(model, lookup: dict, changes: dict) -> None:
+    if not model.objects.filter(**lookup).update(**changes):
+        model.objects.get_or_create(**lookup)
+        model.objects.filter(**lookup).update(**changes)
+
+
+def _add(field: str, amount: int):
+    # the columns are unsigned: a decrement below 0 would fail the review write
+    return F(field) + amount if amount >= 0 else Greatest(F(field) + amount, 0)
+
+
+def apply_rating_delta(day, rating: int, step: int) -> None:
+    """Add (step=1) or remove (step=-1) one rating given on day."""
+    if rating not in STAR_FIELDS:
+        return
+    changes = {
+        'count': _add('count', step),
+        'total': _add('total', rating * step),
+        STAR_FIELDS[rating]: _add(STAR_FIELDS[rating], step),
+    }
+    # summary first: the rebuild command locks it before rewriting the daily rows
+    with transaction.atomic():
+        _increment(RatingSummary, {'singleton': True}, changes)
+        _increment(DailyRating, {'date': day}, changes)
+
+
+def count_ratings(reviews) -> dict:
+    """Aggregate fields per day of created_at, counted with one GROUP BY."""
+    daily = defaultdict(lambda: dict.fromkeys(RATING_FIELDS, 0))
+    counts = (
+        reviews.annotate(day=TruncDate('created_at'))
+        .values_list('day', 'rating').annotate(reviews=Count('id')).order_by()
+    )
+    for day, rating, number in counts:
+        if rating not in STAR_FIELDS:
+            continue
+        figures = daily[day]
+        figures['count'] += number
+        figures['total'] += rating * number
+        figures[STAR_FIELDS[rating]] += number
+    return dict(daily)
+
+
+def rating_totals(daily: dict) -> dict:
+    """Summary fields of the count_ratings() days."""
+    return {field: sum(figures[field] for figures in daily.values()) for field in RATING_FIELDS}
+
+
+def _figures(row) -> dict:
+    count = row['count'] or 0
+    return {
+        'count': count,
+        'average': round((row['total'] or 0) / count, 2) if count else None,
+        'histogram': {str(rating): row[field] or 0 for rating, field in STAR_FIELDS.items()},
+    }
+
+
+def rating_summary(today=None) -> dict:
+    """Average, count and histogram overall and over the rolling windows."""
+    today = today or timezone.localdate()
+    summary = RatingSummary.objects.values(*RATING_FIELDS).first() or dict.fromkeys(RATING_FIELDS, 0)
+    data = _figures(summary)
+    for days in RATING_WINDOWS:
+        window = DailyRating.objects.filter(date__gt=today - timedelta(days=days)).aggregate(
+            **{field: Sum(field) for field in RATING_FIELDS}
+        )
+        data[f'last_{days}_days'] = _figures(window)
+    return data
+
+
+# MinHash signature of a review comment, packed, and the earlier review it
+# near-duplicates if any (see reviews/similarity.py); no signature when the
+# comment is too short to compare
+class ReviewSignature(models.Model):
+    review = models.OneToOneField(Review, primary_key=True, related_name='signature', on_delete=models.CASCADE)
+    signature = models.BinaryField(null=True)
+    duplicate_of = models.ForeignKey(
+        Review, null=True, blank=True, related_name='duplicates', on_delete=models.SET_NULL
+    )
+    similarity = models.FloatField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f'Signature of review {self.review_id}'
+
+
+# LSH buckets of a signature, one per band; reviews sharing a key are the
+# only ones compared with each other
+class ReviewBucket(models.Model):
+    review = models.ForeignKey(Review, related_name='buckets', on_delete=models.CASCADE)
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['key'], name='review_bucket_key_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'Bucket {self.key} of review {self.review_id}'
+
+
+# === SIGNALS ===
+# remember the rating a review was loaded with, to move it between histogram
+# bars, and its comment, to index it again only when it changed
+@receiver(post_init, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    instance._saved_rating = instance.__dict__.get('rating') if instance.pk else None
+    instance._saved_comment = instance.__dict__.get('comment') if instance.pk else None
+
+
+@receiver(post_save, sender=Review)
+def count_review_rating(sender, instance, created, **kwargs):
+    day = timezone.localdate(instance.created_at)
+    if created:
+        apply_rating_delta(day, instance.rating, 1)
+    elif instance._saved_rating is not None and instance.rating != instance._saved_rating:
+        apply_rating_delta(day, instance._saved_rating, -1)
+        apply_rating_delta(day, instance.rating, 1)
+    instance._saved_rating = instance.rating
+
+
+@receiver(post_delete, sender=Review)
+def uncount_review_rating(sender, instance, **kwargs):
+    if instance._saved_rating is not None:
+        apply_rating_delta(timezone.localdate(instance.created_at), instance._saved_rating, -1)
+
+
+# new and edited comments are checked for near-duplicates and indexed
+@receiver(post_save, sender=Review)
+def index_review_comment(sender, instance, created, **kwargs):
+    if created or instance.comment != instance._saved_comment:
+        from .similarity import index_review
+
+        index_review(instance)
+    instance._saved_comment = instance.comment
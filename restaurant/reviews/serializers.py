@@ -3,7 +3,13 @@ from .models import Review
 
 class ReviewSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.username', read_only=True)
+    # earlier review this one near-duplicates, see reviews/similarity.py
+    duplicate_of = serializers.SerializerMethodField()
     
     class Meta:
         model = Review
-        fields = ['id', 'user', 'user_name', 'rating', 'comment', 'created_at']
\ No newline at end of file
+        fields = ['id', 'user', 'user_name', 'rating', 'comment', 'duplicate_of', 'created_at']
+
+    def get_duplicate_of(self, review):
+        signature = getattr(review, 'signature', None)
+        return signature.duplicate_of_id if signature else None
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+Near-duplicate detection of review comments with MinHash and LSH.
+
+A comment is normalized (case, punctuation, whitespace) and cut into
+overlapping word shingles. Its MinHash signature keeps, for each of
+NUM_HASHES seeded hash functions, the smallest hash of any shingle. The share
+of equal positions between two signatures estimates the Jaccard similarity
+of their shingle sets. Signatures are stored packed (4 bytes per position),
+so old comments are never hashed again.
+
+For the lookup the signature is cut into BANDS bands of ROWS_PER_BAND
+positions. Each band is hashed to a 64-bit bucket key, stored in
+ReviewBucket and indexed. Reviews sharing at least one bucket with the new
+comment are the only candidates compared, which is an indexed IN query
+instead of a scan of every review. With 16 bands of 8 rows, a pair at
+similarity s shares a bucket with probability 1 - (1 - s^8)^16: 0.94 at 0.8,
+0.01 at 0.4.
+
+A new review whose best candidate reaches DUPLICATE_THRESHOLD is flagged as a
+duplicate of that (earlier) review. Comments with fewer than MIN_SHINGLES
+shingles are too short to tell copy-paste from "Great food!": their row has
+no signature, so they are never compared, nor hashed again.
+
+The signature functions only need the standard library, so the score_reviews
+command runs them in worker processes.
+"""
+import hashlib
+import random
+import re
+import struct
+import zlib
+
+NUM_HASHES = 128
+BANDS = 16
+ROWS_PER_BAND = NUM_HASHES // BANDS
+SHINGLE_WORDS = 3
+MIN_SHINGLES = 4
+DUPLICATE_THRESHOLD = 0.8
+# bounds the work for a hot bucket (a spam wave), the latest ones are compared
+MAX_CANDIDATES = 200
+
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+_random = random.Random(20240611)   # fixed: stored signatures must stay comparable
+_HASH_PARAMS = [(_random.randrange(1, _PRIME), _random.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+_SIGNATURE = struct.Struct(f'<{NUM_HASHES}I')
+_WORD = re.compile(r'\w+')
+
+
+def shingles(text) -> set:
+    """Hashes of the overlapping SHINGLE_WORDS-word runs of the normalized text."""
+    words = _WORD.findall((text or '').lower())
+    return {
+        zlib.crc32(' '.join(words[index:index + SHINGLE_WORDS]).encode())
+        for index in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def minhash(text):
+    """Packed signature of a comment, None when it is too short to compare."""
+    hashes = shingles(text)
+    if len(hashes) < MIN_SHINGLES:
+        return None
+    return _SIGNATURE.pack(*(min((a * x + b) % _PRIME for x in hashes) & _MASK for a, b in _HASH_PARAMS))
+
+
+def minhash_rows(rows) -> list:
+    """(id, signature) of (id, comment) rows (runs in a worker)."""
+    return [(pk, minhash(comment)) for pk, comment in rows]
+
+
+def bucket_keys(signature: bytes) -> list:
+    """One signed 64-bit key per band, the band number included."""
+    width = ROWS_PER_BAND * 4
+    return [
+        int.from_bytes(
+            hashlib.blake2b(bytes([band]) + signature[band * width:(band + 1) * width], digest_size=8).digest(),
+            'big', signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def similarity(first: bytes, second: bytes) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(_SIGNATURE.unpack(first), _SIGNATURE.unpack(second))) / NUM_HASHES
+
+
+def best_match(signature: bytes, candidates):
+    """(review id, similarity) of the most similar (id, signature) candidate at the threshold."""
+    best = (None, 0.0)
+    for pk, other in candidates:
+        score = similarity(signature, bytes(other))
+        if score > best[1] or (score == best[1] and best[0] is not None and pk < best[0]):
+            best = (pk, score)
+    return best if best[1] >= DUPLICATE_THRESHOLD else (None, best[1])
+
+
+def candidate_ids(keys, before_pk) -> list:
+    """The latest earlier reviews sharing a bucket with these keys."""
+    from .models import ReviewBucket
+
+    # evaluated here: MySQL has no LIMIT in IN subqueries
+    return list(
+        ReviewBucket.objects.filter(key__in=keys, review_id__lt=before_pk)
+        .order_by('-review_id').values_list('review_id', flat=True).distinct()[:MAX_CANDIDATES]
+    )
+
+
+def index_review(review) -> None:
+    """(Re)index a saved review and flag it when it duplicates an earlier one."""
+    from .models import ReviewBucket, ReviewSignature
+
+    ReviewBucket.objects.filter(review=review).delete()
+    signature = minhash(review.comment)
+    duplicate_of = score = None
+    if signature is not None:
+        keys = bucket_keys(signature)
+        candidates = (
+            ReviewSignature.objects
+            .filter(review_id__in=candidate_ids(keys, review.pk))
+            .values_list('review_id', 'signature')
+        )
+        duplicate_of, score = best_match(signature, candidates)
+        ReviewBucket.objects.bulk_create([ReviewBucket(review=review, key=key) for key in keys])
+    ReviewSignature.objects.update_or_create(review=review, defaults={
+        'signature': signature, 'duplicate_of_id': duplicate_of, 'similarity': score if duplicate_of else None,
+    })
@@ -1,3 +1,189 @@
+import random
+from importlib import import_module
+from datetime import timedelta
+from io import StringIO
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from .management.commands.score_reviews import Command as ScoreReviewsCommand
+from .models import DailyRating, RatingSummary, Review, ReviewBucket, ReviewSignature
+from .similarity import BANDS, DUPLICATE_THRESHOLD, minhash, minhash_rows, similarity
 
 # Create your tests here.
+
+
+class RatingSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create(username='guest', email='guest@example.com')
+            self.reviews = [Review.objects.create(user=self.user, rating=rating) for rating in (5, 4, 4, 3, 5)]
+        self.client = APIClient()
+
+    def summary(self):
+        return self.client.get('/api/reviews/summary/').json()
+
+    def check(self):
+        out = StringIO()
+        call_command('rebuild_rating_summary', '--check', stdout=out)
+        return out.getvalue()
+
+    def test_summary_is_kept_current_by_review_changes(self):
+        data = self.summary()
+        self.assertEqual((data['count'], data['average']), (5, 4.2))
+        self.assertEqual(data['histogram'], {'1': 0, '2': 0, '3': 1, '4': 2, '5': 2})
+        self.assertEqual(data['last_30_days']['count'], 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review = Review.objects.get(pk=self.reviews[0].pk)
+            review.rating = 2
+            review.save()
+            review.comment = 'Lovely terrace'   # not a rating change
+            review.save()
+            self.reviews[1].delete()
+            other = User.objects.create(username='other', email='other@example.com')
+            Review.objects.create(user=other, rating=1)
+            Review.objects.create(user=other, rating=3)
+            other.delete()                      # cascades to its reviews
+        data = self.summary()
+        self.assertEqual(data['histogram'], {'1': 0, '2': 1, '3': 1, '4': 1, '5': 1})
+        self.assertEqual((data['count'], data['average']), (4, 3.5))
+        self.assertIn('0 drifted day(s), summary ok', self.check())
+
+    def test_summary_is_served_from_cache(self):
+        data = self.summary()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.summary(), data)
+        self.assertEqual(len(queries), 0)
+
+    def test_rebuild_repairs_drift_and_windows(self):
+        # queryset updates bypass the signals: the review stays counted today
+        with self.captureOnCommitCallbacks(execute=True):
+            old = Review.objects.create(user=self.user, rating=1)
+        Review.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=60))
+        self.assertIn('2 drifted day(s), summary ok', self.check())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_rating_summary', stdout=StringIO())
+        data = self.summary()
+        self.assertEqual(
+            (data['count'], data['last_90_days']['count'], data['last_30_days']['count']), (6, 6, 5)
+        )
+        self.assertEqual(data['last_30_days']['average'], 4.2)
+        self.assertIn('0 drifted day(s), summary ok', self.check())
+
+    def test_missing_aggregates_never_fail_a_review_write(self):
+        # as on a database whose reviews predate the aggregates
+        RatingSummary.objects.all().delete()
+        DailyRating.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reviews[0].delete()
+            review = Review.objects.get(pk=self.reviews[1].pk)
+            review.rating = 1
+            review.save()
+        data = self.summary()
+        self.assertEqual((data['count'], data['histogram']['1'], data['histogram']['4']), (1, 1, 0))
+        self.assertIn('summary drifted', self.check())
+
+    def test_migration_counts_existing_reviews(self):
+        RatingSummary.objects.all().delete()
+        DailyRating.objects.all().delete()
+        migration = import_module('reviews.migrations.0004_rating_aggregates')
+        migration.build_rating_aggregates(apps, None)
+        self.assertIn('0 drifted day(s), summary ok', self.check())
+        self.assertEqual(RatingSummary.objects.get().count, 5)
+
+
+SPAM = 'Best restaurant in town visit our website for amazing discount codes and free meals every day'
+WORDS = (
+    'food service great table dinner waiter soup steak wine dessert slow quick friendly '
+    'rude cold warm tasty bland music cozy loud price cheap view terrace'
+).split()
+
+
+class DuplicateReviewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.random = random.Random(5)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create(username='guest', email='guest@example.com')
+        self.client = APIClient()
+
+    def comment(self, words=30):
+        return ' '.join(self.random.choice(WORDS) for _ in range(words))
+
+    def post(self, comment, rating=5):
+        response = self.client.post('/api/reviews/reviews/', {'user': self.user.pk, 'rating': rating, 'comment': comment})
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def test_signatures_estimate_similarity(self):
+        self.assertIsNone(minhash('Great food!'))
+        self.assertEqual(minhash(SPAM), minhash(SPAM.upper().replace(' ', ',  ')))
+        self.assertGreaterEqual(similarity(minhash(SPAM), minhash(SPAM + ' food')), DUPLICATE_THRESHOLD)
+        self.assertLess(similarity(minhash(SPAM), minhash(self.comment())), 0.3)
+
+    def test_new_and_edited_reviews_are_flagged(self):
+        original = self.post(SPAM)
+        self.assertIsNone(original['duplicate_of'])
+        copy = self.post('Best restaurant in town!! Visit our website for amazing discount codes, and free meals every day.')
+        self.assertEqual(copy['duplicate_of'], original['id'])
+        self.assertIsNone(self.post('Great food!')['duplicate_of'])
+        self.assertIsNone(ReviewSignature.objects.get(review__comment='Great food!').signature)
+
+        other = self.post(self.comment(), rating=4)
+        self.assertIsNone(other['duplicate_of'])
+        review = Review.objects.get(pk=other['id'])
+        review.comment = SPAM + ' cheap'
+        review.save()
+        self.assertEqual(ReviewSignature.objects.get(review=review).duplicate_of_id, original['id'])
+        self.assertEqual(ReviewBucket.objects.filter(review=review).count(), BANDS)
+        # a rating change does not index the comment again
+        with CaptureQueriesContext(connection) as queries:
+            review.rating = 3
+            review.save()
+        self.assertFalse(any('reviews_reviewbucket' in query['sql'].lower() for query in queries))
+
+    def test_score_reviews_flags_historical_copies(self):
+        # bulk_create skips the signals: none of these is indexed yet
+        Review.objects.bulk_create(
+            [Review(user=self.user, rating=3, comment=self.comment()) for _ in range(200)]
+            + [Review(user=self.user, rating=5, comment=f'{SPAM} {word}') for word in WORDS[:5]]
+            + [Review(user=self.user, rating=4, comment='Great food!')]
+        )
+        out = StringIO()
+        call_command('score_reviews', '--workers', '2', '--chunk-size', '50', stdout=out)
+        self.assertEqual(ReviewSignature.objects.count(), 206)
+
+        spam = list(Review.objects.filter(comment__startswith='Best').order_by('id').values_list('id', flat=True))
+        flagged = set(ReviewSignature.objects.filter(duplicate_of__isnull=False).values_list('review_id', flat=True))
+        self.assertEqual(flagged, set(spam[1:]))
+        self.assertIsNone(ReviewSignature.objects.get(review__comment='Great food!').signature)
+
+        out = StringIO()
+        call_command('score_reviews', '--workers', '1', stdout=out)
+        self.assertIn('Scored 0', out.getvalue())
+        call_command('score_reviews', '--rebuild', '--workers', '1', stdout=StringIO())
+        self.assertEqual(
+            set(ReviewSignature.objects.filter(duplicate_of__isnull=False).values_list('review_id', flat=True)), flagged
+        )
+
+    def test_score_reviews_leaves_reviews_changed_meanwhile(self):
+        Review.objects.bulk_create([Review(user=self.user, rating=3, comment=self.comment()) for _ in range(3)])
+        edited, deleted, untouched = Review.objects.order_by('id')
+        signatures = minhash_rows(Review.objects.order_by('id').values_list('id', 'comment'))
+        # while the workers hash the chunk, one review is edited and one deleted
+        edited.comment = SPAM
+        edited.save()
+        deleted.delete()
+
+        self.assertEqual(ScoreReviewsCommand()._store(signatures), (1, 0))
+        self.assertEqual(bytes(ReviewSignature.objects.get(review=edited).signature), minhash(SPAM))
+        self.assertEqual(set(ReviewSignature.objects.values_list('review_id', flat=True)), {edited.pk, untouched.pk})
+        self.assertEqual(ReviewBucket.objects.filter(review=edited).count(), BANDS)
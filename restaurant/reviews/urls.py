@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ReviewViewSet
+from .views import ReviewViewSet, RatingSummaryView
 
 router = DefaultRouter()
 router.register(r'reviews', ReviewViewSet)
 
 urlpatterns = [
+    path('summary/', RatingSummaryView.as_view(), name='review-summary'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,7 +1,25 @@
 from rest_framework import viewsets
-from .models import Review
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from users.models import User
+from .models import RatingSummary, Review, rating_summary
 from .serializers import ReviewSerializer
 
 class ReviewViewSet(viewsets.ModelViewSet):
-    queryset = Review.objects.all()
-    serializer_class = ReviewSerializer
\ No newline at end of file
+    queryset = Review.objects.select_related('user', 'signature')
+    serializer_class = ReviewSerializer
+    cursor_ordering = ('-created_at', 'id')
+    # responses are cached until one of these models changes, see restaurant/response_cache.py
+    cache_dependencies = (Review, User)
+
+
+# "4.3 from 2,104 reviews": average, count and 1-5 histogram, overall and over
+# the last 30/90 days, read from the rating aggregates (reviews/models.py)
+
+class RatingSummaryView(APIView):
+    # rolling windows move with the date
+    cache_dependencies = (Review, RatingSummary)
+    cache_per_day = True
+
+    def get(self, request):
+        return Response(rating_summary())
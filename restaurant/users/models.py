@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from restaurant.versioning import track_model_versions
 
 # model for custom user
 # use abstract user to extend the default user model
@@ -34,4 +35,9 @@ class User(AbstractUser):
     )
 
     def __str__(self):
-        return self.username
\ No newline at end of file
+        return self.username
+
+
+# cached responses showing user names (restaurant/response_cache.py) depend on it,
+# other edits (last_login, profile) leave them valid
+track_model_versions(User, fields=('username',))
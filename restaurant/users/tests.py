@@ -1,3 +1,44 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from restaurant.versioning import model_versions
+from reviews.models import Review
+from .models import User
 
-# Create your tests here.
+
+class UserVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create(username='guest', email='guest@example.com')
+
+    def save(self, **changes):
+        user = User.objects.get(pk=self.user.pk)
+        for name, value in changes.items():
+            setattr(user, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+    def test_logins_and_profile_edits_keep_the_version(self):
+        version = model_versions(User)
+        self.save(last_login=timezone.now())
+        self.save(phone='555 0100', address='1 Main St')
+        self.assertEqual(model_versions(User), version)
+
+    def test_renames_and_deletes_bump_the_version(self):
+        version = model_versions(User)
+        self.save(username='renamed')
+        self.assertGreater(model_versions(User), version)
+        version = model_versions(User)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(pk=self.user.pk).delete()
+        self.assertGreater(model_versions(User), version)
+
+    def test_cached_review_list_shows_the_new_username(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(user=self.user, rating=5, comment='Lovely')
+        client = APIClient()
+        self.assertEqual(client.get('/api/reviews/reviews/').json()['results'][0]['user_name'], 'guest')
+        self.save(username='renamed')
+        self.assertEqual(client.get('/api/reviews/reviews/').json()['results'][0]['user_name'], 'renamed')
@@ -33,6 +33,7 @@ logger = logging.getLogger(__name__)
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    cursor_ordering = ('id',)
 
 # Password reset views
 # handles password reset requests and confirmations